@@ -1,15 +1,28 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+try:
+    from django.utils.translation import ugettext_lazy as _
+except ImportError:
+    from django.utils.translation import gettext_lazy as _
 
 from solo.admin import SingletonModelAdmin
 
 from .forms import MonitoredEventForm
-from .models import Daemon, FailedEventLog, MonitoredEvent
+from .models import Daemon, DaemonShard, FailedEventLog, MonitoredEvent, ProcessedBlock
+from .replay import FailedEventReplayer
 
 admin.site.register(Daemon, SingletonModelAdmin)
 
 
+class DaemonShardAdmin(admin.ModelAdmin):
+    list_display = ['shard', 'block_number', 'last_error_block_number', 'modified']
+
+
+admin.site.register(DaemonShard, DaemonShardAdmin)
+
+
 class MonitoredEventAdmin(admin.ModelAdmin):
-    list_display = ['id', 'name', 'contract_address', 'topic', 'event_receiver', 'monitored_from']
+    list_display = ['id', 'name', 'contract_address', 'topic', 'event_receiver', 'monitored_from', 'backfill_from',
+                    'backfill_block_number']
     list_filter = ['contract_address']
     search_fields = ['name', 'contract_address']
 
@@ -27,9 +40,26 @@ admin.site.register(MonitoredEvent, MonitoredEventAdmin)
 
 
 class FailedEventLogAdmin(admin.ModelAdmin):
-    list_display = ['id', 'event', 'block_number', 'log_index', 'address', 'transaction_hash', 'created']
-    list_filter = ['address']
-    search_fields = ['event']
+    list_display = ['id', 'event', 'block_number', 'log_index', 'address', 'transaction_hash', 'error_class',
+                    'error_fingerprint', 'created']
+    list_filter = ['address', 'error_class', 'error_fingerprint']
+    search_fields = ['event', 'error_message', 'error_fingerprint']
+    actions = ['replay']
+
+    def replay(self, request, queryset):
+        replayed, failed = FailedEventReplayer().replay(queryset)
+        self.message_user(request, _('%(replayed)d failed events replayed, %(failed)d still failing.') % {
+            'replayed': replayed, 'failed': failed}, messages.SUCCESS if not failed else messages.WARNING)
+    replay.short_description = _('Replay the selected failed events')
 
 
 admin.site.register(FailedEventLog, FailedEventLogAdmin)
+
+
+class ProcessedBlockAdmin(admin.ModelAdmin):
+    list_display = ['block_number', 'shard', 'block_hash', 'parent_hash']
+    list_filter = ['shard']
+    search_fields = ['block_hash']
+
+
+admin.site.register(ProcessedBlock, ProcessedBlockAdmin)
@@ -0,0 +1,179 @@
+import json
+import mmap
+import os
+import tempfile
+import threading
+
+from hexbytes import HexBytes
+from web3.datastructures import AttributeDict
+
+from .utils import HexJsonEncoder
+
+
+def _merge(intervals):
+    """Merges overlapping and adjacent (from, to) intervals."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _intersect(intervals, other):
+    """Returns the intersection of two sorted lists of disjoint (from, to) intervals."""
+    intersection = []
+    i = j = 0
+    while i < len(intervals) and j < len(other):
+        start = max(intervals[i][0], other[j][0])
+        end = min(intervals[i][1], other[j][1])
+        if start <= end:
+            intersection.append((start, end))
+        if intervals[i][1] < other[j][1]:
+            i += 1
+        else:
+            j += 1
+    return intersection
+
+
+class LogArchive:
+    """Append-only on-disk archive of the raw logs of the monitored events.
+
+    The logs of every (address, topic) pair are stored in a directory of their own, in segment
+    files named after the block range they cover (`<from>-<to>.jsonl`, one log per line). A segment
+    also covers the blocks of its range without logs, so the archive knows which block ranges can
+    be served without querying the node. Segments are never modified once written and are read
+    through memory-mapped I/O.
+
+    Only finalized history must be archived, the archive is never invalidated.
+    """
+
+    SEGMENT_SUFFIX = '.jsonl'
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory (str): the archive root directory, created if missing
+
+        """
+        self.directory = directory
+        self._segments = {}  # dict (address, topic) => sorted list of (from, to, path)
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _pair_directory(self, pair):
+        address, topic = pair
+        return os.path.join(self.directory, '{0}_{1}'.format(address, topic).lower())
+
+    def get_segments(self, pair):
+        """Returns the (from, to, path) segments of the given (address, topic) pair, sorted by block range."""
+        with self._lock:
+            if pair not in self._segments:
+                directory = self._pair_directory(pair)
+                segments = []
+                if os.path.isdir(directory):
+                    for name in os.listdir(directory):
+                        if not name.endswith(self.SEGMENT_SUFFIX):
+                            continue
+                        start, end = name[:-len(self.SEGMENT_SUFFIX)].split('-')
+                        segments.append((int(start), int(end), os.path.join(directory, name)))
+                self._segments[pair] = sorted(segments)
+            return self._segments[pair]
+
+    def split(self, pairs, from_block, to_block):
+        """Splits a block range in the parts that are archived for every given pair and the gaps.
+
+        Args:
+            pairs (iterable): the (address, topic) pairs
+            from_block (int): The first block number.
+            to_block (int): The last block number.
+
+        Returns:
+            list: ascending (from, to, archived) tuples covering the whole range
+
+        """
+        covered = [(from_block, to_block)]
+        for pair in pairs:
+            covered = _intersect(covered, _merge((start, end) for start, end, _ in self.get_segments(pair)))
+        if not pairs:
+            covered = []
+
+        parts = []
+        next_block = from_block
+        for start, end in covered:
+            if start > next_block:
+                parts.append((next_block, start - 1, False))
+            parts.append((start, end, True))
+            next_block = end + 1
+        if next_block <= to_block:
+            parts.append((next_block, to_block, False))
+        return parts
+
+    @staticmethod
+    def _read_segment(path):
+        """Yields the logs of a segment, parsed line by line from the mapped file rather than copied at once."""
+        with open(path, 'rb') as segment:
+            if os.fstat(segment.fileno()).st_size == 0:
+                return
+            with mmap.mmap(segment.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for line in iter(data.readline, b''):
+                    yield json.loads(line)
+
+    @staticmethod
+    def _format_log(log):
+        return AttributeDict(dict(
+            log,
+            blockHash=HexBytes(log['blockHash']),
+            transactionHash=HexBytes(log['transactionHash']),
+            topics=[HexBytes(topic) for topic in log['topics']],
+        ))
+
+    def read(self, pairs, from_block, to_block):
+        """Reads the archived logs of the given pairs in the given block range.
+
+        Returns:
+            list: the log entries, sorted by (blockNumber, logIndex)
+
+        """
+        logs = []
+        for pair in pairs:
+            for start, end, path in self.get_segments(pair):
+                if end < from_block or start > to_block:
+                    continue
+                logs.extend(
+                    self._format_log(log) for log in self._read_segment(path)
+                    if from_block <= log['blockNumber'] <= to_block
+                )
+
+        # Overlapping segments may hold the same log more than once
+        unique_logs = {(log['blockNumber'], log['logIndex']): log for log in logs}
+        return [unique_logs[key] for key in sorted(unique_logs)]
+
+    def write(self, pair, from_block, to_block, logs):
+        """Archives the logs of an (address, topic) pair for a block range.
+
+        Args:
+            pair (tuple): the (address, topic) pair
+            from_block (int): The first block number.
+            to_block (int): The last block number.
+            logs (list): all the log entries of the pair in the block range
+
+        """
+        directory = self._pair_directory(pair)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, '{0:012d}-{1:012d}{2}'.format(from_block, to_block, self.SEGMENT_SUFFIX))
+
+        # Written to a temporary file first, readers never see a partial segment
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as segment:
+            for log in logs:
+                segment.write(json.dumps(dict(log), cls=HexJsonEncoder))
+                segment.write('\n')
+        os.replace(temp_path, path)
+
+        with self._lock:
+            segments = self._segments.get(pair)
+            if segments is not None:
+                segments.append((from_block, to_block, path))
+                segments.sort()
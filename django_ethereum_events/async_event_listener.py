@@ -0,0 +1,109 @@
+import asyncio
+import logging
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .event_listener import EventListener
+from .exceptions import UnknownBlock
+from .metrics import RPC_SECONDS
+
+try:
+    from aiohttp import ClientTimeout
+    from web3 import AsyncHTTPProvider
+except ImportError:
+    # web3 < 5.21 does not provide an async HTTP provider
+    AsyncHTTPProvider = None
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncEventListener(EventListener):
+    """Event listener that fetches blocks and receipts concurrently with asyncio.
+
+    Blocks are processed in batches of `ETHEREUM_RPC_BATCH_SIZE`. The headers and receipts
+    of a batch are fetched over web3's `AsyncHTTPProvider` with at most
+    `ETHEREUM_ASYNC_CONCURRENCY` requests in flight, then decoded and passed to the
+    event receivers synchronously, in chain order.
+
+    When using event filters, the logs are fetched exactly like `EventListener` does.
+    """
+
+    def __init__(self, *args, **kwargs):
+        async_provider = kwargs.pop('async_provider', None)
+        super(AsyncEventListener, self).__init__(*args, **kwargs)
+
+        if async_provider is None:
+            if AsyncHTTPProvider is None:
+                raise ImproperlyConfigured('AsyncEventListener requires web3>=5.21')
+
+            timeout = getattr(settings, "ETHEREUM_NODE_TIMEOUT", 10)
+            async_provider = AsyncHTTPProvider(
+                # The async provider is not pooled, it uses the first node of `ETHEREUM_NODE_URIS`
+                endpoint_uri=getattr(settings, "ETHEREUM_NODE_URI", None) or settings.ETHEREUM_NODE_URIS[0],
+                request_kwargs={
+                    "timeout": ClientTimeout(total=timeout)
+                }
+            )
+
+        self.async_provider = async_provider
+        self.concurrency = getattr(settings, "ETHEREUM_ASYNC_CONCURRENCY", 20)
+        # The aiohttp sessions are bound to the loop that created them, hence the loop is kept for the listener lifetime
+        self.loop = asyncio.new_event_loop()
+
+    async def _request(self, semaphore, method, params):
+        async with semaphore:
+            with RPC_SECONDS.time(method=method, batch=False):
+                response = await self.async_provider.make_request(method, params)
+
+        if 'error' in response:
+            raise ValueError(response['error'])
+        return response.get('result')
+
+    async def _get_block_receipts(self, semaphore, block):
+        if not block['transactions']:
+            return []
+
+        if self.fetcher.supports_block_receipts:
+            receipts = await self._request(semaphore, 'eth_getBlockReceipts', [hex(block['number'])])
+            return [self.fetcher.format_result('eth_getTransactionReceipt', receipt) for receipt in receipts or []]
+
+        receipts = await asyncio.gather(*(
+            self._request(semaphore, 'eth_getTransactionReceipt', [self.web3.toHex(tx)])
+            for tx in block['transactions']
+        ))
+        return [self.fetcher.format_result('eth_getTransactionReceipt', receipt) for receipt in receipts]
+
+    async def _get_block_logs(self, semaphore, block_number):
+        block = await self._request(semaphore, 'eth_getBlockByNumber', [hex(block_number), False])
+        block = self.fetcher.format_result('eth_getBlockByNumber', block)
+        if not (block and block.get('hash')):
+            raise UnknownBlock
+
+        if not self.decoder.bloom_matcher.may_contain(block.get('logsBloom')):
+            return block, []
+
+        return block, self.get_relevant_logs(await self._get_block_receipts(semaphore, block))
+
+    async def _get_blocks_logs(self, block_numbers):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        return await asyncio.gather(*(self._get_block_logs(semaphore, n) for n in block_numbers))
+
+    def iter_pending_blocks_logs(self):
+        """Yields (block_number, logs) tuples for every pending block, fetching each batch of blocks concurrently."""
+        pending_blocks = self.get_pending_blocks()
+        batch_size = self.fetcher.batch_size
+        for i in range(0, len(pending_blocks), batch_size):
+            block_numbers = pending_blocks[i:i + batch_size]
+            self.check_for_state_updates(block_numbers[0])
+            with self.time_stage('fetch'):
+                blocks, blocks_logs = zip(*self.loop.run_until_complete(self._get_blocks_logs(block_numbers)))
+            canonical = self.track_blocks(list(blocks))
+            yield from zip(block_numbers[:canonical], blocks_logs)
+            if canonical < len(block_numbers):
+                # The remaining blocks are processed after the next reorganization check
+                return
+
+    def close(self):
+        super(AsyncEventListener, self).close()
+        self.loop.close()
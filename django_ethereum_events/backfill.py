@@ -0,0 +1,71 @@
+import logging
+
+from django.db import transaction
+
+from .decoder import Decoder
+from .event_listener import EventListener
+from .models import MonitoredEvent
+
+logger = logging.getLogger(__name__)
+
+
+class EventBackfill(EventListener):
+    """Processes the history of monitored events added after the event listener passed their blocks.
+
+    The event listener receives the events of a `MonitoredEvent` from its `monitored_from` block
+    onwards. When `backfill_from` is set, this worker fetches the logs of just that event (address
+    and topic) with `eth_getLogs` from `backfill_from` up to `monitored_from - 1`, independently of
+    the global `Daemon` cursor and in parallel with the event listener. Both ranges are disjoint,
+    so every event is received exactly once; once the backfill cursor reaches `monitored_from - 1`
+    the event is handled by the event listener only.
+
+    Historic events may be received after newer events received by the event listener.
+    """
+
+    def get_decoder(self):
+        # The events that are not monitored yet are left to the event listener, which sets their `monitored_from`
+        return Decoder(block_number=None)
+
+    def get_backfill_events(self):
+        """Returns the monitored events with blocks left to backfill."""
+        return [
+            monitored_event for monitored_event in self.decoder.monitored_events.values()
+            if monitored_event.backfill_pending
+        ]
+
+    def backfill_event(self, monitored_event):
+        """Backfills the given event up to the block before `monitored_from`.
+
+        Every block range is committed in a single transaction, along with the receiver side effects
+        and the `backfill_block_number` cursor.
+
+        Args:
+            monitored_event (MonitoredEvent): the event to backfill
+
+        """
+        filter_params = {
+            "address": [monitored_event.contract_address],
+            "topics": [[monitored_event.topic]],
+        }
+        end = monitored_event.monitored_from - 1
+        start = monitored_event.backfill_from
+        if monitored_event.backfill_block_number is not None:
+            start = monitored_event.backfill_block_number + 1
+
+        while start <= end:
+            to_block = min(end, start + self.block_range.size * self.fetch_workers - 1)
+            logs = self.get_range_logs(start, to_block, filter_params)
+
+            with transaction.atomic():
+                self.save_events(self.decode_logs(logs))
+                # A queryset update does not flag the decoder state of the event listener for a refresh
+                MonitoredEvent.objects.filter(pk=monitored_event.pk).update(backfill_block_number=to_block)
+
+            monitored_event.backfill_block_number = to_block
+            logger.info('Backfilled {0} up to block {1} of {2}.'.format(monitored_event, to_block, end))
+            start = to_block + 1
+
+    def execute(self):
+        """Backfills every monitored event with blocks left to backfill, one event at a time."""
+        for monitored_event in self.get_backfill_events():
+            self.backfill_event(monitored_event)
@@ -0,0 +1,106 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+from requests.exceptions import Timeout
+
+from .ratelimit import is_rate_limit_error
+
+CACHE_RANGE_SIZE_KEY = '_django_ethereum_events_range_size'
+
+# Fragments of the error messages returned by nodes and providers when a log query is too large,
+# specific enough not to match the quota errors, see `ratelimit.RATE_LIMIT_MESSAGES`
+RANGE_ERROR_MESSAGES = (
+    'returned more than',
+    'too many results',
+    'too many logs',
+    'max results',
+    'maximum results',
+    'response size',
+    'block range',
+    'range too large',
+    'range is too large',
+    'range limit',
+    'query timeout',
+    'query timed out',
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveBlockRange:
+    """Adaptive block span used when querying log entries.
+
+    The span is halved when the node rejects a query for returning too many results
+    or times out, and doubled after fast responses that returned few log entries.
+    The tuned span is stored in the cache so that it is remembered across task runs.
+
+    Attributes:
+        size (int): the current block span
+        min_size (int): the smallest allowed span
+        max_size (int): the largest allowed span
+
+    """
+
+    def __init__(self):
+        self.min_size = 1
+        self.max_size = getattr(settings, "ETHEREUM_LOGS_MAX_BATCH_SIZE", 100000)
+        self.adaptive = getattr(settings, "ETHEREUM_LOGS_ADAPTIVE_BATCH_SIZE", True)
+        self.target_results = getattr(settings, "ETHEREUM_LOGS_TARGET_RESULTS", 1000)
+        self.fast_response = getattr(settings, "ETHEREUM_LOGS_FAST_RESPONSE_SECONDS", 2)
+
+        size = getattr(settings, "ETHEREUM_LOGS_BATCH_SIZE", 10000)
+        if self.adaptive:
+            size = cache.get(CACHE_RANGE_SIZE_KEY, size)
+        self.size = self._clamp(size)
+
+    def _clamp(self, size):
+        return max(self.min_size, min(self.max_size, size))
+
+    def _set_size(self, size):
+        size = self._clamp(size)
+        if size != self.size:
+            logger.info('Log query block span changed from {0} to {1}'.format(self.size, size))
+            self.size = size
+            cache.set(CACHE_RANGE_SIZE_KEY, size, None)
+
+    def is_range_error(self, exc):
+        """Whether the exception signals that the queried range was too large.
+
+        Args:
+            exc (Exception): the exception raised by the log query
+
+        Returns:
+            bool: True if retrying with a smaller range may succeed
+
+        """
+        if isinstance(exc, Timeout):
+            return True
+        if isinstance(exc, ValueError):
+            # A throttled query fails whatever its range, splitting it would only shrink the span for good
+            if exc.args and is_rate_limit_error(exc.args[0]):
+                return False
+            message = str(exc).lower()
+            return any(fragment in message for fragment in RANGE_ERROR_MESSAGES)
+        return False
+
+    def shrink(self, span):
+        """Halves the span after a query over `span` blocks failed."""
+        if self.adaptive:
+            self._set_size(span // 2)
+
+    def record_success(self, span, results, elapsed):
+        """Grows the span after a fast, sparse response over a full sized range.
+
+        Args:
+            span (int): the number of blocks queried
+            results (int): the number of log entries returned
+            elapsed (float): the query duration in seconds
+
+        """
+        if not self.adaptive or span < self.size:
+            return
+
+        if elapsed < self.fast_response and results < self.target_results // 2:
+            self._set_size(self.size * 2)
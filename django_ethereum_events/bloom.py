@@ -0,0 +1,57 @@
+from eth_utils import keccak, to_bytes
+
+
+def bloom_bits(value):
+    """Returns the bloom filter bits of the given value as an integer mask.
+
+    Every value sets 3 of the 2048 bits of an Ethereum `logsBloom`,
+    indexed by the low 11 bits of the first three byte pairs of its keccak hash.
+
+    Args:
+        value (bytes): the address or topic
+
+    Returns:
+        int: the mask with the value's bits set
+
+    """
+    value_hash = keccak(value)
+    mask = 0
+    for i in range(0, 6, 2):
+        mask |= 1 << (((value_hash[i] << 8) + value_hash[i + 1]) & 2047)
+    return mask
+
+
+class LogsBloomMatcher:
+    """Checks whether a block `logsBloom` may contain any of the monitored (address, topic) pairs.
+
+    Bloom filters do not yield false negatives, so a block rejected by the matcher
+    is guaranteed not to contain any relevant log.
+    """
+
+    def __init__(self, address_topic_pairs):
+        """Precomputes the bloom masks of the given pairs.
+
+        Args:
+            address_topic_pairs (iterable): (address, topic) tuples in hexstring form
+
+        """
+        self.masks = {
+            bloom_bits(to_bytes(hexstr=address)) | bloom_bits(to_bytes(hexstr=topic))
+            for address, topic in address_topic_pairs
+        }
+
+    def may_contain(self, logs_bloom):
+        """Tests the given bloom against the monitored pairs.
+
+        Args:
+            logs_bloom (bytes): the block or receipt `logsBloom`
+
+        Returns:
+            bool: False if no monitored event could have been emitted
+
+        """
+        if not logs_bloom:
+            return True
+
+        bloom = int.from_bytes(logs_bloom, 'big')
+        return any(bloom & mask == mask for mask in self.masks)
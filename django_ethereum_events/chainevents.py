@@ -13,8 +13,39 @@ class AbstractEventReceiver(with_metaclass(ABCMeta)):
 
     For every Event that is monitored, an Event handler that inherits
     this class must be created and the `save` method must be implemented.
+
+    A single receiver instance is created per event listener and reused for every
+    event it receives. The optional `setup` and `teardown` hooks can be used to hold
+    connections or prepared state for the lifetime of the listener.
+
+    Receivers may also implement a `save_batch(decoded_events)` method, which receives
+    the events of the receiver for a block range (a fetch batch or a checkpoint) at once,
+    in chain order (e.g. to use `bulk_create`). The events of other receivers in between
+    split the batch, so that every event is still received in chain order. The batch runs
+    inside a transaction; if it raises, every event is passed separately to `save` instead.
+
+    When a chain reorganization orphans blocks that were already processed, the `revert`
+    hook is called before the events of the new canonical blocks are received.
     """
 
+    def setup(self):
+        """Called once, before the first event is passed to the receiver."""
+        pass
+
     @abstractmethod
     def save(self, decoded_event):
         pass
+
+    def revert(self, block_number):
+        """Called when the blocks from `block_number` onwards were orphaned by a chain reorganization.
+
+        The receiver must undo the side effects of the events it received from those blocks.
+
+        Args:
+            block_number (int): the first orphaned block
+        """
+        pass
+
+    def teardown(self):
+        """Called once, when the event listener stops using the receiver."""
+        pass
@@ -1,57 +1,167 @@
+import itertools
 import logging
+from functools import partial
 
+from eth_abi.decoding import ContextFramesBytesIO, TupleDecoder
+from eth_utils import event_abi_to_log_topic, hexstr_if_str, to_bytes
 from web3 import Web3
-from web3._utils.events import get_event_data
-
+from web3._utils.abi import (
+    exclude_indexed_event_inputs, get_abi_input_names, get_indexed_event_inputs, map_abi_data,
+    normalize_event_input_types
+)
+from web3._utils.events import get_event_abi_types_for_decoding
+from web3._utils.normalizers import BASE_RETURN_NORMALIZERS
+from web3.datastructures import AttributeDict
+from web3.exceptions import LogTopicError, MismatchedABI
+
+from django_ethereum_events.bloom import LogsBloomMatcher
 from django_ethereum_events.models import MonitoredEvent
+from django_ethereum_events.utils import get_shard
 
 logger = logging.getLogger(__name__)
 
 
+class CompiledEventDecoder:
+    """Reusable decoder of the logs of a single event.
+
+    Produces the same output as `web3._utils.events.get_event_data`, but the indexed and
+    non-indexed inputs, the ABI type strings and the codec decoders are derived from the
+    event ABI only once.
+    """
+
+    def __init__(self, codec, event_abi):
+        self.name = event_abi['name']
+        self.anonymous = event_abi.get('anonymous', False)
+        self.log_topic = event_abi_to_log_topic(event_abi)
+
+        topics_abi = get_indexed_event_inputs(event_abi)
+        self.topic_types = list(get_event_abi_types_for_decoding(normalize_event_input_types(topics_abi)))
+        self.topic_names = get_abi_input_names({'inputs': topics_abi})
+        self.topic_decoders = [codec._registry.get_decoder(type_str) for type_str in self.topic_types]
+
+        data_abi = exclude_indexed_event_inputs(event_abi)
+        self.data_types = list(get_event_abi_types_for_decoding(normalize_event_input_types(data_abi)))
+        self.data_names = get_abi_input_names({'inputs': data_abi})
+        self.data_decoder = TupleDecoder(
+            decoders=[codec._registry.get_decoder(type_str) for type_str in self.data_types])
+
+        # The return normalizers checksum addresses and turn arrays into lists, like `get_event_data`
+        self.normalize_topics = partial(map_abi_data, BASE_RETURN_NORMALIZERS, self.topic_types)
+        self.normalize_data = partial(map_abi_data, BASE_RETURN_NORMALIZERS, self.data_types)
+
+    def decode(self, log_entry):
+        """Decodes the given log entry.
+
+        Args:
+            log_entry (AttributeDict): the event log to decode
+        Returns:
+            AttributeDict: The decoded log.
+
+        """
+        if self.anonymous:
+            log_topics = log_entry['topics']
+        elif not log_entry['topics']:
+            raise MismatchedABI("Expected non-anonymous event to have 1 or more topics")
+        elif self.log_topic != log_entry['topics'][0]:
+            raise MismatchedABI("The event signature did not match the provided ABI")
+        else:
+            log_topics = log_entry['topics'][1:]
+
+        if len(log_topics) != len(self.topic_types):
+            raise LogTopicError("Expected {0} log topics.  Got {1}".format(
+                len(self.topic_types),
+                len(log_topics),
+            ))
+
+        log_data = hexstr_if_str(to_bytes, log_entry['data'])
+        decoded_data = self.normalize_data(self.data_decoder(ContextFramesBytesIO(log_data)))
+
+        decoded_topics = self.normalize_topics([
+            decoder(ContextFramesBytesIO(bytes(topic)))
+            for decoder, topic in zip(self.topic_decoders, log_topics)
+        ])
+
+        event_args = dict(itertools.chain(
+            zip(self.topic_names, decoded_topics),
+            zip(self.data_names, decoded_data),
+        ))
+
+        return AttributeDict.recursive({
+            'args': event_args,
+            'event': self.name,
+            'logIndex': log_entry['logIndex'],
+            'transactionIndex': log_entry['transactionIndex'],
+            'transactionHash': log_entry['transactionHash'],
+            'address': log_entry['address'],
+            'blockHash': log_entry['blockHash'],
+            'blockNumber': log_entry['blockNumber'],
+        })
+
+
 class Decoder:
     """Event log decoder.
 
     Attributes:
         monitored_events (QuerySet): retrieved monitored events
         monitored_events: dict (address, topic) => monitored_event
+        event_decoders: dict (address, topic) => CompiledEventDecoder
+        bloom_matcher (LogsBloomMatcher): matches block blooms against the monitored events
 
     """
 
     monitored_events = None
+    event_decoders = None
+    bloom_matcher = None
     watched_addresses = []
     topics = {}
 
-    def __init__(self, block_number, *args, **kwargs):
+    def __init__(self, block_number, *args, shard=None, **kwargs):
+        """
+        Args:
+            block_number (int): next block to process
+            shard (int): only decode the events of the given shard (optional)
+
+        """
         super(Decoder, self).__init__(*args, **kwargs)
-        self.refresh_state(block_number)
         self.web3 = Web3()
+        self.shard = shard
+        self.refresh_state(block_number)
 
     def refresh_state(self, block_number):
         """Fetches the monitored events from the database and updates the decoder state variables.
 
         Args:
-            block_number (int): next block to process
+            block_number (int): next block to process. If None, the events that are not monitored yet
+                (without `monitored_from`) are left out.
 
         """
         self.watched_addresses.clear()
         self.topics.clear()
         self.monitored_events = {}  # dict (address, topic) => [monitored_event1, monitored_event2, ...]
+        self.event_decoders = {}
 
         for monitored_event in MonitoredEvent.objects.all():
-            self.monitored_events[
-                (monitored_event.contract_address, monitored_event.topic)
-            ] = monitored_event
+            if monitored_event.monitored_from is None and block_number is None:
+                continue
+            if self.shard is not None and get_shard(monitored_event.contract_address) != self.shard:
+                continue
+
+            key = (monitored_event.contract_address, monitored_event.topic)
+            self.monitored_events[key] = monitored_event
+            self.event_decoders[key] = CompiledEventDecoder(self.web3.codec, monitored_event.event_abi_parsed)
 
             if monitored_event.monitored_from is None:
                 monitored_event.monitored_from = block_number
                 monitored_event.save()
 
+        self.bloom_matcher = LogsBloomMatcher(self.monitored_events.keys())
+
     def decode_log(self, log):
         """
         Decodes a retrieved relevant log.
 
-        Decoding is performed with the `web3.utils.events.get_event_data`
-        function.
+        Decoding is performed with the event decoder compiled by `refresh_state`,
+        which is equivalent to the `web3.utils.events.get_event_data` function.
 
         Args:
             log (AttributeDict): the event log to decode
@@ -61,16 +171,17 @@ class Decoder:
         """
         log_topic = log['topics'][0].hex()
         address = log['address']
-        mon_evt = self.monitored_events.get((address, log_topic), None)
-        if mon_evt is None:
+        event_decoder = self.event_decoders.get((address, log_topic), None)
+        if event_decoder is None:
             return None  # combination of (address, topic) not monitored
-        event_abi = mon_evt.event_abi_parsed
-        decoded_log = get_event_data(self.web3.codec, event_abi, log)
+        decoded_log = event_decoder.decode(log)
         return (address, log_topic), decoded_log
 
     def decode_logs(self, logs):
         """Decode the given logs.
 
+        Logs flagged as `removed` by the node are skipped.
+
         Args:
             logs (list): The targeted logs to decode.
         Returns:
@@ -79,6 +190,11 @@ class Decoder:
         """
         ret = []
         for log in logs:
+            if log.get('removed'):
+                # Logs of orphaned blocks, reverted through the listener reorganization handling
+                logger.warning('Skipping removed log {0} of block {1}.'.format(log['logIndex'], log['blockNumber']))
+                continue
+
             decoded = self.decode_log(log)
             if decoded is not None:
                 ret.append(decoded)
@@ -1,32 +1,106 @@
 import itertools
 import json
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from django.conf import settings
 from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 from django.utils.module_loading import import_string
 
+from .archive import LogArchive
+from .block_range import AdaptiveBlockRange
 from .decoder import Decoder
 from .exceptions import UnknownBlock
-from .models import CACHE_UPDATE_KEY, Daemon, FailedEventLog
-from .utils import HexJsonEncoder, refresh_cache_update_value
+from .lock import LeaseLost
+from .metrics import BLOCK_NUMBER, BLOCKS_PROCESSED, EVENTS_DISPATCHED, HEAD_LAG, RECEIVER_SECONDS, STAGE_SECONDS
+from .models import Daemon, DaemonShard, FailedEventLog, ProcessedBlock
+from .utils import HexJsonEncoder, exception_fingerprint, get_cache_update_key, refresh_cache_update_value
 from .web3_service import Web3Service
 
 logger = logging.getLogger(__name__)
 
 
 class EventListener:
-    """Event Listener class."""
+    """Event Listener class.
+
+    With `ETHEREUM_SHARDS` greater than 1, the monitored events are partitioned by contract address
+    and every listener processes the events of a single shard (the `shard` keyword argument),
+    keeping its own `DaemonShard` block cursor.
+
+    The time spent in every stage (fetch, decode, dispatch and checkpoint), the processed blocks and
+    the lag behind the chain head are recorded in the metrics registry, see `metrics.REGISTRY`.
+    """
 
     def __init__(self, *args, **kwargs):
+        self.shard = kwargs.pop('shard', 0)
+        self.shards = getattr(settings, "ETHEREUM_SHARDS", 1)
+        if not 0 <= self.shard < self.shards:
+            raise ImproperlyConfigured('Shard {0} out of range, ETHEREUM_SHARDS is {1}'.format(self.shard, self.shards))
+
         super(EventListener, self).__init__()
-        self.daemon = Daemon.get_solo()
-        self.decoder = Decoder(block_number=self.daemon.block_number + 1)
-        self.web3 = Web3Service(*args, **kwargs).web3
+        self.daemon = self.get_daemon()
+        self.decoder = self.get_decoder()
+        web3_service = Web3Service(*args, **kwargs)
+        self.web3 = web3_service.web3
+        self.fetcher = web3_service.fetcher
+        self.block_range = AdaptiveBlockRange()
+        self.fetch_workers = getattr(settings, "ETHEREUM_FETCH_WORKERS", 1)
+        self.event_receivers = {}  # dict event_receiver => event receiver instance
+        self.checkpoint_blocks = getattr(settings, "ETHEREUM_CHECKPOINT_BLOCKS", None)
+        self.checkpoint_seconds = getattr(settings, "ETHEREUM_CHECKPOINT_SECONDS", None)
+        self.confirmations = getattr(settings, "ETHEREUM_CONFIRMATIONS", 0)
+        self.reorg_depth = getattr(settings, "ETHEREUM_REORG_DEPTH", 0)
+        # Fencing token of the lock held by the listener, see `acquire_fencing_token`
+        self.fencing_token = None
+        # Last chain head seen, the head lag is measured against it as the cursor moves
+        self.head_block_number = None
+        archive_directory = getattr(settings, "ETHEREUM_LOG_ARCHIVE_DIR", None)
+        self.log_archive = LogArchive(archive_directory) if archive_directory else None
+        self.archive_confirmations = getattr(settings, "ETHEREUM_LOG_ARCHIVE_CONFIRMATIONS", 128)
+
+    def get_daemon(self):
+        """Returns the block cursor of the listener shard.
+
+        A new shard cursor starts from the `Daemon` block number.
+        """
+        if self.shards == 1:
+            return Daemon.get_solo()
+
+        daemon, _ = DaemonShard.objects.get_or_create(
+            shard=self.shard, defaults={'block_number': Daemon.get_solo().block_number})
+        return daemon
+
+    def get_decoder(self):
+        """Returns the decoder of the monitored events, starting to monitor new events from the next block."""
+        return Decoder(block_number=self.daemon.block_number + 1, shard=self.shard if self.shards > 1 else None)
+
+    def get_processed_blocks(self):
+        """Returns the `ProcessedBlock` entries of the listener shard."""
+        return ProcessedBlock.objects.filter(shard=self.shard)
+
+    def get_head_block_number(self):
+        """Returns the number of the latest block with at least `ETHEREUM_CONFIRMATIONS` confirmations."""
+        self.head_block_number = self.web3.eth.blockNumber
+        HEAD_LAG.set(self.head_block_number - self.daemon.block_number, shard=self.shard)
+        return self.head_block_number - self.confirmations
+
+    def time_stage(self, stage):
+        """Returns a context manager recording the duration of a pipeline stage."""
+        return STAGE_SECONDS.time(stage=stage, shard=self.shard)
+
+    def decode_logs(self, logs):
+        """Decodes the given log entries, see `Decoder.decode_logs`."""
+        with self.time_stage('decode'):
+            return self.decoder.decode_logs(logs)
 
     def _get_block_range(self):
-        current = self.web3.eth.blockNumber
-        step = getattr(settings, "ETHEREUM_LOGS_BATCH_SIZE", 10000)
+        current = self.get_head_block_number()
+        step = self.block_range.size * self.fetch_workers
         if self.daemon.block_number < current:
             start = self.daemon.block_number + 1
             return start, min(current, start + step)
@@ -48,37 +122,204 @@ class EventListener:
         else:
             return list(range(start, end + 1))
 
+    def acquire_fencing_token(self):
+        """Issues the listener a fencing token, greater than the token of any previous lock holder.
+
+        Called by the task or command running the listener once its lock is acquired. The token is
+        issued by incrementing the one stored on the block cursor, so it keeps increasing even if
+        the cache holding the lock is cleared, and a previous holder can no longer move the cursor.
+
+        Returns:
+            int: the fencing token
+
+        """
+        with transaction.atomic():
+            type(self.daemon).objects.filter(pk=self.daemon.pk).update(fencing_token=F('fencing_token') + 1)
+            self.daemon.refresh_from_db(fields=['fencing_token'])
+
+        self.fencing_token = self.daemon.fencing_token
+        return self.fencing_token
+
     def update_block_number(self, block_number):
-        """Updates the internal block_number counter."""
+        """Updates the internal block_number counter.
+
+        When the listener holds a fencing token, the update is rejected if the cursor was
+        already updated with a greater token, i.e. by a worker that acquired the lock after
+        the lease of this listener expired.
+
+        Raises:
+            LeaseLost: if the cursor was updated by a newer lock holder
+
+        """
+        processed = block_number - self.daemon.block_number
+        with self.time_stage('checkpoint'):
+            self._update_block_number(block_number)
+
+        if processed > 0:
+            BLOCKS_PROCESSED.inc(processed, shard=self.shard)
+        BLOCK_NUMBER.set(block_number, shard=self.shard)
+        if self.head_block_number is not None:
+            HEAD_LAG.set(self.head_block_number - block_number, shard=self.shard)
+
+    def _update_block_number(self, block_number):
+        if self.fencing_token is None:
+            self.daemon.block_number = block_number
+            self.daemon.save(update_fields=['block_number', 'modified'])
+            return
+
+        updated = type(self.daemon).objects.filter(
+            pk=self.daemon.pk, fencing_token__lte=self.fencing_token
+        ).update(block_number=block_number, fencing_token=self.fencing_token, modified=timezone.now())
+        if not updated:
+            raise LeaseLost('Block cursor updated by a newer lock holder, fencing token {0} rejected'.format(
+                self.fencing_token))
+        # The cursor held in memory only moves along with the stored one
         self.daemon.block_number = block_number
-        self.daemon.save()
+        self.daemon.fencing_token = self.fencing_token
+
+    def track_blocks(self, blocks):
+        """Verifies that the given consecutive block headers extend the processed chain and stores their hashes.
+
+        Every block must be the child of the previous one, the first block the child of the last
+        stored block. The hashes of the last `ETHEREUM_REORG_DEPTH` blocks are kept in `ProcessedBlock`.
+
+        Args:
+            blocks (list): the block headers, in ascending order
+
+        Returns:
+            int: the number of leading blocks that extend the processed chain. The blocks after a
+                missing block or a parent hash mismatch must not be processed.
+
+        """
+        if not self.reorg_depth or not blocks:
+            return len(blocks)
+
+        previous = self.get_processed_blocks().filter(block_number=blocks[0]['number'] - 1).first() \
+            if blocks[0] else None
+        previous_hash = previous.block_hash if previous else None
+        tracked = []
+        for block in blocks:
+            if not (block and block.get('hash')):
+                break
+
+            block_hash = self.web3.toHex(block['hash'])
+            parent_hash = self.web3.toHex(block['parentHash'])
+            if previous_hash is not None and parent_hash != previous_hash:
+                logger.warning('Block {0} does not extend the processed chain.'.format(block['number']))
+                break
+
+            tracked.append(ProcessedBlock(
+                shard=self.shard, block_number=block['number'], block_hash=block_hash, parent_hash=parent_hash))
+            previous_hash = block_hash
+
+        if tracked:
+            # Rows above the cursor may remain from blocks that were fetched but never processed
+            self.get_processed_blocks().filter(block_number__gte=tracked[0].block_number).delete()
+            ProcessedBlock.objects.bulk_create(tracked[-self.reorg_depth:])
+            self.get_processed_blocks().filter(block_number__lte=tracked[-1].block_number - self.reorg_depth).delete()
+        return len(tracked)
+
+    def check_for_reorg(self):
+        """Rewinds the block cursor if the recently processed blocks are no longer part of the canonical chain.
+
+        The stored hashes of the last `ETHEREUM_REORG_DEPTH` processed blocks are compared with the
+        node's, newest first. The cursor is rewound to the newest block that is still canonical.
+
+        Returns:
+            bool: True if a reorganization was found
+
+        """
+        if not self.reorg_depth:
+            return False
+
+        self.get_processed_blocks().filter(block_number__gt=self.daemon.block_number).delete()
+        tracked = list(self.get_processed_blocks().order_by('-block_number')[:self.reorg_depth])
+        if not tracked:
+            return False
+
+        blocks = self.fetcher.get_blocks([processed_block.block_number for processed_block in tracked])
+        for processed_block, block in zip(tracked, blocks):
+            if block and block.get('hash') and self.web3.toHex(block['hash']) == processed_block.block_hash:
+                ancestor = processed_block.block_number
+                break
+        else:
+            ancestor = tracked[-1].block_number - 1
+            logger.error('Chain reorganization deeper than the {0} tracked blocks.'.format(len(tracked)))
+
+        if ancestor == tracked[0].block_number:
+            return False
+
+        self.rewind(ancestor)
+        return True
 
-    def get_block_logs(self, block_number):
+    def rewind(self, block_number):
+        """Rewinds the block cursor to the given block, reverting the events of the orphaned blocks after it.
+
+        The `revert` hook of every event receiver is called, and the `FailedEventLog` entries of the
+        orphaned blocks are deleted, in a single transaction along with the cursor update.
+
+        Args:
+            block_number (int): the last canonical block
+
+        """
+        logger.warning('Chain reorganization detected, rewinding from block {0} to {1}.'.format(
+            self.daemon.block_number, block_number))
+
+        monitored_events = self.decoder.monitored_events.values()
+        event_receivers = {monitored_event.event_receiver for monitored_event in monitored_events}
+        with transaction.atomic():
+            for event_receiver in sorted(event_receivers):
+                self.get_event_receiver(event_receiver).revert(block_number + 1)
+            FailedEventLog.objects.filter(
+                monitored_event__in=list(monitored_events), block_number__gt=block_number).delete()
+            self.get_processed_blocks().filter(block_number__gt=block_number).delete()
+            self.update_block_number(block_number)
+
+    def get_block_logs(self, block_number, block=None):
         """Retrieves the relevant log entries from the given block.
 
+        Blocks whose `logsBloom` cannot contain any monitored event are skipped without
+        fetching their receipts. Otherwise, the receipts of the block transactions are fetched
+        with a single `eth_getBlockReceipts` call when the node supports it, or with batch requests.
+
         Args:
             block_number (int): The block number of the block to process.
+            block (AttributeDict): The already fetched block header (optional).
+        Returns:
+            The list of relevant log entries.
+
+        """
+        with self.time_stage('fetch'):
+            if block is None:
+                block = self.fetcher.get_blocks([block_number])[0]
+            if block and block.get('hash'):
+                if not self.decoder.bloom_matcher.may_contain(block.get('logsBloom')):
+                    return []
+
+                return self.get_relevant_logs(self.fetcher.get_block_receipts(block))
+            else:
+                raise UnknownBlock
+
+    def get_relevant_logs(self, receipts):
+        """Extracts the log entries of the monitored events from the given receipts.
+
+        Args:
+            receipts (list): The transaction receipts (`None` entries are ignored).
         Returns:
             The list of relevant log entries.
 
         """
-        block = self.web3.eth.getBlock(block_number)
         relevant_logs = []
-        if block and block.get('hash'):
-            for tx in block['transactions']:
-                receipt = self.web3.eth.getTransactionReceipt(tx)
-
-                if receipt is None:
-                    continue
-
-                for log in receipt.get('logs', []):
-                    address = log['address']
-                    topic = log['topics'][0].hex()
-                    if (address, topic) in self.decoder.monitored_events:
-                        relevant_logs.append(log)
-            return relevant_logs
-        else:
-            raise UnknownBlock
+        for receipt in receipts:
+            if receipt is None:
+                continue
+
+            for log in receipt.get('logs', []):
+                address = log['address']
+                topic = log['topics'][0].hex()
+                if (address, topic) in self.decoder.monitored_events:
+                    relevant_logs.append(log)
+        return relevant_logs
 
     def get_logs(self, from_block, to_block):
         """
@@ -96,36 +337,238 @@ class EventListener:
             self.get_block_logs(n) for n in range(from_block, to_block + 1))
         return list(logs)
 
+    def _map_concurrently(self, func, *iterables):
+        """Applies `func` on a bounded thread pool of `ETHEREUM_FETCH_WORKERS` threads.
+
+        Returns:
+            list: the results, in the order of the given iterables
+
+        """
+        if self.fetch_workers <= 1:
+            return list(map(func, *iterables))
+
+        with ThreadPoolExecutor(max_workers=self.fetch_workers) as executor:
+            return list(executor.map(func, *iterables))
+
+    def get_range_logs(self, from_block, to_block, filter_params=None):
+        """
+        Retrieves the monitored log entries from the given block range using `eth_getLogs`.
+
+        The range is split into sub-ranges of the current adaptive span that are fetched concurrently.
+
+        When `ETHEREUM_LOG_ARCHIVE_DIR` is set, the parts of the range that are archived for every
+        monitored event of the filter are read from disk and only the gaps are queried. The logs of the
+        queried blocks with at least `ETHEREUM_LOG_ARCHIVE_CONFIRMATIONS` confirmations are archived.
+
+        Args:
+            from_block (int): The first block number.
+            to_block (int): The last block number.
+            filter_params (dict): The address and topics filter, defaults to `get_log_filter_params`.
+
+        Returns:
+            The list of log entries, sorted by (blockNumber, logIndex).
+
+        """
+        with self.time_stage('fetch'):
+            return self._get_range_logs(from_block, to_block, filter_params)
+
+    def _get_range_logs(self, from_block, to_block, filter_params=None):
+        if self.log_archive is None:
+            return self._get_node_range_logs(from_block, to_block, filter_params)
+
+        pairs = self._get_filter_pairs(filter_params or self.get_log_filter_params())
+        logs = []
+        for start, end, archived in self.log_archive.split(pairs, from_block, to_block):
+            if archived:
+                logs.extend(self.log_archive.read(pairs, start, end))
+            else:
+                node_logs = self._get_node_range_logs(start, end, filter_params)
+                self._archive_logs(pairs, start, end, node_logs)
+                logs.extend(node_logs)
+        return logs
+
+    def _get_filter_pairs(self, filter_params):
+        """Returns the monitored (address, topic) pairs matched by the given filter."""
+        addresses, topics = set(filter_params["address"]), set(filter_params["topics"][0])
+        return sorted(
+            (address, topic) for address, topic in self.decoder.monitored_events
+            if address in addresses and topic in topics
+        )
+
+    def _archive_logs(self, pairs, from_block, to_block, logs):
+        """Archives the logs of the finalized blocks of a range queried from the node."""
+        to_block = min(to_block, self.web3.eth.blockNumber - self.archive_confirmations)
+        if to_block < from_block:
+            return
+
+        logs_by_pair = {pair: [] for pair in pairs}
+        for log in logs:
+            pair = (log['address'], log['topics'][0].hex())
+            if pair in logs_by_pair and log['blockNumber'] <= to_block:
+                logs_by_pair[pair].append(log)
+
+        for pair, pair_logs in logs_by_pair.items():
+            self.log_archive.write(pair, from_block, to_block, pair_logs)
+
+    def _get_node_range_logs(self, from_block, to_block, filter_params=None):
+        step = self.block_range.size
+        sub_ranges = [(start, min(to_block, start + step - 1)) for start in range(from_block, to_block + 1, step)]
+        from_blocks, to_blocks = zip(*sub_ranges)
+        results = self._map_concurrently(
+            self.get_filtered_logs, from_blocks, to_blocks, itertools.repeat(filter_params, len(sub_ranges)))
+
+        # Sub-ranges are disjoint and ascending, each one sorted, so concatenating them keeps chain order
+        return list(itertools.chain.from_iterable(results))
+
+    def iter_block_logs(self, block_numbers, blocks):
+        """
+        Yields the relevant log entries of each of the given blocks, in order.
+
+        With `ETHEREUM_FETCH_WORKERS` greater than 1, the receipts of the blocks are fetched
+        concurrently and decoder state updates are applied once, before the fetching starts.
+
+        Args:
+            block_numbers (list): The block numbers.
+            blocks (list): The already fetched block headers.
+
+        """
+        if self.fetch_workers > 1:
+            self.check_for_state_updates(block_numbers[0])
+            yield from self._map_concurrently(self.get_block_logs, block_numbers, blocks)
+            return
+
+        for block_number, block in zip(block_numbers, blocks):
+            self.check_for_state_updates(block_number)
+            yield self.get_block_logs(block_number, block=block)
+
+    def get_event_receiver(self, event_receiver):
+        """Returns the event receiver instance of the given event receiver path.
+
+        The receiver class is imported and instantiated once, and the instance is reused
+        for the lifetime of the listener.
+
+        Args:
+            event_receiver (str): the event receiver path, as stored in `MonitoredEvent.event_receiver`
+
+        """
+        receiver = self.event_receivers.get(event_receiver)
+        if receiver is None:
+            receiver = import_string(event_receiver)()
+            receiver.setup()
+            self.event_receivers[event_receiver] = receiver
+        return receiver
+
+    def release_event_receivers(self, keep=()):
+        """Tears down the event receivers that are no longer needed.
+
+        Args:
+            keep (iterable): event receiver paths that are still in use
+
+        """
+        for event_receiver in set(self.event_receivers) - set(keep):
+            receiver = self.event_receivers.pop(event_receiver)
+            try:
+                receiver.teardown()
+            except Exception:
+                logger.error('Exception while tearing down {0}.'.format(event_receiver), exc_info=True)
+
+    def close(self):
+        """Releases the resources held by the listener."""
+        self.release_event_receivers()
+
     def save_events(self, decoded_logs):
         """
         Fires the appropriate event receivers for every given log.
 
+        The event receivers are called in chain order. Receivers implementing `save_batch` receive
+        every run of consecutive logs of their events at once. If the batch fails, the events are passed
+        one by one to `save`, so that only the failing events are stored as `FailedEventLog` entries.
+
+        The `FailedEventLog` entries are buffered and written with a single `bulk_create`.
+
         Args:
             decoded_logs (:obj:`list` of :obj:`dict`): The decoded logs.
 
         """
+        with self.time_stage('dispatch'):
+            self._save_events(decoded_logs)
+
+    def _save_events(self, decoded_logs):
+        # Runs of consecutive events of the same receiver, so that batching never reorders events across receivers
+        events_runs = []
         for (address, topic), decoded_log in decoded_logs:
-            event_receiver = self.decoder.monitored_events[(address, topic)].event_receiver
+            monitored_event = self.decoder.monitored_events[(address, topic)]
+            if not events_runs or events_runs[-1][0] != monitored_event.event_receiver:
+                events_runs.append((monitored_event.event_receiver, []))
+            events_runs[-1][1].append((monitored_event, decoded_log))
+
+        failed_events = []
+        for event_receiver, events in events_runs:
+            if self._save_batch(event_receiver, events):
+                continue
+
+            for monitored_event, decoded_log in events:
+                try:
+                    # A savepoint keeps a failing receiver from breaking an enclosing checkpoint transaction
+                    with transaction.atomic(), RECEIVER_SECONDS.time(receiver=event_receiver):
+                        self.get_event_receiver(event_receiver).save(decoded_event=decoded_log)
+                    EVENTS_DISPATCHED.inc(receiver=event_receiver, outcome='saved')
+                except Exception as e:
+                    EVENTS_DISPATCHED.inc(receiver=event_receiver, outcome='failed')
+                    failed_events.append(
+                        self._failed_event(event_receiver, monitored_event, decoded_log, e, failed_events))
+
+        if failed_events:
+            FailedEventLog.objects.bulk_create(failed_events)
+            logger.error('{0} FailedEventLog entries created.'.format(len(failed_events)))
+
+    def _save_batch(self, event_receiver, events):
+        """Passes the events to the receiver `save_batch` method, if implemented.
 
-            try:
-                event_receiver_cls = import_string(event_receiver)
-                event_receiver_cls().save(decoded_event=decoded_log)
-            except Exception:
-                # Save the event information that caused the exception
-                failed_event = FailedEventLog.objects.create(
-                    event=decoded_log.event,
-                    transaction_hash=decoded_log.transactionHash.hex(),
-                    transaction_index=decoded_log.transactionIndex,
-                    block_hash=decoded_log.blockHash.hex(),
-                    block_number=decoded_log.blockNumber,
-                    log_index=decoded_log.logIndex,
-                    address=decoded_log.address,
-                    args=json.dumps(decoded_log.args, cls=HexJsonEncoder),
-                    monitored_event=self.decoder.monitored_events[(address, topic)]
-                )
-
-                logger.error('Exception while calling {0}. FailedEventLog entry with id {1} created.'.format(
-                    event_receiver, failed_event.pk), exc_info=True)
+        Returns:
+            bool: True if the events were saved
+
+        """
+        try:
+            receiver = self.get_event_receiver(event_receiver)
+            if not hasattr(receiver, 'save_batch'):
+                return False
+
+            # Roll back any partial writes, the events are retried one by one
+            with transaction.atomic(), RECEIVER_SECONDS.time(receiver=event_receiver):
+                receiver.save_batch([decoded_log for _, decoded_log in events])
+            EVENTS_DISPATCHED.inc(len(events), receiver=event_receiver, outcome='saved')
+            return True
+        except Exception:
+            logger.warning('Exception while calling {0}.save_batch, retrying every event separately.'.format(
+                event_receiver), exc_info=True)
+            return False
+
+    def _failed_event(self, event_receiver, monitored_event, decoded_log, exc, failed_events):
+        """Returns the (unsaved) `FailedEventLog` entry of an event whose receiver raised `exc`.
+
+        The traceback is logged only once per fingerprint in `failed_events`.
+        """
+        fingerprint = exception_fingerprint(exc)
+        if all(failed_event.error_fingerprint != fingerprint for failed_event in failed_events):
+            logger.error('Exception while calling {0} (fingerprint {1}).'.format(event_receiver, fingerprint),
+                         exc_info=True)
+
+        # Save the event information that caused the exception
+        return FailedEventLog(
+            event=decoded_log.event,
+            transaction_hash=decoded_log.transactionHash.hex(),
+            transaction_index=decoded_log.transactionIndex,
+            block_hash=decoded_log.blockHash.hex(),
+            block_number=decoded_log.blockNumber,
+            log_index=decoded_log.logIndex,
+            address=decoded_log.address,
+            args=json.dumps(decoded_log.args, cls=HexJsonEncoder),
+            monitored_event=monitored_event,
+            error_class='{0}.{1}'.format(type(exc).__module__, type(exc).__qualname__),
+            error_message=str(exc),
+            error_fingerprint=fingerprint,
+        )
 
     def check_for_state_updates(self, block_number):
         """If a MonitoredEvent has been added, updated, deleted, the decoder state is updated.
@@ -134,45 +577,203 @@ class EventListener:
             block_number: current working block
 
         """
-        update_required = cache.get(CACHE_UPDATE_KEY, False)
+        update_required = cache.get(get_cache_update_key(self.shard), False)
         if update_required:
             self.decoder.refresh_state(block_number=block_number)
-            refresh_cache_update_value(update_required=False)
+            refresh_cache_update_value(update_required=False, shard=self.shard)
+            self.release_event_receivers(
+                keep={monitored_event.event_receiver for monitored_event in self.decoder.monitored_events.values()})
 
     def execute(self):
         """Program loop, does all the underlying work."""
+        self.check_for_reorg()
         if getattr(settings, "ETHEREUM_LOGS_FILTER_AVAILABLE", False):
             self._execute_using_filters()
         else:
             self._execute_iterating_all_blocks()
 
+    def get_filtered_logs(self, from_block, to_block, filter_params=None):
+        """
+        Retrieves the monitored log entries from the given block range using `eth_getLogs`.
+
+        Instead of one query per (address, topic) pair, the monitored addresses are
+        grouped into address arrays of at most `ETHEREUM_LOGS_MAX_ADDRESSES` entries, queried
+        against the OR-list of all the monitored topics. Logs of unmonitored (address, topic)
+        combinations are later discarded by the decoder.
+
+        If the node rejects the range for returning too many results or times out, the range
+        is split in half and each half is queried separately. Rate limit errors are raised.
+
+        Args:
+            from_block (int): The first block number.
+            to_block (int): The last block number.
+            filter_params (dict): The address and topics filter, defaults to `get_log_filter_params`.
+
+        Returns:
+            The list of log entries, sorted by (blockNumber, logIndex).
+
+        """
+        span = to_block - from_block + 1
+        started = time.monotonic()
+        try:
+            all_logs = self._query_logs(from_block, to_block, filter_params)
+        except Exception as e:
+            if from_block == to_block or not self.block_range.is_range_error(e):
+                raise
+
+            logger.warning('Log query for blocks {0}-{1} failed, splitting range: {2}'.format(from_block, to_block, e))
+            self.block_range.shrink(span)
+            middle = (from_block + to_block) // 2
+            return self.get_filtered_logs(from_block, middle, filter_params) + \
+                self.get_filtered_logs(middle + 1, to_block, filter_params)
+
+        self.block_range.record_success(span, len(all_logs), time.monotonic() - started)
+        all_logs.sort(key=lambda log: (log["blockNumber"], log["logIndex"]))
+        return all_logs
+
+    def get_log_filter_params(self):
+        """Returns the address array and topic0 OR-list matching every monitored event."""
+        monitored = self.decoder.monitored_events.keys()
+        return {
+            "address": sorted({address for address, _ in monitored}),
+            "topics": [sorted({topic for _, topic in monitored})],
+        }
+
+    def _query_logs(self, from_block, to_block, filter_params=None):
+        filter_params = filter_params or self.get_log_filter_params()
+        addresses, topics = filter_params["address"], filter_params["topics"]
+        max_addresses = getattr(settings, "ETHEREUM_LOGS_MAX_ADDRESSES", 1000)
+        all_logs = []
+
+        for i in range(0, len(addresses), max_addresses):
+            all_logs.extend(self.web3.eth.getLogs({
+                "address": addresses[i:i + max_addresses],
+                "topics": topics,
+                "fromBlock": from_block,
+                "toBlock": to_block,
+            }))
+
+        return all_logs
+
     def _execute_using_filters(self):
-        """Uses filters to fetch required logs"""
+        """Uses stateless `eth_getLogs` queries to fetch required logs"""
         start, end = self._get_block_range()
         if start is None:
             return
-        all_logs = []
 
-        for (address, topic) in self.decoder.monitored_events.keys():
-            log_filter = self.web3.eth.filter({
-                "topics": [topic],
-                "address": address,
-                "fromBlock": start,
-                "toBlock": end,
-            })
-            all_logs.extend(log_filter.get_all_entries())
+        self.check_for_state_updates(start)
+        all_logs = self.get_range_logs(start, end)
+        if self.reorg_depth and not self._track_range(start, end, all_logs):
+            logger.warning('The chain changed while fetching blocks {0}-{1}, retrying later.'.format(start, end))
+            return
 
-        all_logs.sort(key=lambda log: (log["blockNumber"], log["logIndex"]))
-        decoded_logs = self.decoder.decode_logs(all_logs)
-        self.save_events(decoded_logs)
-        self.update_block_number(end)
+        self.process_blocks([(end, all_logs)])
+
+    def _track_range(self, start, end, logs):
+        """Tracks the last `ETHEREUM_REORG_DEPTH` blocks of a range fetched with `eth_getLogs`.
+
+        Returns:
+            bool: whether the blocks extend the processed chain and the logs belong to them
+
+        """
+        block_numbers = list(range(max(start, end - self.reorg_depth + 1), end + 1))
+        blocks = self.fetcher.get_blocks(block_numbers)
+        if self.track_blocks(blocks) < len(blocks):
+            return False
+
+        block_hashes = {block['number']: self.web3.toHex(block['hash']) for block in blocks}
+        return all(
+            self.web3.toHex(log['blockHash']) == block_hashes[log['blockNumber']]
+            for log in logs if log['blockNumber'] in block_hashes
+        )
+
+    def iter_pending_blocks_logs(self):
+        """Yields (block_number, logs) tuples for every pending block, in order."""
+        pending_blocks = self.get_pending_blocks()
+        batch_size = self.fetcher.batch_size
+        for i in range(0, len(pending_blocks), batch_size):
+            block_numbers = pending_blocks[i:i + batch_size]
+            with self.time_stage('fetch'):
+                blocks = self.fetcher.get_blocks(block_numbers)
+            canonical = self.track_blocks(blocks)
+            if canonical:
+                yield from zip(block_numbers, self.iter_block_logs(block_numbers[:canonical], blocks[:canonical]))
+            if canonical < len(block_numbers):
+                # The remaining blocks are processed after the next reorganization check
+                return
+
+    def process_blocks(self, blocks_logs):
+        """
+        Decodes and saves the given logs, advancing the block cursor.
+
+        Without checkpointing, the entries are processed in groups of `BlockFetcher.batch_size`, i.e. a
+        fetch batch, and the cursor is advanced after every group. When `ETHEREUM_CHECKPOINT_BLOCKS` is set,
+        the receiver side effects and the cursor advance of a group of entries are committed in a single
+        transaction, every `ETHEREUM_CHECKPOINT_BLOCKS` entries or `ETHEREUM_CHECKPOINT_SECONDS` seconds,
+        whichever comes first.
+
+        The logs of a group are dispatched at once, in chain order, so that `save_batch` receives the
+        events of every block of the group together.
+
+        Args:
+            blocks_logs (iterable): (block_number, logs) tuples, where `logs` are the relevant log
+                entries up to and including `block_number`.
+
+        """
+        blocks_logs = iter(blocks_logs)
+        if not self.checkpoint_blocks:
+            while True:
+                group = list(itertools.islice(blocks_logs, self.fetcher.batch_size))
+                if not group:
+                    return
+                self.save_events(self.decode_logs([log for _, logs in group for log in logs]))
+                self.update_block_number(group[-1][0])
+
+        exhausted = False
+        while not exhausted:
+            try:
+                with transaction.atomic():
+                    exhausted = self._process_checkpoint(blocks_logs)
+            except Exception:
+                # The cursor advance was rolled back along with the receiver side effects
+                self.daemon.refresh_from_db()
+                raise
+
+    def _process_checkpoint(self, blocks_logs):
+        """Processes entries until the next checkpoint is due.
+
+        Returns:
+            bool: True if there are no more entries to process
+
+        """
+        started = time.monotonic()
+        processed = 0
+        last_block_number = None
+        exhausted = True
+        group_logs = []
+
+        for block_number, logs in blocks_logs:
+            group_logs.extend(logs)
+            last_block_number = block_number
+            processed += 1
+
+            elapsed = time.monotonic() - started
+            if processed >= self.checkpoint_blocks or \
+                    (self.checkpoint_seconds is not None and elapsed >= self.checkpoint_seconds):
+                exhausted = False
+                break
+
+        if last_block_number is not None:
+            self.save_events(self.decode_logs(group_logs))
+            self.update_block_number(last_block_number)
+        return exhausted
 
     def _execute_iterating_all_blocks(self):
         """Executes iterating thru all blocks and txs"""
-        pending_blocks = self.get_pending_blocks()
-        for block in pending_blocks:
-            self.check_for_state_updates(block)
-            logs = self.get_block_logs(block)
-            decoded_logs = self.decoder.decode_logs(logs)
-            self.save_events(decoded_logs)
-            self.update_block_number(block)
+        self.process_blocks(self.iter_pending_blocks_logs())
+
+
+def get_event_listener_class():
+    """Returns the event listener class selected by the `ETHEREUM_EVENT_LISTENER` setting."""
+    return import_string(
+        getattr(settings, "ETHEREUM_EVENT_LISTENER", 'django_ethereum_events.event_listener.EventListener'))
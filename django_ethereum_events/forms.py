@@ -26,7 +26,7 @@ class MonitoredEventForm(forms.ModelForm):
 
     class Meta:
         model = MonitoredEvent
-        fields = ('name', 'contract_address', 'event_receiver')
+        fields = ('name', 'contract_address', 'event_receiver', 'backfill_from')
 
     def clean_contract_address(self):
         contract_address = self.cleaned_data['contract_address']
@@ -52,6 +52,13 @@ class MonitoredEventForm(forms.ModelForm):
 
         return contract_abi
 
+    def clean_backfill_from(self):
+        backfill_from = self.cleaned_data['backfill_from']
+
+        if backfill_from is not None and backfill_from < 0:
+            raise forms.ValidationError(_('Backfill block number must not be negative'))
+        return backfill_from
+
     def clean_event_receiver(self):
         event_receiver = self.cleaned_data['event_receiver']
 
@@ -0,0 +1,169 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import LOCK_CONTENTION, LOCK_HELD_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLost(Exception):
+    """Raised when a lease expired or was taken over while its holder was still working."""
+
+    pass
+
+
+class LeaseLock:
+    """Cache based lease lock with an expiry and a heartbeat.
+
+    The lock entry expires after `ETHEREUM_LOCK_TTL` seconds, so a worker killed while holding
+    the lock only blocks the others until the lease expires. While the lock is held, a heartbeat
+    thread renews the lease every third of the TTL.
+
+    The cache offers no compare-and-set: a holder whose lease expires between the check and the
+    renewal extends the lease of the next holder. The lock alone therefore does not guarantee
+    mutual exclusion, the writes it guards must be fenced, see `EventListener.acquire_fencing_token`.
+
+    Attributes:
+        token (int): the number of the current acquisition. It is kept in the cache and restarts
+            when the cache is cleared, so it must not be used as a fencing token.
+        lost (bool): whether the lease was lost while held
+        acquired_at (float): the `time.monotonic()` value of the acquisition
+
+    """
+
+    def __init__(self, lock_id, ttl=None):
+        """
+        Args:
+            lock_id (str): the cache key of the lock
+            ttl (float): the lease duration in seconds, defaults to the `ETHEREUM_LOCK_TTL` setting
+
+        """
+        self.lock_id = lock_id
+        self.ttl = ttl if ttl is not None else getattr(settings, "ETHEREUM_LOCK_TTL", 60)
+        self.token = None
+        self.lost = False
+        self.acquired_at = None
+        # The lock entry of the current acquisition, compared as a whole in case the token counter restarted
+        self._holder = None
+        self._stopped = threading.Event()
+        self._heartbeat = None
+
+    @property
+    def token_key(self):
+        return '{0}_fencing_token'.format(self.lock_id)
+
+    @property
+    def contention_key(self):
+        return '{0}_contention'.format(self.lock_id)
+
+    @property
+    def held_time(self):
+        """Seconds since the lock was acquired, None if not held."""
+        if self.acquired_at is None:
+            return None
+        return time.monotonic() - self.acquired_at
+
+    def _next_token(self):
+        cache.add(self.token_key, 0, timeout=None)
+        return cache.incr(self.token_key)
+
+    def acquire(self):
+        """Acquires the lock, unless it is held by another worker.
+
+        Returns:
+            bool: whether the lock was acquired
+
+        """
+        token = self._next_token()
+        holder = (token, time.time())
+        if not cache.add(self.lock_id, holder, timeout=self.ttl):
+            self._record_contention()
+            return False
+
+        self.token = token
+        self._holder = holder
+        self.lost = False
+        self.acquired_at = time.monotonic()
+        self._stopped.clear()
+        self._heartbeat = threading.Thread(target=self._renew_periodically, daemon=True)
+        self._heartbeat.start()
+        return True
+
+    def _record_contention(self):
+        cache.add(self.contention_key, 0, timeout=None)
+        contention = cache.incr(self.contention_key)
+        LOCK_CONTENTION.inc(lock=self.lock_id)
+
+        holder = cache.get(self.lock_id)
+        if holder is not None:
+            token, acquired = holder
+            logger.warning('Lock {0} is held by token {1} for {2:.0f} seconds (contended {3} times).'.format(
+                self.lock_id, token, time.time() - acquired, contention))
+
+    def get_contention(self):
+        """Returns the number of failed acquisitions of the lock."""
+        return cache.get(self.contention_key, 0)
+
+    def renew(self):
+        """Extends the lease by another TTL.
+
+        Raises:
+            LeaseLost: if the lease expired or was acquired by another worker
+
+        """
+        if cache.get(self.lock_id) != self._holder:
+            self.lost = True
+            raise LeaseLost('Lease of lock {0} lost (token {1})'.format(self.lock_id, self.token))
+
+        if hasattr(cache, 'touch'):
+            # Only extends the entry, so a lease lost meanwhile is not overwritten with this holder
+            cache.touch(self.lock_id, timeout=self.ttl)
+        else:  # Django < 2.1
+            cache.set(self.lock_id, self._holder, timeout=self.ttl)
+
+    def _renew_periodically(self):
+        while not self._stopped.wait(self.ttl / 3):
+            try:
+                self.renew()
+            except LeaseLost:
+                logger.error('Lease of lock {0} lost after {1:.0f} seconds.'.format(self.lock_id, self.held_time))
+                return
+            except Exception:
+                logger.warning('Failed to renew the lease of lock {0}.'.format(self.lock_id), exc_info=True)
+
+    def release(self):
+        """Stops the heartbeat and releases the lock, if still held."""
+        self._stopped.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+
+        if cache.get(self.lock_id) == self._holder:
+            cache.delete(self.lock_id)
+
+        held_time = self.held_time
+        LOCK_HELD_SECONDS.observe(held_time, lock=self.lock_id)
+        logger.info('Lock {0} released after {1:.1f} seconds.'.format(self.lock_id, held_time))
+        self.acquired_at = None
+
+
+@contextmanager
+def lease_lock(lock_id, ttl=None):
+    """Acquires a `LeaseLock` for the duration of the block.
+
+    Yields:
+        LeaseLock: the lock if acquired, else None
+
+    """
+    lock = LeaseLock(lock_id, ttl=ttl)
+    acquired = lock.acquire()
+    try:
+        yield lock if acquired else None
+    finally:
+        if acquired:
+            lock.release()
@@ -0,0 +1,26 @@
+from django.core.management import BaseCommand, CommandError
+
+from django_ethereum_events.backfill import EventBackfill
+from django_ethereum_events.lock import lease_lock
+from django_ethereum_events.tasks import BACKFILL_LOCK_KEY
+
+
+class Command(BaseCommand):
+    help = 'Backfills the history of the monitored events with a backfill block number.'
+
+    def handle(self, *args, **options):
+        with lease_lock(BACKFILL_LOCK_KEY) as lock:
+            if not lock:
+                raise CommandError('Event backfill is already running.')
+
+            backfill = EventBackfill()
+            try:
+                monitored_events = backfill.get_backfill_events()
+                for monitored_event in monitored_events:
+                    self.stdout.write('Backfilling {0} from block {1}.'.format(
+                        monitored_event, monitored_event.backfill_from))
+                    backfill.backfill_event(monitored_event)
+            finally:
+                backfill.close()
+
+        self.stdout.write(self.style.SUCCESS('{0} events backfilled.'.format(len(monitored_events))))
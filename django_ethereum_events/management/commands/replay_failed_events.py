@@ -0,0 +1,58 @@
+from django.core.management import BaseCommand
+
+from django_ethereum_events.models import FailedEventLog
+from django_ethereum_events.replay import FailedEventReplayer
+
+
+class Command(BaseCommand):
+    help = 'Replays the failed events through their event receivers, deleting the ones replayed successfully.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-r',
+            '--receiver',
+            action='store',
+            dest='receiver',
+            default=None,
+            help='Only replay the events of the given event receiver'
+        )
+        parser.add_argument(
+            '-f',
+            '--fingerprint',
+            action='store',
+            dest='fingerprint',
+            default=None,
+            help='Only replay the events that failed with the given error fingerprint'
+        )
+        parser.add_argument(
+            '-w',
+            '--workers',
+            type=int,
+            action='store',
+            dest='workers',
+            default=None,
+            help='Number of replay threads'
+        )
+        parser.add_argument(
+            '-b',
+            '--batch-size',
+            type=int,
+            action='store',
+            dest='batch_size',
+            default=None,
+            help='Number of events passed at once to the event receivers'
+        )
+
+    def handle(self, *args, **options):
+        queryset = FailedEventLog.objects.all()
+        if options['receiver']:
+            queryset = queryset.filter(monitored_event__event_receiver=options['receiver'])
+        if options['fingerprint']:
+            queryset = queryset.filter(error_fingerprint=options['fingerprint'])
+
+        replayer = FailedEventReplayer(workers=options['workers'], batch_size=options['batch_size'])
+        replayed, failed = replayer.replay(queryset)
+
+        self.stdout.write(self.style.SUCCESS(
+            '{0} failed events replayed, {1} still failing.'.format(replayed, failed)
+        ))
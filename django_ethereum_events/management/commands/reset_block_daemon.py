@@ -1,6 +1,6 @@
 from django.core.management import BaseCommand
 
-from django_ethereum_events.models import Daemon
+from django_ethereum_events.models import Daemon, DaemonShard
 
 
 class Command(BaseCommand):
@@ -17,10 +17,22 @@ class Command(BaseCommand):
             default=0,
             help='Block number to reset the counter to'
         )
+        parser.add_argument(
+            '-s',
+            '--shard',
+            type=int,
+            action='store',
+            dest='shard',
+            default=None,
+            help='Shard whose counter is reset, when ETHEREUM_SHARDS is greater than 1'
+        )
 
     def handle(self, *args, **options):
         block_number = options['block']
-        d = Daemon.get_solo()
+        if options['shard'] is None:
+            d = Daemon.get_solo()
+        else:
+            d, _ = DaemonShard.objects.get_or_create(shard=options['shard'])
         d.block_number = block_number
         d.last_error_block_number = 0
         d.save()
@@ -0,0 +1,118 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from django_ethereum_events.event_listener import get_event_listener_class
+from django_ethereum_events.lock import lease_lock
+from django_ethereum_events.subscription import NodeSubscription
+from django_ethereum_events.tasks import execute_listener, get_lock_key
+
+
+class Command(BaseCommand):
+    help = 'Runs the event listener continuously, polling the node for new blocks.'
+
+    def __init__(self, *args, **kwargs):
+        super(Command, self).__init__(*args, **kwargs)
+        self.stopped = threading.Event()
+        self.subscription = None
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-i',
+            '--interval',
+            type=float,
+            action='store',
+            dest='interval',
+            default=getattr(settings, "ETHEREUM_POLL_INTERVAL", 5),
+            help='Seconds to wait before polling for new blocks'
+        )
+        parser.add_argument(
+            '-s',
+            '--subscribe',
+            choices=['newHeads', 'logs'],
+            action='store',
+            dest='subscribe',
+            default=None,
+            help='Process new blocks as soon as they are announced by a WebSocket subscription'
+        )
+        parser.add_argument(
+            '--ws-uri',
+            action='store',
+            dest='ws_uri',
+            default=getattr(settings, "ETHEREUM_NODE_WS_URI", None),
+            help='WebSocket endpoint of the node, used with --subscribe'
+        )
+        parser.add_argument(
+            '--shard',
+            type=int,
+            action='store',
+            dest='shard',
+            default=0,
+            help='Shard of the monitored events to process, when ETHEREUM_SHARDS is greater than 1'
+        )
+
+    def stop(self, signum, frame):
+        self.stdout.write('Received signal {0}, stopping after the current iteration.'.format(signum))
+        self.stopped.set()
+        if self.subscription is not None:
+            self.subscription.stop()
+
+    @staticmethod
+    def has_pending_blocks(listener):
+        try:
+            return listener.daemon.block_number < listener.get_head_block_number()
+        except Exception:
+            return False
+
+    def wait(self, interval):
+        if self.subscription is not None:
+            self.subscription.wait(interval)
+        else:
+            self.stopped.wait(interval)
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        if options['subscribe'] and not options['ws_uri']:
+            raise CommandError('A WebSocket endpoint (--ws-uri or ETHEREUM_NODE_WS_URI) is required to subscribe.')
+
+        shard = options['shard']
+        if not 0 <= shard < getattr(settings, "ETHEREUM_SHARDS", 1):
+            raise CommandError('Shard {0} out of range.'.format(shard))
+
+        previous_handlers = {signum: signal.signal(signum, self.stop) for signum in (signal.SIGTERM, signal.SIGINT)}
+
+        try:
+            with lease_lock(get_lock_key(shard)) as lock:
+                if not lock:
+                    raise CommandError('Event listener is already running.')
+
+                # The listener, along with its decoder and provider state, is reused by every iteration
+                listener = get_event_listener_class()(shard=shard)
+                listener.acquire_fencing_token()
+                self.stdout.write('Event listener started, polling every {0} seconds.'.format(interval))
+
+                if options['subscribe']:
+                    self.subscription = NodeSubscription(
+                        options['ws_uri'], options['subscribe'], filter_params=listener.get_log_filter_params)
+                    self.subscription.start()
+
+                try:
+                    while not self.stopped.is_set():
+                        if lock.lost:
+                            raise CommandError('Event listener lock lost, another worker took over.')
+                        listener.daemon.refresh_from_db()
+
+                        # While catching up, the next range is processed right away
+                        if not execute_listener(listener) or not self.has_pending_blocks(listener):
+                            self.wait(interval)
+                finally:
+                    listener.close()
+        finally:
+            if self.subscription is not None:
+                self.subscription.stop()
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+
+        self.stdout.write(self.style.SUCCESS('Event listener stopped.'))
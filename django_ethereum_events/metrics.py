@@ -0,0 +1,208 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds, in seconds, of the histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '{0}="{1}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    ) + '}'
+
+
+class Metric:
+    """Base class of the metrics, a value per combination of label values.
+
+    Attributes:
+        name (str): the metric name
+        documentation (str): the metric help text
+        labelnames (tuple): the label names
+
+    """
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError('{0} expects the labels {1}, got {2}'.format(self.name, self.labelnames, sorted(labels)))
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def get(self, **labels):
+        """Returns the value of the given label values, None if never set."""
+        with self._lock:
+            return self._values.get(self._key(labels))
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        """Yields (name, labels, value) tuples, the labels being (name, value) tuples."""
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, tuple(zip(self.labelnames, key)), value
+
+
+class Counter(Metric):
+    """Monotonically increasing value."""
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Value that can go up and down."""
+
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    """Distribution of observed values, counted in cumulative buckets."""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super(Histogram, self).__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0))
+            # A new list, the samples being rendered are left untouched
+            counts = list(counts)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the duration of the block, in seconds."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, **labels)
+
+    def get(self, **labels):
+        """Returns the (count, sum) of the observations of the given label values, None if never observed."""
+        value = super(Histogram, self).get(**labels)
+        if value is None:
+            return None
+        counts, total = value
+        return counts[-1], total
+
+    def samples(self):
+        for name, labels, (counts, total) in super(Histogram, self).samples():
+            for bound, count in zip(self.buckets, counts):
+                yield name + '_bucket', labels + (('le', _format_value(bound)),), count
+            yield name + '_count', labels, counts[-1]
+            yield name + '_sum', labels, total
+
+
+class Registry:
+    """Collection of metrics, rendered in the Prometheus text exposition format.
+
+    The metrics are kept in memory, every process has its own values.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError('Metric {0} already registered'.format(metric.name))
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def get_metrics(self):
+        with self._lock:
+            return [self._metrics[name] for name in sorted(self._metrics)]
+
+    def reset(self):
+        """Clears the values of every metric."""
+        for metric in self.get_metrics():
+            metric.reset()
+
+    def render(self):
+        """Returns the metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.get_metrics():
+            lines.append('# HELP {0} {1}'.format(metric.name, metric.documentation))
+            lines.append('# TYPE {0} {1}'.format(metric.name, metric.type))
+            for name, labels, value in metric.samples():
+                lines.append('{0}{1} {2}'.format(name, _format_labels(labels), _format_value(value)))
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# Event listener
+STAGE_SECONDS = REGISTRY.histogram(
+    'ethereum_events_stage_seconds', 'Time spent in each event listener stage.', ('stage', 'shard'))
+BLOCKS_PROCESSED = REGISTRY.counter(
+    'ethereum_events_blocks_processed_total', 'Blocks processed by the event listener.', ('shard',))
+BLOCK_NUMBER = REGISTRY.gauge(
+    'ethereum_events_block_number', 'Last block processed by the event listener.', ('shard',))
+HEAD_LAG = REGISTRY.gauge(
+    'ethereum_events_head_lag_blocks', 'Blocks between the chain head and the last processed block.', ('shard',))
+EVENTS_DISPATCHED = REGISTRY.counter(
+    'ethereum_events_dispatched_total', 'Events passed to the event receivers.', ('receiver', 'outcome'))
+RECEIVER_SECONDS = REGISTRY.histogram(
+    'ethereum_events_receiver_seconds', 'Time spent in the event receivers.', ('receiver',))
+
+# Node requests
+RPC_SECONDS = REGISTRY.histogram(
+    'ethereum_events_rpc_seconds', 'JSON-RPC request latency, batches labelled by their first method.',
+    ('method', 'batch'))
+RPC_ERRORS = REGISTRY.counter(
+    'ethereum_events_rpc_errors_total', 'Failed JSON-RPC requests.', ('method', 'error'))
+RPC_CACHE = REGISTRY.counter(
+    'ethereum_events_rpc_cache_total', 'Lookups in the RPC response cache.', ('result',))
+
+# Locks
+LOCK_CONTENTION = REGISTRY.counter(
+    'ethereum_events_lock_contention_total', 'Failed lock acquisitions.', ('lock',))
+LOCK_HELD_SECONDS = REGISTRY.histogram(
+    'ethereum_events_lock_held_seconds', 'Time the locks were held.', ('lock',),
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600))
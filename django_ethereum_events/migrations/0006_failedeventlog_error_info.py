@@ -0,0 +1,28 @@
+# Generated by Django 3.1.14 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ethereum_events', '0005_auto_20180713_1130'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='failedeventlog',
+            name='error_class',
+            field=models.CharField(blank=True, help_text='Class of the raised exception', max_length=256),
+        ),
+        migrations.AddField(
+            model_name='failedeventlog',
+            name='error_fingerprint',
+            field=models.CharField(blank=True, db_index=True, help_text='Hash of the exception class and traceback frames', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='failedeventlog',
+            name='error_message',
+            field=models.TextField(blank=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.1.14 on 2026-10-18 13:12
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ethereum_events', '0006_failedeventlog_error_info'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessedBlock',
+            fields=[
+                ('block_number', models.IntegerField(primary_key=True, serialize=False)),
+                ('block_hash', models.CharField(max_length=66, validators=[django.core.validators.MinLengthValidator(66)])),
+                ('parent_hash', models.CharField(max_length=66, validators=[django.core.validators.MinLengthValidator(66)])),
+            ],
+            options={
+                'verbose_name': 'Processed Block',
+                'verbose_name_plural': 'Processed Blocks',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.1.14 on 2026-10-18 13:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ethereum_events', '0007_processedblock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monitoredevent',
+            name='backfill_block_number',
+            field=models.IntegerField(blank=True, help_text='Last block backfilled', null=True),
+        ),
+        migrations.AddField(
+            model_name='monitoredevent',
+            name='backfill_from',
+            field=models.IntegerField(blank=True, help_text='Block number from which the event history is backfilled', null=True),
+        ),
+    ]
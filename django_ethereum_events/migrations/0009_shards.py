@@ -0,0 +1,45 @@
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ethereum_events', '0008_monitoredevent_backfill'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DaemonShard',
+            fields=[
+                ('shard', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('block_number', models.IntegerField(default=0, help_text='Last block processed')),
+                ('last_error_block_number', models.IntegerField(default=0)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('modified', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Daemon Shard',
+                'verbose_name_plural': 'Daemon Shards',
+            },
+        ),
+        # The processed block hashes are only a reorganization detection window, recreate them keyed by shard
+        migrations.DeleteModel(
+            name='ProcessedBlock',
+        ),
+        migrations.CreateModel(
+            name='ProcessedBlock',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveIntegerField(default=0)),
+                ('block_number', models.IntegerField()),
+                ('block_hash', models.CharField(max_length=66, validators=[django.core.validators.MinLengthValidator(66)])),
+                ('parent_hash', models.CharField(max_length=66, validators=[django.core.validators.MinLengthValidator(66)])),
+            ],
+            options={
+                'verbose_name': 'Processed Block',
+                'verbose_name_plural': 'Processed Blocks',
+                'unique_together': {('shard', 'block_number')},
+            },
+        ),
+    ]
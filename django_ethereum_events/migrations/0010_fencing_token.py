@@ -0,0 +1,23 @@
+# Generated by Django 3.1.14 on 2026-10-18 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ethereum_events', '0009_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='daemon',
+            name='fencing_token',
+            field=models.BigIntegerField(default=0, help_text='Lock fencing token of the last update'),
+        ),
+        migrations.AddField(
+            model_name='daemonshard',
+            name='fencing_token',
+            field=models.BigIntegerField(default=0, help_text='Lock fencing token of the last update'),
+        ),
+    ]
@@ -7,25 +7,89 @@ try:
 except ImportError:
     from django.utils.translation import gettext_lazy as _
 
+from eth_abi.grammar import TupleType, parse
+from eth_utils import to_bytes
+from hexbytes import HexBytes
 from solo.models import SingletonModel
+from web3._utils.abi import normalize_event_input_types
+from web3._utils.events import get_event_abi_types_for_decoding
+from web3.datastructures import AttributeDict
 
 CACHE_UPDATE_KEY = '_django_ethereum_events_update_required'
 
 
+def _restore_arg(abi_type, value):
+    """Restores a decoded argument value stored as JSON, converting the `bytes` hexstrings back to `bytes`.
+
+    Args:
+        abi_type (ABIType): the parsed decoding type of the argument
+        value: the JSON value
+
+    """
+    if value is None:
+        return None
+    if abi_type.is_array:
+        return [_restore_arg(abi_type.item_type, item) for item in value]
+    if isinstance(abi_type, TupleType):
+        return tuple(_restore_arg(component, item) for component, item in zip(abi_type.components, value))
+    if abi_type.base == 'bytes':
+        return to_bytes(hexstr=value)
+    return value
+
+
 class Daemon(SingletonModel):
     """Model responsible for storing blockchain related information."""
 
     block_number = models.IntegerField(default=0, help_text=_('Last block processed'))
     last_error_block_number = models.IntegerField(default=0)
+    fencing_token = models.BigIntegerField(default=0, help_text=_('Lock fencing token of the last update'))
     created = models.DateTimeField(auto_now_add=True)
     modified = models.DateTimeField(auto_now=True)
 
 
+class DaemonShard(models.Model):
+    """Block cursor of a shard of the monitored events, used instead of `Daemon` when `ETHEREUM_SHARDS` > 1."""
+
+    shard = models.PositiveIntegerField(primary_key=True)
+    block_number = models.IntegerField(default=0, help_text=_('Last block processed'))
+    last_error_block_number = models.IntegerField(default=0)
+    fencing_token = models.BigIntegerField(default=0, help_text=_('Lock fencing token of the last update'))
+    created = models.DateTimeField(auto_now_add=True)
+    modified = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _('Daemon Shard')
+        verbose_name_plural = _('Daemon Shards')
+
+    def __str__(self):
+        return 'Shard {0}'.format(self.shard)
+
+
+class ProcessedBlock(models.Model):
+    """Holds the hashes of the most recently processed blocks, used to detect chain reorganizations.
+
+    Only the last `ETHEREUM_REORG_DEPTH` blocks of every shard are kept.
+    """
+
+    shard = models.PositiveIntegerField(default=0)
+    block_number = models.IntegerField()
+    block_hash = models.CharField(max_length=66, validators=[MinLengthValidator(66)])
+    parent_hash = models.CharField(max_length=66, validators=[MinLengthValidator(66)])
+
+    class Meta:
+        verbose_name = _('Processed Block')
+        verbose_name_plural = _('Processed Blocks')
+        unique_together = ('shard', 'block_number')
+
+    def __str__(self):
+        return '{0} ({1})'.format(self.block_number, self.block_hash)
+
+
 class EventManager(models.Manager):
     """Model manager for MonitoredEvent model."""
 
     @staticmethod
-    def register_event(event_name, contract_address, contract_abi, event_receiver):
+    def register_event(event_name, contract_address, contract_abi, event_receiver, backfill_from=None):
         """Helper function that creates a new MonitoredEvent.
 
         Args:
@@ -33,6 +97,7 @@ class EventManager(models.Manager):
             contract_address (str): the address of the contract emitting the event (hexstring)
             contract_abi (obj): the contract abi either as `str` or `dict`
             event_receiver (str): module in which the event information is passed, must be importable
+            backfill_from (int): block number from which the event history is backfilled (optional)
 
         Returns:
             The created MonitoredEvent object
@@ -45,7 +110,8 @@ class EventManager(models.Manager):
             'name': event_name,
             'contract_address': contract_address,
             'event_receiver': event_receiver,
-            'contract_abi': contract_abi
+            'contract_abi': contract_abi,
+            'backfill_from': backfill_from,
         })
 
         if form.is_valid():
@@ -65,6 +131,9 @@ class MonitoredEvent(models.Model):
     event_receiver = models.CharField(max_length=256)
     monitored_from = models.IntegerField(blank=True, null=True,
                                          help_text=_('Block number in which monitoring for this event started'))
+    backfill_from = models.IntegerField(blank=True, null=True,
+                                        help_text=_('Block number from which the event history is backfilled'))
+    backfill_block_number = models.IntegerField(blank=True, null=True, help_text=_('Last block backfilled'))
 
     objects = EventManager()
 
@@ -76,6 +145,17 @@ class MonitoredEvent(models.Model):
     def __str__(self):
         return '{0} at {1}'.format(self.name, self.contract_address)
 
+    @property
+    def backfill_pending(self):
+        """Whether blocks between `backfill_from` and `monitored_from` remain to be backfilled."""
+        if self.backfill_from is None or self.monitored_from is None:
+            return False
+
+        backfill_block_number = self.backfill_block_number
+        if backfill_block_number is None:
+            backfill_block_number = self.backfill_from - 1
+        return backfill_block_number < self.monitored_from - 1
+
     @property
     def event_abi_parsed(self):
         if hasattr(self, '_event_abi_parsed'):
@@ -103,6 +183,10 @@ class FailedEventLog(models.Model):
     address = models.CharField(max_length=42, validators=[MinLengthValidator(42)])
     args = models.TextField(default="{}")  # noqa: P103
     monitored_event = models.ForeignKey(MonitoredEvent, related_name='failed_events', on_delete=models.CASCADE)
+    error_class = models.CharField(max_length=256, blank=True, help_text=_('Class of the raised exception'))
+    error_message = models.TextField(blank=True)
+    error_fingerprint = models.CharField(max_length=40, blank=True, db_index=True,
+                                         help_text=_('Hash of the exception class and traceback frames'))
     created = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -111,3 +195,35 @@ class FailedEventLog(models.Model):
 
     def __str__(self):
         return self.event
+
+    def get_decoded_event(self):
+        """Rebuilds the decoded event that was passed to the event receiver.
+
+        The `bytes` arguments, stored as hexstrings, are converted back to `bytes` using the types the
+        event abi inputs are decoded with, so indexed dynamic arguments (e.g. `string`) are restored as
+        their `bytes32` hash. Arrays and tuples are restored recursively.
+
+        Returns:
+            AttributeDict: the decoded event, as returned from `Decoder.decode_log`
+
+        Raises:
+            ValueError: if a stored argument does not match the event abi
+            TypeError: if a stored argument does not match the event abi
+        """
+        args = json.loads(self.args)
+        inputs = normalize_event_input_types(self.monitored_event.event_abi_parsed['inputs'])
+        for event_input, type_str in zip(inputs, get_event_abi_types_for_decoding(inputs)):
+            name = event_input['name']
+            if name in args:
+                args[name] = _restore_arg(parse(type_str), args[name])
+
+        return AttributeDict.recursive({
+            'args': args,
+            'event': self.event,
+            'logIndex': self.log_index,
+            'transactionIndex': self.transaction_index,
+            'transactionHash': HexBytes(self.transaction_hash),
+            'address': self.address,
+            'blockHash': HexBytes(self.block_hash),
+            'blockNumber': self.block_number,
+        })
@@ -0,0 +1,233 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+from django.conf import settings
+
+from requests.exceptions import RequestException
+from web3.providers import BaseProvider
+
+from .rpc import BatchHTTPProvider
+
+logger = logging.getLogger(__name__)
+
+# Errors caused by the endpoint itself rather than by the request, the request is sent to another endpoint
+ENDPOINT_ERRORS = (RequestException, json.JSONDecodeError)
+
+# Read-only methods, safe to send to two endpoints at once
+HEDGED_METHOD_PREFIXES = ('eth_get', 'eth_call', 'eth_blockNumber', 'eth_chainId', 'net_version')
+
+# Number of latency samples kept per endpoint, and needed before hedging its requests
+LATENCY_SAMPLES = 100
+MIN_HEDGE_SAMPLES = 20
+
+
+class Endpoint:
+    """A node of a `PooledHTTPProvider`, along with its load and health statistics.
+
+    Attributes:
+        provider (BatchHTTPProvider): the provider sending the requests to the node
+        in_flight (int): the number of requests currently sent to the node
+        failures (int): the number of consecutive failed requests
+        ejected_until (float): the `time.monotonic()` value the node is ejected until, None if healthy
+
+    """
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.in_flight = 0
+        self.failures = 0
+        self.ejected_until = None
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def __str__(self):
+        return self.provider.endpoint_uri
+
+    @property
+    def healthy(self):
+        return self.ejected_until is None or self.ejected_until <= time.monotonic()
+
+    def get_latency_percentile(self, percentile):
+        """Returns the given percentile of the recent request latencies, None without enough samples."""
+        if len(self.latencies) < MIN_HEDGE_SAMPLES:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percentile / 100))]
+
+
+class PooledHTTPProvider(BaseProvider):
+    """Provider spreading the requests over several nodes.
+
+    Every request is sent to the healthy endpoint with the fewest requests in flight (the one with
+    the lowest median latency on ties). A read request still unanswered after the
+    `ETHEREUM_POOL_HEDGE_PERCENTILE` latency percentile of its endpoint is also sent to the next
+    endpoint, and the first response is used. The requests of a hedged read run on threads of their
+    own rather than on a shared pool, so the pool never caps the number of concurrent requests.
+
+    A request failing with a connection, timeout or HTTP error is sent to the next endpoint. An
+    endpoint failing `ETHEREUM_POOL_EJECT_FAILURES` times in a row is ejected from the pool for
+    `ETHEREUM_POOL_EJECT_SECONDS` seconds. When every endpoint is ejected, they are all used again.
+
+    JSON-RPC error responses are returned as is, they do not count as endpoint failures.
+    """
+
+    def __init__(self, endpoint_uris, request_kwargs=None, hedge_percentile=None, eject_failures=None,
+                 eject_seconds=None, sessions=None):
+        """
+        Args:
+            endpoint_uris (list): the node URIs
+            request_kwargs (dict): the `requests` keyword arguments of every endpoint
+            hedge_percentile (float): latency percentile after which reads are hedged, 0 to disable,
+                defaults to `ETHEREUM_POOL_HEDGE_PERCENTILE`
+            eject_failures (int): consecutive failures ejecting an endpoint,
+                defaults to `ETHEREUM_POOL_EJECT_FAILURES`
+            eject_seconds (float): ejection duration, defaults to `ETHEREUM_POOL_EJECT_SECONDS`
+            sessions (HTTPSessions): the sessions of every endpoint, optional
+
+        """
+        if not endpoint_uris:
+            raise ValueError('PooledHTTPProvider requires at least one endpoint')
+
+        self.endpoints = [
+            Endpoint(BatchHTTPProvider(endpoint_uri=uri, request_kwargs=request_kwargs, sessions=sessions))
+            for uri in endpoint_uris
+        ]
+        self.hedge_percentile = hedge_percentile if hedge_percentile is not None else \
+            getattr(settings, "ETHEREUM_POOL_HEDGE_PERCENTILE", 95)
+        self.eject_failures = eject_failures or getattr(settings, "ETHEREUM_POOL_EJECT_FAILURES", 3)
+        self.eject_seconds = eject_seconds if eject_seconds is not None else \
+            getattr(settings, "ETHEREUM_POOL_EJECT_SECONDS", 30)
+
+        self._lock = threading.Lock()
+        super(PooledHTTPProvider, self).__init__()
+
+    def __str__(self):
+        return 'Pool of {0} endpoints: {1}'.format(len(self.endpoints), ', '.join(map(str, self.endpoints)))
+
+    def get_endpoints(self):
+        """Returns the endpoints in the order they should be tried: healthy ones first, least loaded first."""
+        with self._lock:
+            endpoints = [endpoint for endpoint in self.endpoints if endpoint.healthy]
+            if not endpoints:
+                # Rather than failing every request, try the endpoints due back first
+                return sorted(self.endpoints, key=lambda endpoint: endpoint.ejected_until)
+
+            return sorted(endpoints, key=lambda endpoint: (
+                endpoint.in_flight,
+                endpoint.get_latency_percentile(50) or 0,
+            )) + [endpoint for endpoint in self.endpoints if not endpoint.healthy]
+
+    def _send(self, endpoint, send):
+        with self._lock:
+            endpoint.in_flight += 1
+
+        started = time.monotonic()
+        try:
+            response = send(endpoint.provider)
+        except ENDPOINT_ERRORS:
+            with self._lock:
+                endpoint.in_flight -= 1
+                endpoint.failures += 1
+                if endpoint.failures >= self.eject_failures and endpoint.healthy:
+                    endpoint.ejected_until = time.monotonic() + self.eject_seconds
+                    logger.warning('Endpoint {0} ejected for {1} seconds after {2} failures.'.format(
+                        endpoint, self.eject_seconds, endpoint.failures))
+            raise
+        except Exception:
+            with self._lock:
+                endpoint.in_flight -= 1
+            raise
+
+        with self._lock:
+            endpoint.in_flight -= 1
+            endpoint.failures = 0
+            endpoint.ejected_until = None
+            endpoint.latencies.append(time.monotonic() - started)
+        return response
+
+    def _submit(self, endpoint, send):
+        """Sends a request on a new thread, returns its `Future`.
+
+        A thread per request rather than a bounded executor: the requests would otherwise queue behind
+        each other, and the time spent queued would be mistaken for endpoint latency.
+        """
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(self._send(endpoint, send))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, daemon=True).start()
+        return future
+
+    def _request(self, hedged, send):
+        """Sends a request, hedging it if allowed and failing over to the next endpoints.
+
+        Args:
+            hedged (bool): whether the request may be sent to two endpoints at once
+            send (callable): sends the request with the given endpoint provider
+
+        Returns:
+            the response of the first endpoint answering
+
+        """
+        endpoints = self.get_endpoints()
+        hedge_delay = None
+        if hedged and self.hedge_percentile and len(endpoints) > 1:
+            hedge_delay = endpoints[0].get_latency_percentile(self.hedge_percentile)
+
+        if hedge_delay is None:
+            last_error = None
+            for endpoint in endpoints:
+                try:
+                    return self._send(endpoint, send)
+                except ENDPOINT_ERRORS as e:
+                    logger.warning('Request to {0} failed: {1}'.format(endpoint, e))
+                    last_error = e
+            raise last_error
+
+        return self._hedged_request(endpoints, hedge_delay, send)
+
+    def _hedged_request(self, endpoints, hedge_delay, send):
+        remaining = list(endpoints)
+        pending = {self._submit(remaining.pop(0), send)}
+        done, pending = wait(pending, timeout=hedge_delay)
+        if not done:
+            logger.debug('Hedging request after {0:.3f} seconds.'.format(hedge_delay))
+            pending.add(self._submit(remaining.pop(0), send))
+
+        last_error = None
+        while True:
+            for future in done:
+                try:
+                    # The other request keeps running, its endpoint statistics are still recorded
+                    return future.result()
+                except ENDPOINT_ERRORS as e:
+                    last_error = e
+
+            if not pending:
+                if not remaining:
+                    raise last_error
+                pending = {self._submit(remaining.pop(0), send)}
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+    def make_request(self, method, params):
+        return self._request(
+            method.startswith(HEDGED_METHOD_PREFIXES),
+            lambda provider: provider.make_request(method, params),
+        )
+
+    def make_batch_request(self, calls):
+        """Sends the given calls as a single JSON-RPC batch array, see `BatchHTTPProvider.make_batch_request`."""
+        return self._request(
+            all(method.startswith(HEDGED_METHOD_PREFIXES) for method, _ in calls),
+            lambda provider: provider.make_batch_request(calls),
+        )
+
+    def isConnected(self):
+        return any(endpoint.provider.isConnected() for endpoint in self.endpoints)
@@ -0,0 +1,329 @@
+import json
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+
+from requests.exceptions import ConnectionError as RequestConnectionError, HTTPError, Timeout
+
+from .metrics import RPC_ERRORS, RPC_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Fragments of the error messages returned by hosted providers when a quota is exceeded
+RATE_LIMIT_MESSAGES = (
+    'rate limit',
+    'too many requests',
+    'compute units',
+    'capacity',
+)
+
+# HTTP status codes of requests worth retrying, 429 means the quota is exceeded
+THROTTLED_STATUS = 429
+RETRIED_STATUSES = (THROTTLED_STATUS, 502, 503, 504)
+
+
+class CircuitOpen(Exception):
+    """Raised when a call is refused because the node failed too many times in a row."""
+
+    pass
+
+
+def is_rate_limit_error(error):
+    """Whether the given JSON-RPC error means the request was throttled.
+
+    Args:
+        error: the `error` member of a JSON-RPC response, a dict or a string
+
+    Returns:
+        bool: whether the error is a rate limit error
+
+    """
+    if isinstance(error, dict):
+        if error.get('code') == THROTTLED_STATUS:
+            return True
+        error = error.get('message', '')
+    message = str(error).lower()
+    return any(fragment in message for fragment in RATE_LIMIT_MESSAGES)
+
+
+class TokenBucket:
+    """Token bucket limiting the cost of the requests sent per second.
+
+    The bucket holds up to `capacity` tokens and is refilled with `rate` tokens per second. A request
+    takes its cost from the bucket, waiting for the missing tokens if needed, so the requests are
+    spread evenly instead of being sent in bursts.
+
+    The rate is lowered by a quarter whenever the node throttles a request and is raised back by a
+    hundredth of the configured rate after every successful request, so the throughput settles just
+    under the actual quota.
+
+    Attributes:
+        rate (float): the current refill rate, in tokens per second
+
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        Args:
+            rate (float): the refill rate, in tokens per second
+            capacity (float): the bucket size, defaults to one second worth of tokens
+
+        """
+        self.max_rate = rate
+        self.min_rate = rate / 10
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, cost):
+        """Takes the given number of tokens, waiting until they are available.
+
+        Returns:
+            float: the seconds waited
+
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # The tokens are reserved right away, the concurrent callers wait in line
+            self.tokens -= cost
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def throttle(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * 0.75)
+        logger.info('Request rate lowered to {0:.1f} per second.'.format(self.rate))
+
+    def recover(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 100)
+
+
+class CircuitBreaker:
+    """Stops calling a node that failed `failure_threshold` times in a row.
+
+    Once open, the circuit refuses every call for `reset_seconds`. A single trial call is then let
+    through: the circuit closes again if it succeeds and reopens if it fails.
+    """
+
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def before_call(self):
+        """Checks that a call is allowed.
+
+        Raises:
+            CircuitOpen: if the circuit is open
+
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return
+
+            remaining = self.opened_at + self.reset_seconds - time.monotonic()
+            if remaining > 0 or self._trial:
+                raise CircuitOpen('Circuit open after {0} failures, retry in {1:.0f} seconds'.format(
+                    self.failures, max(remaining, 0)))
+            self._trial = True
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info('Circuit closed.')
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or (self.opened_at is None and self.failures >= self.failure_threshold):
+                logger.warning('Circuit opened for {0} seconds after {1} failures.'.format(
+                    self.reset_seconds, self.failures))
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+
+class RequestScheduler:
+    """Paces, retries and guards the requests sent to the node.
+
+    Every request takes its cost from a `TokenBucket` of `ETHEREUM_RPC_RATE_LIMIT` units per second
+    (unlimited when not set). The cost of a method is given by `ETHEREUM_RPC_METHOD_COSTS`, 1 by
+    default; the cost of a batch is the sum of its calls.
+
+    Throttled requests (HTTP 429 or a rate limit JSON-RPC error), connection errors, timeouts and HTTP
+    502, 503 and 504 responses are retried up to `ETHEREUM_RPC_RETRIES` times, after an exponential backoff
+    with full jitter, starting at `ETHEREUM_RPC_BACKOFF` seconds and capped at
+    `ETHEREUM_RPC_BACKOFF_MAX` seconds, or after the `Retry-After` delay given by the node.
+
+    A `CircuitBreaker` stops calling the node for `ETHEREUM_RPC_BREAKER_SECONDS` seconds after
+    `ETHEREUM_RPC_BREAKER_FAILURES` consecutive connection errors, timeouts or server errors. Any
+    other outcome, including a client error or a throttled request, shows that the node answers.
+
+    The latency and the errors of every attempt are recorded in the metrics registry.
+    """
+
+    def __init__(self, rate=None, burst=None, method_costs=None, retries=None, backoff=None, backoff_max=None,
+                 breaker_failures=None, breaker_seconds=None):
+        """
+        Args:
+            rate (float): cost units per second, defaults to `ETHEREUM_RPC_RATE_LIMIT`
+            burst (float): token bucket capacity, defaults to `ETHEREUM_RPC_BURST`
+            method_costs (dict): method => cost, defaults to `ETHEREUM_RPC_METHOD_COSTS`
+            retries (int): retries per request, defaults to `ETHEREUM_RPC_RETRIES`
+            backoff (float): first backoff in seconds, defaults to `ETHEREUM_RPC_BACKOFF`
+            backoff_max (float): longest backoff in seconds, defaults to `ETHEREUM_RPC_BACKOFF_MAX`
+            breaker_failures (int): failures opening the circuit, defaults to `ETHEREUM_RPC_BREAKER_FAILURES`
+            breaker_seconds (float): seconds the circuit stays open, defaults to `ETHEREUM_RPC_BREAKER_SECONDS`
+
+        """
+        rate = rate or getattr(settings, "ETHEREUM_RPC_RATE_LIMIT", 0)
+        burst = burst or getattr(settings, "ETHEREUM_RPC_BURST", None)
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.method_costs = method_costs if method_costs is not None else \
+            getattr(settings, "ETHEREUM_RPC_METHOD_COSTS", {})
+        self.retries = retries if retries is not None else getattr(settings, "ETHEREUM_RPC_RETRIES", 5)
+        self.backoff = backoff or getattr(settings, "ETHEREUM_RPC_BACKOFF", 0.5)
+        self.backoff_max = backoff_max or getattr(settings, "ETHEREUM_RPC_BACKOFF_MAX", 30)
+        self.breaker = CircuitBreaker(
+            breaker_failures or getattr(settings, "ETHEREUM_RPC_BREAKER_FAILURES", 5),
+            breaker_seconds or getattr(settings, "ETHEREUM_RPC_BREAKER_SECONDS", 30),
+        )
+
+    def get_cost(self, methods):
+        return sum(self.method_costs.get(method, 1) for method in methods)
+
+    def get_backoff(self, attempt, retry_after=None):
+        """Returns the seconds to wait before the given retry, using exponential backoff with full jitter."""
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+
+    @staticmethod
+    def _get_retry_after(error):
+        try:
+            return float(error.response.headers['Retry-After'])
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _is_throttled(response):
+        responses = response if isinstance(response, list) else [response]
+        return any(
+            isinstance(response, dict) and 'error' in response and is_rate_limit_error(response['error'])
+            for response in responses
+        )
+
+    def _send(self, method, batch, send):
+        try:
+            with RPC_SECONDS.time(method=method, batch=batch):
+                response = send()
+        except Exception as e:
+            RPC_ERRORS.inc(method=method, error=type(e).__name__)
+            raise
+
+        if self._is_throttled(response):
+            RPC_ERRORS.inc(method=method, error='RateLimited')
+        return response
+
+    def call(self, methods, send):
+        """Sends a request, once allowed by the token bucket and the circuit breaker, retrying it if needed.
+
+        A throttled batch is retried as a whole.
+
+        Args:
+            methods (list): the JSON-RPC methods of the request, one per call of a batch
+            send (callable): sends the request and returns the response
+
+        Returns:
+            the response
+
+        Raises:
+            CircuitOpen: if the node failed too many times in a row
+
+        """
+        cost = self.get_cost(methods)
+        method, batch = methods[0], len(methods) > 1
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            if self.bucket is not None:
+                self.bucket.acquire(cost)
+
+            retry_after = None
+            # Every outcome is recorded, so that a trial call always closes or reopens the circuit
+            node_failed = True
+            try:
+                response = self._send(method, batch, send)
+            except HTTPError as e:
+                status = getattr(e.response, 'status_code', None)
+                node_failed = status is None or status >= 500
+                if status == THROTTLED_STATUS:
+                    self._throttled()
+                if status not in RETRIED_STATUSES or attempt >= self.retries:
+                    raise
+                retry_after = self._get_retry_after(e)
+                error = e
+            except (RequestConnectionError, Timeout) as e:
+                if attempt >= self.retries:
+                    raise
+                error = e
+            except ValueError as e:
+                # A node rejecting a whole batch, see `BatchHTTPProvider.make_batch_request`
+                node_failed = isinstance(e, json.JSONDecodeError)
+                if not (e.args and is_rate_limit_error(e.args[0])) or attempt >= self.retries:
+                    raise
+                self._throttled()
+                error = e
+            else:
+                node_failed = False
+                if not self._is_throttled(response) or attempt >= self.retries:
+                    if self.bucket is not None:
+                        self.bucket.recover()
+                    return response
+                self._throttled()
+                error = 'rate limited'
+            finally:
+                if node_failed:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+
+            delay = self.get_backoff(attempt, retry_after)
+            logger.warning('Request {0} failed ({1}), retry {2} of {3} in {4:.2f} seconds.'.format(
+                methods[0] if len(methods) == 1 else '{0} batch'.format(methods[0]),
+                error, attempt + 1, self.retries, delay))
+            time.sleep(delay)
+            attempt += 1
+
+    def _throttled(self):
+        if self.bucket is not None:
+            self.bucket.throttle()
+
+
+def construct_scheduler_middleware(scheduler):
+    """Returns a `web3` middleware sending every request through the given `RequestScheduler`."""
+    def scheduler_middleware(make_request, web3):
+        def middleware(method, params):
+            return scheduler.call([method], lambda: make_request(method, params))
+        return middleware
+    return scheduler_middleware
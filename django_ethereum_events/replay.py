@@ -0,0 +1,164 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+from .models import FailedEventLog
+from .utils import exception_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Keeps the `pk__in` lookups below the query parameter limit of every database backend
+DELETE_CHUNK_SIZE = 500
+
+
+class FailedEventReplayer:
+    """Replays `FailedEventLog` entries through their event receivers.
+
+    The entries are grouped by event receiver and split into batches of `ETHEREUM_REPLAY_BATCH_SIZE`
+    entries, which are replayed on a pool of `ETHEREUM_REPLAY_WORKERS` threads. Receivers implementing
+    `save_batch` receive a whole batch at once; if the batch fails, or the receiver only implements
+    `save`, the events are passed one by one to `save`. The entries that were replayed successfully
+    are deleted in bulk as soon as their batch is done, the others are kept. Entries whose event
+    cannot be rebuilt are counted as failed.
+
+    The entries of a batch are replayed in chain order, but the batches run concurrently.
+    """
+
+    def __init__(self, workers=None, batch_size=None):
+        """
+        Args:
+            workers (int): number of replay threads, defaults to `ETHEREUM_REPLAY_WORKERS`
+            batch_size (int): entries per batch, defaults to `ETHEREUM_REPLAY_BATCH_SIZE`
+
+        """
+        self.workers = workers or getattr(settings, "ETHEREUM_REPLAY_WORKERS", 4)
+        self.batch_size = batch_size or getattr(settings, "ETHEREUM_REPLAY_BATCH_SIZE", 500)
+
+    def replay(self, queryset=None):
+        """Replays the given entries.
+
+        Args:
+            queryset (QuerySet): the `FailedEventLog` entries to replay, defaults to all of them
+
+        Returns:
+            tuple: the number of replayed and the number of still failing entries
+
+        """
+        if queryset is None:
+            queryset = FailedEventLog.objects.all()
+        queryset = queryset.select_related('monitored_event').order_by('pk')
+
+        replayed = failed = 0
+        last_pk = None
+        chunk_size = self.batch_size * self.workers
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+                failed_events = list(chunk[:chunk_size])
+                if not failed_events:
+                    break
+                last_pk = failed_events[-1].pk
+
+                futures = [
+                    executor.submit(self._replay_batch_in_thread, *batch)
+                    for batch in self._get_batches(failed_events)
+                ]
+                succeeded = 0
+                for future in as_completed(futures):
+                    try:
+                        batch_succeeded = future.result()
+                    except Exception:
+                        logger.error('Exception while replaying a batch.', exc_info=True)
+                        continue
+                    # Deleted right away, a failing batch does not cause the others to be replayed again
+                    self._delete(batch_succeeded)
+                    succeeded += len(batch_succeeded)
+
+                replayed += succeeded
+                failed += len(failed_events) - succeeded
+                logger.info('Replayed {0} failed events, {1} still failing.'.format(replayed, failed))
+
+        return replayed, failed
+
+    def _get_batches(self, failed_events):
+        """Groups the entries by event receiver, in chain order, and splits them in batches."""
+        failed_events = sorted(failed_events, key=lambda failed_event: (
+            failed_event.block_number, failed_event.log_index, failed_event.pk))
+
+        by_receiver = {}
+        for failed_event in failed_events:
+            by_receiver.setdefault(failed_event.monitored_event.event_receiver, []).append(failed_event)
+
+        for event_receiver, receiver_events in by_receiver.items():
+            for i in range(0, len(receiver_events), self.batch_size):
+                yield event_receiver, receiver_events[i:i + self.batch_size]
+
+    def _replay_batch_in_thread(self, event_receiver, failed_events):
+        try:
+            return self.replay_batch(event_receiver, failed_events)
+        finally:
+            # Every worker thread opens its own database connection
+            connection.close()
+
+    def replay_batch(self, event_receiver, failed_events):
+        """Replays a batch of entries of the same event receiver.
+
+        Args:
+            event_receiver (str): the event receiver path
+            failed_events (list): the `FailedEventLog` entries
+
+        Returns:
+            list: the primary keys of the entries that were replayed successfully
+
+        """
+        try:
+            receiver = import_string(event_receiver)()
+            receiver.setup()
+        except Exception:
+            logger.error('Cannot instantiate {0}.'.format(event_receiver), exc_info=True)
+            return []
+
+        try:
+            rebuilt_events, decoded_events = [], []
+            for failed_event in failed_events:
+                try:
+                    decoded_events.append(failed_event.get_decoded_event())
+                    rebuilt_events.append(failed_event)
+                except Exception:
+                    logger.error('Cannot rebuild the event of {0} {1}.'.format(
+                        type(failed_event).__name__, failed_event.pk), exc_info=True)
+            failed_events = rebuilt_events
+
+            if failed_events and hasattr(receiver, 'save_batch'):
+                try:
+                    with transaction.atomic():
+                        receiver.save_batch(decoded_events)
+                    return [failed_event.pk for failed_event in failed_events]
+                except Exception:
+                    logger.warning('Exception while calling {0}.save_batch, replaying every event separately.'.format(
+                        event_receiver), exc_info=True)
+
+            succeeded = []
+            fingerprints = set()
+            for failed_event, decoded_event in zip(failed_events, decoded_events):
+                try:
+                    with transaction.atomic():
+                        receiver.save(decoded_event=decoded_event)
+                    succeeded.append(failed_event.pk)
+                except Exception as e:
+                    fingerprint = exception_fingerprint(e)
+                    if fingerprint not in fingerprints:
+                        fingerprints.add(fingerprint)
+                        logger.error('Exception while replaying {0} (fingerprint {1}).'.format(
+                            event_receiver, fingerprint), exc_info=True)
+            return succeeded
+        finally:
+            receiver.teardown()
+
+    @staticmethod
+    def _delete(pks):
+        for i in range(0, len(pks), DELETE_CHUNK_SIZE):
+            FailedEventLog.objects.filter(pk__in=pks[i:i + DELETE_CHUNK_SIZE]).delete()
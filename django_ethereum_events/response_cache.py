@@ -0,0 +1,190 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .metrics import RPC_CACHE
+from .utils import HexJsonEncoder
+
+logger = logging.getLogger(__name__)
+
+# Methods whose results never change once their block is final
+CACHEABLE_METHODS = ('eth_getBlockByNumber', 'eth_getBlockReceipts', 'eth_getTransactionReceipt')
+
+# The head block number used to decide finality is refreshed at most this often
+HEAD_REFRESH_SECONDS = 5
+
+
+class DiskResponseTier:
+    """On-disk tier of the `ResponseCache`, stored in an SQLite file."""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(os.path.join(directory, 'responses.sqlite3'), check_same_thread=False)
+        with self._lock, self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+
+    def get(self, key):
+        with self._lock:
+            row = self.connection.execute('SELECT value FROM responses WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_many(self, items):
+        with self._lock, self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO responses (key, value) VALUES (?, ?)',
+                [(key, json.dumps(value)) for key, value in items])
+
+    def close(self):
+        self.connection.close()
+
+
+class ResponseCache:
+    """Cache of the raw JSON-RPC results of blocks and receipts that are final.
+
+    Results are only stored when their block is at least `ETHEREUM_RPC_CACHE_FINALITY_DEPTH`
+    blocks below the head, so they never change. The cache has an in-memory LRU tier of
+    `ETHEREUM_RPC_CACHE_SIZE` entries and, when `ETHEREUM_RPC_CACHE_DIR` is set, an on-disk tier
+    shared by every process using the same directory.
+    """
+
+    def __init__(self, get_head_block_number, size=None, directory=None, finality_depth=None):
+        """
+        Args:
+            get_head_block_number (callable): returns the current head block number
+            size (int): maximum number of in-memory entries, defaults to `ETHEREUM_RPC_CACHE_SIZE`
+            directory (str): directory of the on-disk tier, defaults to `ETHEREUM_RPC_CACHE_DIR`
+            finality_depth (int): confirmations after which a block is final,
+                defaults to `ETHEREUM_RPC_CACHE_FINALITY_DEPTH`
+
+        """
+        self.get_head_block_number = get_head_block_number
+        self.size = size if size is not None else getattr(settings, "ETHEREUM_RPC_CACHE_SIZE", 0)
+        directory = directory or getattr(settings, "ETHEREUM_RPC_CACHE_DIR", None)
+        self.disk = DiskResponseTier(directory) if directory else None
+        self.finality_depth = finality_depth if finality_depth is not None else \
+            getattr(settings, "ETHEREUM_RPC_CACHE_FINALITY_DEPTH", 128)
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._head_block_number = None
+        self._head_refreshed = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(method, params):
+        return json.dumps([method, params], cls=HexJsonEncoder)
+
+    def get_finalized_block_number(self):
+        """Returns the number of the latest final block."""
+        now = time.monotonic()
+        if self._head_refreshed is None or now - self._head_refreshed >= HEAD_REFRESH_SECONDS:
+            self._head_block_number = self.get_head_block_number()
+            self._head_refreshed = now
+        return self._head_block_number - self.finality_depth
+
+    @staticmethod
+    def _block_number(method, params, result):
+        if method == 'eth_getTransactionReceipt':
+            block_number = result.get('blockNumber')
+        else:
+            block_number = params[0]
+
+        try:
+            return block_number if isinstance(block_number, int) else int(block_number, 16)
+        except (TypeError, ValueError):
+            return None  # block tags such as `latest`
+
+    def get(self, method, params):
+        """Returns the cached result of the given call, None if not cached."""
+        if method not in CACHEABLE_METHODS:
+            return None
+
+        key = self.key(method, params)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+
+        if result is None and self.disk is not None:
+            result = self.disk.get(key)
+            if result is not None:
+                self._remember([(key, result)])
+
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        RPC_CACHE.inc(result='miss' if result is None else 'hit')
+        return result
+
+    def put_many(self, calls):
+        """Caches the results of the given calls whose block is final.
+
+        Args:
+            calls (list): (method, params, result) tuples
+
+        """
+        items = []
+        finalized_block_number = None
+        for method, params, result in calls:
+            if method not in CACHEABLE_METHODS or not result:
+                continue
+
+            block_number = self._block_number(method, params, result)
+            if block_number is None:
+                continue
+            if finalized_block_number is None:
+                finalized_block_number = self.get_finalized_block_number()
+            if block_number <= finalized_block_number:
+                items.append((self.key(method, params), result))
+
+        if items:
+            self._remember(items)
+            if self.disk is not None:
+                self.disk.put_many(items)
+
+    def put(self, method, params, result):
+        self.put_many([(method, params, result)])
+
+    def _remember(self, items):
+        if not self.size:
+            return
+
+        with self._lock:
+            for key, result in items:
+                self._entries[key] = result
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+
+
+def construct_response_cache_middleware(response_cache):
+    """Returns a `web3` middleware answering the cacheable calls from the given `ResponseCache`.
+
+    The middleware must be the innermost one, so that it handles the raw JSON-RPC results.
+    """
+    def response_cache_middleware(make_request, web3):
+        def middleware(method, params):
+            result = response_cache.get(method, params)
+            if result is not None:
+                return {'jsonrpc': '2.0', 'result': result}
+
+            response = make_request(method, params)
+            if method in CACHEABLE_METHODS and response.get('result'):
+                response_cache.put(method, params, response['result'])
+            return response
+        return middleware
+    return response_cache_middleware
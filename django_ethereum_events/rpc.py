@@ -0,0 +1,235 @@
+import json
+import logging
+
+from django.conf import settings
+
+from web3 import HTTPProvider
+from web3._utils.method_formatters import PYTHONIC_RESULT_FORMATTERS
+from web3._utils.request import make_post_request
+from web3.datastructures import AttributeDict
+from web3.exceptions import BlockNotFound, TransactionNotFound
+from web3.middleware.geth_poa import geth_poa_cleanup
+
+logger = logging.getLogger(__name__)
+
+
+def post(endpoint_uri, data, session=None, **kwargs):
+    """Sends a POST request with the given session, or the per-thread session of `web3` if None.
+
+    Returns:
+        bytes: the response body
+
+    """
+    if session is None:
+        return make_post_request(endpoint_uri, data, **kwargs)
+
+    response = session.post(endpoint_uri, data=data, **kwargs)
+    response.raise_for_status()
+    return response.content
+
+
+class BatchHTTPProvider(HTTPProvider):
+    """`HTTPProvider` that is also able to send JSON-RPC batch requests.
+
+    The requests are sent with the sessions of `sessions` (see `HTTPSessions`) when given.
+    """
+
+    def __init__(self, endpoint_uri=None, request_kwargs=None, sessions=None):
+        self.sessions = sessions
+        super(BatchHTTPProvider, self).__init__(endpoint_uri=endpoint_uri, request_kwargs=request_kwargs)
+
+    def _post(self, request_data):
+        return post(
+            self.endpoint_uri,
+            request_data,
+            session=self.sessions.get() if self.sessions is not None else None,
+            **self.get_request_kwargs()
+        )
+
+    def make_request(self, method, params):
+        request_data = self.encode_rpc_request(method, params)
+        return self.decode_rpc_response(self._post(request_data))
+
+    def make_batch_request(self, calls):
+        """Sends the given calls as a single JSON-RPC batch array.
+
+        Args:
+            calls (list): list of (method, params) tuples
+
+        Returns:
+            list: the raw JSON-RPC responses, in the same order as `calls`
+
+        """
+        request_ids = [next(self.request_counter) for _ in calls]
+        request_data = json.dumps([
+            {'jsonrpc': '2.0', 'method': method, 'params': params, 'id': request_id}
+            for request_id, (method, params) in zip(request_ids, calls)
+        ]).encode('utf-8')
+
+        responses = json.loads(self._post(request_data))
+
+        # A node responding to a batch with a single error object has rejected the whole batch
+        if isinstance(responses, dict):
+            raise ValueError(responses.get('error', responses))
+
+        # Responses inside a batch may arrive in any order
+        responses_by_id = {response.get('id'): response for response in responses}
+        return [responses_by_id.get(request_id, {'error': 'Missing batch response'}) for request_id in request_ids]
+
+
+class BlockFetcher:
+    """Retrieves blocks and transaction receipts in as few round-trips as possible.
+
+    When the underlying provider supports JSON-RPC batches (see `BatchHTTPProvider`),
+    the lookups are sent as batch arrays of at most `batch_size` calls.
+    Otherwise every lookup is performed with a regular `web3.eth` call.
+
+    If the node implements `eth_getBlockReceipts`, all the receipts of a block
+    are retrieved with a single call.
+
+    Batch calls answered by the `response_cache` are left out of the batches. The batches are
+    sent through the `scheduler`, if any (see `RequestScheduler`).
+    """
+
+    def __init__(self, web3, batch_size=None, response_cache=None, scheduler=None):
+        self.web3 = web3
+        self.batch_size = batch_size or getattr(settings, "ETHEREUM_RPC_BATCH_SIZE", 100)
+        self.response_cache = response_cache
+        self.scheduler = scheduler
+        self._block_receipts_supported = None
+
+    @property
+    def supports_batching(self):
+        return hasattr(self.web3.provider, 'make_batch_request')
+
+    @property
+    def supports_block_receipts(self):
+        """Whether the node implements `eth_getBlockReceipts`.
+
+        The capability is detected on first access and cached for the lifetime of the fetcher.
+        """
+        if self._block_receipts_supported is None:
+            try:
+                self.web3.manager.request_blocking('eth_getBlockReceipts', ['latest'])
+                self._block_receipts_supported = True
+            except (ValueError, NotImplementedError):
+                self._block_receipts_supported = False
+            logger.info('eth_getBlockReceipts supported: {0}'.format(self._block_receipts_supported))
+        return self._block_receipts_supported
+
+    def format_result(self, method, result):
+        """Applies the `web3` result formatters of the given method on a raw JSON-RPC result."""
+        if result is None:
+            return None
+
+        # Like the web3 middleware, before the block formatter which rejects the long PoA `extraData`
+        if method == 'eth_getBlockByNumber' and getattr(settings, "ETHEREUM_GETH_POA", False):
+            result = geth_poa_cleanup(result)
+
+        formatter = PYTHONIC_RESULT_FORMATTERS.get(method)
+        if formatter is not None:
+            result = formatter(result)
+
+        return AttributeDict.recursive(result)
+
+    def make_batch_request(self, calls):
+        if self.scheduler is None:
+            return self.web3.provider.make_batch_request(calls)
+        return self.scheduler.call(
+            [method for method, _ in calls], lambda: self.web3.provider.make_batch_request(calls))
+
+    def request_batch(self, method, params_list):
+        """Performs the same JSON-RPC method for every params entry using batch requests.
+
+        Args:
+            method (str): the JSON-RPC method
+            params_list (list): a list of params, one entry per call
+
+        Returns:
+            list: the formatted results, in the same order as `params_list`
+
+        """
+        raw_results = [None] * len(params_list)
+        pending = list(range(len(params_list)))
+        if self.response_cache is not None:
+            for index, params in enumerate(params_list):
+                raw_results[index] = self.response_cache.get(method, params)
+            pending = [index for index, result in enumerate(raw_results) if result is None]
+
+        for i in range(0, len(pending), self.batch_size):
+            indexes = pending[i:i + self.batch_size]
+            calls = [(method, params_list[index]) for index in indexes]
+            for index, response in zip(indexes, self.make_batch_request(calls)):
+                if 'error' in response:
+                    raise ValueError(response['error'])
+                raw_results[index] = response.get('result')
+
+            if self.response_cache is not None:
+                self.response_cache.put_many(
+                    [(method, params_list[index], raw_results[index]) for index in indexes])
+
+        return [self.format_result(method, result) for result in raw_results]
+
+    def get_blocks(self, block_numbers):
+        """Retrieves the headers of the given blocks.
+
+        Args:
+            block_numbers (list): the block numbers to retrieve
+
+        Returns:
+            list: the blocks (`None` for unknown blocks), in the same order as `block_numbers`
+
+        """
+        if self.supports_batching:
+            return self.request_batch('eth_getBlockByNumber', [[hex(n), False] for n in block_numbers])
+
+        blocks = []
+        for block_number in block_numbers:
+            try:
+                blocks.append(self.web3.eth.getBlock(block_number))
+            except BlockNotFound:
+                blocks.append(None)
+        return blocks
+
+    def get_transaction_receipts(self, transaction_hashes):
+        """Retrieves the receipts of the given transactions.
+
+        Args:
+            transaction_hashes (list): the transaction hashes
+
+        Returns:
+            list: the receipts (`None` for unknown transactions), in the same order as `transaction_hashes`
+
+        """
+        if self.supports_batching:
+            return self.request_batch(
+                'eth_getTransactionReceipt', [[self.web3.toHex(tx)] for tx in transaction_hashes])
+
+        receipts = []
+        for tx in transaction_hashes:
+            try:
+                receipts.append(self.web3.eth.getTransactionReceipt(tx))
+            except TransactionNotFound:
+                receipts.append(None)
+        return receipts
+
+    def get_block_receipts(self, block):
+        """Retrieves the receipts of every transaction in the given block.
+
+        Uses `eth_getBlockReceipts` when available, falling back to per transaction receipts.
+
+        Args:
+            block (AttributeDict): the block header
+
+        Returns:
+            list: the receipts of the block transactions
+
+        """
+        if not block['transactions']:
+            return []
+
+        if self.supports_block_receipts:
+            receipts = self.web3.manager.request_blocking('eth_getBlockReceipts', [hex(block['number'])])
+            return [self.format_result('eth_getTransactionReceipt', receipt) for receipt in receipts or []]
+
+        return self.get_transaction_receipts(block['transactions'])
@@ -0,0 +1,110 @@
+import socket
+import threading
+
+from django.conf import settings
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+
+
+class KeepAliveHTTPAdapter(HTTPAdapter):
+    """`HTTPAdapter` enabling TCP keep-alive probes on its pooled connections."""
+
+    def __init__(self, tcp_keepalive=None, **kwargs):
+        self.tcp_keepalive = tcp_keepalive
+        super(KeepAliveHTTPAdapter, self).__init__(**kwargs)
+
+    def get_socket_options(self):
+        options = list(HTTPConnection.default_socket_options)
+        if self.tcp_keepalive:
+            options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+            # Idle seconds before the first probe and between probes, where supported
+            for option in ('TCP_KEEPIDLE', 'TCP_KEEPINTVL'):
+                if hasattr(socket, option):
+                    options.append((socket.IPPROTO_TCP, getattr(socket, option), self.tcp_keepalive))
+        return options
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = self.get_socket_options()
+        super(KeepAliveHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+
+
+class HTTPSessions:
+    """Provides the `requests` sessions used to reach the nodes.
+
+    Every session keeps a pool of up to `ETHEREUM_HTTP_POOL_SIZE` connections per node, so
+    successive requests reuse an open (and already TLS authenticated) connection. By default a
+    single session is shared by all threads: its connection pool is thread safe, and the
+    connections outlive the short-lived fetch threads. With `ETHEREUM_HTTP_SESSION_PER_THREAD`,
+    every thread gets a session, hence a pool, of its own.
+
+    With `ETHEREUM_HTTP_POOL_BLOCK`, a request waits for a pooled connection to be released rather
+    than opening an extra connection that is discarded afterwards. Connection failures are retried
+    `ETHEREUM_HTTP_CONNECT_RETRIES` times by `urllib3`, and TCP keep-alive probes are sent on idle
+    connections every `ETHEREUM_HTTP_TCP_KEEPALIVE` seconds, if set, so that load balancers and NATs
+    do not drop them.
+    """
+
+    def __init__(self, pool_size=None, pool_block=None, connect_retries=None, tcp_keepalive=None,
+                 per_thread=None):
+        """
+        Args:
+            pool_size (int): connections kept per node, defaults to `ETHEREUM_HTTP_POOL_SIZE`
+            pool_block (bool): whether to wait for a pooled connection, defaults to `ETHEREUM_HTTP_POOL_BLOCK`
+            connect_retries (int): connection retries, defaults to `ETHEREUM_HTTP_CONNECT_RETRIES`
+            tcp_keepalive (int): seconds between keep-alive probes, defaults to `ETHEREUM_HTTP_TCP_KEEPALIVE`
+            per_thread (bool): whether every thread gets its own session,
+                defaults to `ETHEREUM_HTTP_SESSION_PER_THREAD`
+
+        """
+        self.pool_size = pool_size or getattr(settings, "ETHEREUM_HTTP_POOL_SIZE", 10)
+        self.pool_block = pool_block if pool_block is not None else \
+            getattr(settings, "ETHEREUM_HTTP_POOL_BLOCK", False)
+        self.connect_retries = connect_retries if connect_retries is not None else \
+            getattr(settings, "ETHEREUM_HTTP_CONNECT_RETRIES", 0)
+        self.tcp_keepalive = tcp_keepalive if tcp_keepalive is not None else \
+            getattr(settings, "ETHEREUM_HTTP_TCP_KEEPALIVE", None)
+        self.per_thread = per_thread if per_thread is not None else \
+            getattr(settings, "ETHEREUM_HTTP_SESSION_PER_THREAD", False)
+
+        self._local = threading.local()
+        self._session = None
+        self._lock = threading.Lock()
+
+    def create_session(self):
+        """Returns a new session with the configured connection pool."""
+        adapter = KeepAliveHTTPAdapter(
+            tcp_keepalive=self.tcp_keepalive,
+            pool_maxsize=self.pool_size,
+            pool_block=self.pool_block,
+            # POST requests are never resent once sent, only the connection attempts are retried
+            max_retries=Retry(total=self.connect_retries, connect=self.connect_retries, read=0),
+        )
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def get(self):
+        """Returns the session of the calling thread."""
+        if self.per_thread:
+            session = getattr(self._local, 'session', None)
+            if session is None:
+                session = self._local.session = self.create_session()
+            return session
+
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self.create_session()
+        return self._session
+
+    def close(self):
+        """Closes the shared session and the session of the calling thread."""
+        for session in (self._session, getattr(self._local, 'session', None)):
+            if session is not None:
+                session.close()
+        self._session = None
+        self._local.session = None
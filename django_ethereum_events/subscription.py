@@ -0,0 +1,96 @@
+import asyncio
+import json
+import logging
+import threading
+
+import websockets
+
+logger = logging.getLogger(__name__)
+
+
+class NodeSubscription(threading.Thread):
+    """Background WebSocket `eth_subscribe` subscription used to trigger the event listener.
+
+    The subscription runs in its own thread and event loop. Every notification received
+    from the node (a new head or a matching log) sets the `notified` flag, which the
+    listener loop waits on instead of sleeping for a fixed interval.
+
+    The notifications are only used as triggers, the blocks themselves are processed by the
+    event listener through its regular range catch-up. After every (re)connection a
+    notification is raised as well, so blocks produced while disconnected are never skipped.
+    """
+
+    def __init__(self, uri, subscription='newHeads', filter_params=None, reconnect_delay=1):
+        """
+        Args:
+            uri (str): the node WebSocket endpoint
+            subscription (str): either `newHeads` or `logs`
+            filter_params (callable): returns the `logs` subscription filter (address and topics),
+                evaluated on every (re)connection
+            reconnect_delay (float): seconds to wait before reconnecting
+
+        """
+        super(NodeSubscription, self).__init__(daemon=True)
+        self.uri = uri
+        self.subscription = subscription
+        self.filter_params = filter_params
+        self.reconnect_delay = reconnect_delay
+        self.notified = threading.Event()
+        self.stopped = threading.Event()
+
+    def _subscribe_request(self):
+        params = [self.subscription]
+        if self.subscription == 'logs' and self.filter_params is not None:
+            params.append(self.filter_params())
+        return json.dumps({'jsonrpc': '2.0', 'id': 1, 'method': 'eth_subscribe', 'params': params})
+
+    async def _listen(self, websocket):
+        await websocket.send(self._subscribe_request())
+        response = json.loads(await websocket.recv())
+        if 'error' in response:
+            raise ValueError(response['error'])
+
+        logger.info('Subscribed to {0} at {1}'.format(self.subscription, self.uri))
+        self.notified.set()
+
+        while not self.stopped.is_set():
+            try:
+                message = await asyncio.wait_for(websocket.recv(), timeout=1)
+            except asyncio.TimeoutError:
+                continue
+
+            if json.loads(message).get('method') == 'eth_subscription':
+                self.notified.set()
+
+    async def _run(self):
+        while not self.stopped.is_set():
+            try:
+                async with websockets.connect(self.uri) as websocket:
+                    await self._listen(websocket)
+            except Exception:
+                if self.stopped.is_set():
+                    break
+                logger.warning('WebSocket subscription to {0} lost, reconnecting'.format(self.uri), exc_info=True)
+                await asyncio.sleep(self.reconnect_delay)
+
+    def run(self):
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self._run())
+        finally:
+            loop.close()
+
+    def wait(self, timeout=None):
+        """Blocks until a notification is received, the subscription is stopped or the timeout expires.
+
+        Returns:
+            bool: True if notified
+
+        """
+        notified = self.notified.wait(timeout)
+        self.notified.clear()
+        return notified
+
+    def stop(self):
+        self.stopped.set()
+        self.notified.set()
@@ -3,21 +3,34 @@ from contextlib import contextmanager
 
 from celery import shared_task
 
+from django.conf import settings
 from django.core.cache import cache
 
-from .event_listener import EventListener
+from .backfill import EventBackfill
+from .event_listener import get_event_listener_class
+from .lock import LeaseLost, lease_lock
 
 
 LOCK_KEY = '_django_ethereum_events_cache_lock'
 LOCK_VALUE = 'LOCK'
+BACKFILL_LOCK_KEY = '_django_ethereum_events_backfill_cache_lock'
 logger = logging.getLogger(__name__)
 
 
+def get_lock_key(shard=0):
+    """Returns the cache lock key of the event listener of the given shard."""
+    if shard == 0:
+        return LOCK_KEY
+    return '{0}_{1}'.format(LOCK_KEY, shard)
+
+
 @contextmanager
 def cache_lock(lock_id, lock_value):
     """Cache based locking mechanism.
 
     Cache backends `memcached` and `redis` are recommended.
+
+    The lock never expires, the tasks use `lock.lease_lock` instead.
     """
     # cache.add fails if the key already exists
     status = cache.add(lock_id, lock_value)
@@ -28,14 +41,43 @@ def cache_lock(lock_id, lock_value):
             cache.delete(lock_id)
 
 
+def execute_listener(listener):
+    """Runs the given listener once.
+
+    Unhandled exceptions are logged and the block that caused them is stored
+    in `Daemon.last_error_block_number`.
+
+    Returns:
+        bool: whether the listener run without errors
+    """
+    try:
+        listener.execute()
+        return True
+    except LeaseLost:
+        # Another worker holds the lock now, leave the cursor to it
+        logger.exception('Event listener lock lost', exc_info=True)
+        return False
+    except Exception:
+        logger.exception('Exception while running event listener task', exc_info=True)
+        daemon = listener.daemon
+        last_processed_block = daemon.block_number
+        daemon.last_error_block_number = last_processed_block + 1
+        daemon.save(update_fields=['last_error_block_number', 'modified'])
+        return False
+
+
 @shared_task
-def event_listener():
+def event_listener(shard=None):
     """
     Celery task that transverses the blockchain looking for event logs.
 
     This task should be run periodically via celerybeat to monitor for
     new blocks in the blockchain.
 
+    With `ETHEREUM_SHARDS` greater than 1, the task without a `shard` argument
+    queues one task per shard, so that the shards are processed concurrently
+    by the available workers.
+
     Examples:
         CELERYBEAT_SCHEDULE = {
             'ethereum_events': {
@@ -45,16 +87,40 @@ def event_listener():
         }
 
     """
-    with cache_lock(LOCK_KEY, LOCK_VALUE) as acquired:
-        if acquired:
-            listener = EventListener()
+    shards = getattr(settings, "ETHEREUM_SHARDS", 1)
+    if shard is None and shards > 1:
+        for n in range(shards):
+            event_listener.delay(shard=n)
+        return
+
+    shard = shard or 0
+    with lease_lock(get_lock_key(shard)) as lock:
+        if lock:
+            listener = get_event_listener_class()(shard=shard)
+            listener.acquire_fencing_token()
+            try:
+                execute_listener(listener)
+            finally:
+                listener.close()
+        else:
+            logger.info('Event listener of shard {0} is already running. Skipping execution.'.format(shard))
+
+
+@shared_task
+def event_backfill():
+    """
+    Celery task that backfills the history of the monitored events with a `backfill_from` block.
+
+    The task runs independently of the `event_listener` task and can be scheduled alongside it.
+    """
+    with lease_lock(BACKFILL_LOCK_KEY) as lock:
+        if lock:
+            backfill = EventBackfill()
             try:
-                listener.execute()
+                backfill.execute()
             except Exception:
-                logger.exception('Exception while running event listener task', exc_info=True)
-                daemon = listener.daemon
-                last_processed_block = daemon.block_number
-                daemon.last_error_block_number = last_processed_block + 1
-                daemon.save()
+                logger.exception('Exception while running event backfill task', exc_info=True)
+            finally:
+                backfill.close()
         else:
-            logger.info('Event listener is already running. Skipping execution.')
+            logger.info('Event backfill is already running. Skipping execution.')
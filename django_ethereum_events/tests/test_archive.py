@@ -0,0 +1,61 @@
+import tempfile
+
+from django.test import SimpleTestCase
+from hexbytes import HexBytes
+from web3.datastructures import AttributeDict
+
+from ..archive import LogArchive
+
+ADDRESS = '0x82A978B3f5962A5b0957d9ee9eEf472EE55B42F1'
+OTHER_ADDRESS = '0xDD474B80D5EC7F0CF986eD7FBEe2a7b4Cdc73153'
+TOPIC = '0x' + '22' * 32
+
+
+def make_log(block_number, log_index=0, address=ADDRESS):
+    return AttributeDict({
+        'address': address,
+        'blockHash': HexBytes('0x' + '{0:064x}'.format(block_number)),
+        'blockNumber': block_number,
+        'data': '0x' + '00' * 32,
+        'logIndex': log_index,
+        'removed': False,
+        'topics': [HexBytes(TOPIC)],
+        'transactionHash': HexBytes('0x' + '33' * 32),
+        'transactionIndex': 0,
+    })
+
+
+class LogArchiveTestCase(SimpleTestCase):
+    def setUp(self):
+        super(LogArchiveTestCase, self).setUp()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        super(LogArchiveTestCase, self).tearDown()
+        self.directory.cleanup()
+
+    def test_logs_read_back(self):
+        pair = (ADDRESS, TOPIC)
+        logs = [make_log(12, 1), make_log(15)]
+        LogArchive(self.directory.name).write(pair, 10, 19, logs)
+        LogArchive(self.directory.name).write(pair, 20, 29, [])
+
+        archive = LogArchive(self.directory.name)
+        self.assertEqual(archive.read([pair], 10, 29), logs, 'Logs restored from disk')
+        self.assertEqual(archive.read([pair], 13, 29), logs[1:], 'Logs outside the range left out')
+
+    def test_range_split_in_archived_parts_and_gaps(self):
+        pair, other_pair = (ADDRESS, TOPIC), (OTHER_ADDRESS, TOPIC)
+        archive = LogArchive(self.directory.name)
+        archive.write(pair, 10, 19, [])
+        archive.write(pair, 20, 29, [])
+        archive.write(pair, 40, 49, [])
+        archive.write(other_pair, 15, 49, [])
+
+        self.assertEqual(archive.split([pair], 0, 59), [
+            (0, 9, False), (10, 29, True), (30, 39, False), (40, 49, True), (50, 59, False)
+        ])
+        self.assertEqual(archive.split([pair, other_pair], 12, 45), [
+            (12, 14, False), (15, 29, True), (30, 39, False), (40, 45, True)
+        ], 'Archived for every pair')
+        self.assertEqual(archive.split([], 0, 9), [(0, 9, False)])
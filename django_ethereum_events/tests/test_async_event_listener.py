@@ -0,0 +1,84 @@
+import json
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from eth_tester import EthereumTester, PyEVMBackend
+from eth_utils import to_wei
+from web3 import EthereumTesterProvider, Web3
+
+from ..async_event_listener import AsyncEventListener
+from ..event_listener import get_event_listener_class
+from ..models import MonitoredEvent
+from ..utils import Singleton
+from ..web3_service import Web3Service
+from .contracts.bank import BANK_ABI_RAW, BANK_BYTECODE
+from .test_event_listener import bank_deposit_events
+
+
+class AsyncTesterProvider:
+    """Async stand-in provider that answers through a synchronous web3 instance."""
+
+    def __init__(self, web3):
+        self.web3 = web3
+        self.requests = 0
+
+    async def make_request(self, method, params):
+        self.requests += 1
+        try:
+            return {'result': self.web3.manager.request_blocking(method, params)}
+        except ValueError as e:
+            return {'error': str(e)}
+
+
+class AsyncEventListenerTestCase(TestCase):
+    def setUp(self):
+        super(AsyncEventListenerTestCase, self).setUp()
+        Singleton._instances.pop(Web3Service, None)
+
+    def tearDown(self):
+        super(AsyncEventListenerTestCase, self).tearDown()
+        # Web3Service is a singleton, do not leak this test case provider into other test cases
+        Singleton._instances.pop(Web3Service, None)
+        cache.clear()
+        bank_deposit_events.clear()
+        self.eth_tester.revert_to_snapshot(self.clean_state_snapshot)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.eth_tester = EthereumTester(backend=PyEVMBackend())
+        cls.provider = EthereumTesterProvider(cls.eth_tester)
+        cls.web3 = Web3(cls.provider)
+
+        cls.bank_abi = json.loads(BANK_ABI_RAW)
+        Bank = cls.web3.eth.contract(abi=cls.bank_abi, bytecode=BANK_BYTECODE)
+        tx_receipt = cls.web3.eth.waitForTransactionReceipt(Bank.constructor().transact())
+        cls.bank_address = tx_receipt.contractAddress
+        cls.bank_contract = cls.web3.eth.contract(address=cls.bank_address, abi=cls.bank_abi)
+
+        cls.clean_state_snapshot = cls.eth_tester.take_snapshot()
+
+    def test_events_received_in_chain_order(self):
+        deposit_value = to_wei(1, 'ether')
+        MonitoredEvent.objects.register_event(
+            event_name='LogDeposit',
+            contract_address=self.bank_address,
+            contract_abi=self.bank_abi,
+            event_receiver='django_ethereum_events.tests.test_event_listener.BankDepositEventReceiver'
+        )
+        for i in range(1, 6):
+            self.bank_contract.functions.deposit(). \
+                transact({'from': self.web3.eth.accounts[0], 'value': i * deposit_value})
+
+        async_provider = AsyncTesterProvider(self.web3)
+        with self.settings(ETHEREUM_RPC_BATCH_SIZE=3, ETHEREUM_ASYNC_CONCURRENCY=2):
+            listener = AsyncEventListener(rpc_provider=self.provider, async_provider=async_provider)
+            listener.execute()
+
+        amounts = [event.args.amount for event in bank_deposit_events]
+        self.assertEqual(amounts, [i * deposit_value for i in range(1, 6)], 'Events received in chain order')
+        self.assertEqual(listener.daemon.block_number, self.web3.eth.blockNumber, 'Blocks processed')
+        self.assertGreater(async_provider.requests, 0, 'Async provider used')
+
+    @override_settings(ETHEREUM_EVENT_LISTENER='django_ethereum_events.async_event_listener.AsyncEventListener')
+    def test_listener_selected_by_setting(self):
+        self.assertIs(get_event_listener_class(), AsyncEventListener)
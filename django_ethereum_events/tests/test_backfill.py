@@ -0,0 +1,98 @@
+import json
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from eth_tester import EthereumTester, PyEVMBackend
+from eth_utils import to_wei
+from web3 import EthereumTesterProvider, Web3
+
+from ..backfill import EventBackfill
+from ..event_listener import EventListener
+from ..models import MonitoredEvent
+from ..utils import Singleton
+from ..web3_service import Web3Service
+from .contracts.bank import BANK_ABI_RAW, BANK_BYTECODE
+from .test_event_listener import bank_deposit_events
+
+
+class EventBackfillTestCase(TestCase):
+    def setUp(self):
+        super(EventBackfillTestCase, self).setUp()
+        Singleton._instances.pop(Web3Service, None)
+
+    def tearDown(self):
+        super(EventBackfillTestCase, self).tearDown()
+        # Web3Service is a singleton, do not leak this test case provider into other test cases
+        Singleton._instances.pop(Web3Service, None)
+        cache.clear()
+        bank_deposit_events.clear()
+        self.eth_tester.revert_to_snapshot(self.clean_state_snapshot)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.eth_tester = EthereumTester(backend=PyEVMBackend())
+        cls.provider = EthereumTesterProvider(cls.eth_tester)
+        cls.web3 = Web3(cls.provider)
+
+        cls.bank_abi = json.loads(BANK_ABI_RAW)
+        Bank = cls.web3.eth.contract(abi=cls.bank_abi, bytecode=BANK_BYTECODE)
+        tx_receipt = cls.web3.eth.waitForTransactionReceipt(Bank.constructor().transact())
+        cls.bank_address = tx_receipt.contractAddress
+        cls.bank_contract = cls.web3.eth.contract(address=cls.bank_address, abi=cls.bank_abi)
+
+        cls.clean_state_snapshot = cls.eth_tester.take_snapshot()
+
+    def _deposit(self, ether):
+        self.bank_contract.functions.deposit(). \
+            transact({'from': self.web3.eth.accounts[0], 'value': to_wei(ether, 'ether')})
+
+    def _register_deposit_event(self, backfill_from=None):
+        return MonitoredEvent.objects.register_event(
+            event_name='LogDeposit',
+            contract_address=self.bank_address,
+            contract_abi=self.bank_abi,
+            event_receiver='django_ethereum_events.tests.test_event_listener.BankDepositEventReceiver',
+            backfill_from=backfill_from
+        )
+
+    def test_history_backfilled_up_to_the_live_cursor(self):
+        self._deposit(1)
+        self._deposit(2)
+        EventListener(rpc_provider=self.provider).execute()
+        live_cursor = self.web3.eth.blockNumber
+
+        event = self._register_deposit_event(backfill_from=0)
+        self._deposit(3)
+        EventListener(rpc_provider=self.provider).execute()
+        self.assertEqual([e.args.amount for e in bank_deposit_events], [to_wei(3, 'ether')], 'Live event received')
+
+        with self.settings(ETHEREUM_LOGS_BATCH_SIZE=2, ETHEREUM_LOGS_ADAPTIVE_BATCH_SIZE=False):
+            EventBackfill(rpc_provider=self.provider).execute()
+
+        amounts = [e.args.amount for e in bank_deposit_events]
+        self.assertEqual(amounts, [to_wei(3, 'ether'), to_wei(1, 'ether'), to_wei(2, 'ether')],
+                         'History received once, in chain order')
+
+        event.refresh_from_db()
+        self.assertEqual(event.monitored_from, live_cursor + 1)
+        self.assertEqual(event.backfill_block_number, live_cursor, 'Backfill handed over to the event listener')
+        self.assertFalse(event.backfill_pending)
+
+        EventBackfill(rpc_provider=self.provider).execute()
+        self.assertEqual(len(bank_deposit_events), 3, 'Backfill not repeated')
+
+    def test_event_not_monitored_yet_left_to_the_listener(self):
+        self._deposit(1)
+        event = self._register_deposit_event(backfill_from=0)
+
+        # The command uses the singleton web3 service of this test case provider
+        Web3Service(rpc_provider=self.provider)
+        out = StringIO()
+        call_command('backfill_events', stdout=out)
+
+        event.refresh_from_db()
+        self.assertIn('0 events backfilled', out.getvalue())
+        self.assertIsNone(event.monitored_from, 'Live cursor set by the event listener only')
+        self.assertEqual(len(bank_deposit_events), 0)
@@ -0,0 +1,62 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from ..block_range import AdaptiveBlockRange
+
+
+@override_settings(ETHEREUM_LOGS_BATCH_SIZE=1000, ETHEREUM_LOGS_MAX_BATCH_SIZE=4000)
+class AdaptiveBlockRangeTestCase(TestCase):
+    def setUp(self):
+        super(AdaptiveBlockRangeTestCase, self).setUp()
+        cache.clear()
+
+    def tearDown(self):
+        super(AdaptiveBlockRangeTestCase, self).tearDown()
+        cache.clear()
+
+    def test_range_errors_detected(self):
+        block_range = AdaptiveBlockRange()
+
+        self.assertTrue(block_range.is_range_error(
+            ValueError({'code': -32005, 'message': 'query returned more than 10000 results'})))
+        self.assertFalse(block_range.is_range_error(ValueError({'code': -32000, 'message': 'header not found'})))
+        self.assertFalse(block_range.is_range_error(KeyError('range')))
+
+    def test_rate_limit_errors_not_range_errors(self):
+        block_range = AdaptiveBlockRange()
+
+        for message in ('rate limit exceeded', 'daily request limit exceeded', 'too many requests',
+                        'Your app has exceeded its compute units per second capacity'):
+            self.assertFalse(block_range.is_range_error(ValueError({'code': -32005, 'message': message})), message)
+        self.assertFalse(block_range.is_range_error(ValueError({'code': 429, 'message': 'block range too large'})))
+        self.assertTrue(block_range.is_range_error(ValueError(
+            {'code': -32602, 'message': 'Log response size exceeded. Query a 2K block range instead.'})))
+
+    def test_size_grows_after_fast_sparse_responses(self):
+        block_range = AdaptiveBlockRange()
+
+        block_range.record_success(span=500, results=0, elapsed=0.1)
+        self.assertEqual(block_range.size, 1000, 'Partial range does not grow the span')
+
+        block_range.record_success(span=1000, results=900, elapsed=0.1)
+        self.assertEqual(block_range.size, 1000, 'Dense range does not grow the span')
+
+        block_range.record_success(span=1000, results=0, elapsed=0.1)
+        block_range.record_success(span=2000, results=0, elapsed=0.1)
+        block_range.record_success(span=4000, results=0, elapsed=0.1)
+        self.assertEqual(block_range.size, 4000, 'Span doubled up to the maximum')
+
+    def test_size_remembered_across_runs(self):
+        block_range = AdaptiveBlockRange()
+        block_range.shrink(1000)
+        self.assertEqual(block_range.size, 500)
+
+        self.assertEqual(AdaptiveBlockRange().size, 500, 'Tuned span restored from the cache')
+
+    @override_settings(ETHEREUM_LOGS_ADAPTIVE_BATCH_SIZE=False)
+    def test_fixed_size(self):
+        block_range = AdaptiveBlockRange()
+        block_range.shrink(1000)
+        block_range.record_success(span=1000, results=0, elapsed=0.1)
+
+        self.assertEqual(block_range.size, 1000)
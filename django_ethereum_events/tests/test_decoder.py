@@ -2,14 +2,18 @@ import json
 from copy import deepcopy
 
 from django.test import TestCase
+from eth_bloom import BloomFilter
 from eth_tester import EthereumTester, PyEVMBackend
-from eth_utils import to_wei
+from eth_utils import event_abi_to_log_topic, to_bytes, to_wei
 from hexbytes import HexBytes
 from web3 import EthereumTesterProvider, Web3
+from web3._utils.events import get_event_data
+from web3.datastructures import AttributeDict
 
 from django_ethereum_events.models import MonitoredEvent
 from django_ethereum_events.tests.contracts.bank import BANK_ABI_RAW, BANK_BYTECODE
-from ..decoder import Decoder
+from django_ethereum_events.tests.contracts.claim import CLAIM_ABI_RAW, CLAIM_BYTECODE
+from ..decoder import CompiledEventDecoder, Decoder
 
 
 class DecoderTestCase(TestCase):
@@ -123,3 +127,74 @@ class DecoderTestCase(TestCase):
         self.assertEqual(len(decoded_logs), 1, "Log decoded")
         self.assertEqual(decoded_logs[0][1].args.amount, to_wei(1, 'ether'), "Log `amount` parameter is correct")
         self.assertEqual(decoded_logs[0][1].args.owner, '0x82A978B3f5962A5b0957d9ee9eEf472EE55B42F1', "Log `owner` parameter is correct")
+
+    def test_removed_logs_skipped(self):
+        self._create_deposit_event()
+        decoder = Decoder(block_number=0)
+
+        removed_log = dict(self.logs[0], address=self.bank_address, removed=True)
+        self.assertEqual(decoder.decode_logs([removed_log]), [], "Log of an orphaned block skipped")
+
+    def test_bloom_matcher(self):
+        event = self._create_deposit_event()
+        decoder = Decoder(block_number=0)
+
+        bloom = BloomFilter()
+        bloom.add(to_bytes(hexstr=self.bank_address))
+        bloom.add(to_bytes(hexstr=event.topic))
+        self.assertTrue(decoder.bloom_matcher.may_contain(HexBytes(int(bloom).to_bytes(256, 'big'))))
+
+        bloom = BloomFilter()
+        bloom.add(to_bytes(hexstr=self.bank_address))
+        self.assertFalse(decoder.bloom_matcher.may_contain(HexBytes(int(bloom).to_bytes(256, 'big'))),
+                         "Topic not in bloom")
+        self.assertFalse(decoder.bloom_matcher.may_contain(HexBytes(bytes(256))), "Empty bloom")
+
+    def test_compiled_decoder_matches_get_event_data(self):
+        """The compiled event decoders must produce the same output as `get_event_data`
+        """
+        claim_abi = json.loads(CLAIM_ABI_RAW)
+        Claim = self.web3.eth.contract(abi=claim_abi, bytecode=CLAIM_BYTECODE)
+        tx_receipt = self.web3.eth.waitForTransactionReceipt(Claim.constructor().transact())
+        claim_contract = self.web3.eth.contract(address=tx_receipt.contractAddress, abi=claim_abi)
+
+        deposit_tx = self.bank_contract.functions.deposit().transact({'value': to_wei(1, 'ether')})
+        claim_tx = claim_contract.functions.setClaim(to_bytes(text='key'), to_bytes(text='value')).transact()
+
+        for abi, tx_hash, event_name in ((self.bank_abi, deposit_tx, 'LogDeposit'),
+                                         (claim_abi, claim_tx, 'ClaimSet')):
+            event_abi = [entry for entry in abi if entry.get('name') == event_name][0]
+            log = self.web3.eth.getTransactionReceipt(tx_hash).logs[0]
+            compiled = CompiledEventDecoder(self.web3.codec, event_abi)
+
+            self.assertEqual(compiled.decode(log), get_event_data(self.web3.codec, event_abi, log))
+
+        # Array arguments are not covered by the test contracts
+        event_abi = {
+            'anonymous': False,
+            'name': 'Batch',
+            'type': 'event',
+            'inputs': [
+                {'indexed': True, 'name': 'sender', 'type': 'address'},
+                {'indexed': False, 'name': 'values', 'type': 'uint256[]'},
+                {'indexed': False, 'name': 'pair', 'type': 'bytes32[2]'},
+            ],
+        }
+        log = AttributeDict({
+            'address': self.bank_address,
+            'topics': [
+                HexBytes(event_abi_to_log_topic(event_abi)),
+                HexBytes(self.web3.codec.encode_single('address', self.web3.eth.accounts[0])),
+            ],
+            'data': HexBytes(self.web3.codec.encode_abi(
+                ['uint256[]', 'bytes32[2]'], [[1, 2, 3], [b'\x01' * 32, b'\x02' * 32]])),
+            'logIndex': 0,
+            'transactionIndex': 0,
+            'transactionHash': HexBytes('0x' + '11' * 32),
+            'blockHash': HexBytes('0x' + '22' * 32),
+            'blockNumber': 1,
+        })
+        decoded = CompiledEventDecoder(self.web3.codec, event_abi).decode(log)
+
+        self.assertEqual(decoded, get_event_data(self.web3.codec, event_abi, log))
+        self.assertEqual(decoded.args['values'], [1, 2, 3], 'Arrays decoded as lists')
@@ -1,22 +1,35 @@
 import json
+import os
+import signal
+import tempfile
+from io import StringIO
 from unittest.mock import patch
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 from eth_tester import EthereumTester, PyEVMBackend
 from eth_utils import to_wei, to_bytes
+from hexbytes import HexBytes
 from web3 import EthereumTesterProvider, Web3
+from web3.datastructures import AttributeDict
 
-from ..tasks import event_listener
+from ..tasks import LOCK_KEY, event_listener
 from .contracts.bank import BANK_ABI_RAW, BANK_BYTECODE
 from .contracts.claim import CLAIM_ABI_RAW, CLAIM_BYTECODE
 from ..chainevents import AbstractEventReceiver
 from ..event_listener import EventListener
-from ..models import MonitoredEvent, FailedEventLog, Daemon
+from ..lock import LeaseLost
+from ..metrics import BLOCKS_PROCESSED, EVENTS_DISPATCHED, HEAD_LAG, REGISTRY, STAGE_SECONDS
+from ..models import MonitoredEvent, FailedEventLog, Daemon, DaemonShard
+from ..utils import Singleton, get_shard
+from ..web3_service import Web3Service
 
 # Keeps track of fired events
 claim_events = []
 bank_withdraw_events = []
 bank_deposit_events = []
+dispatched_events = []
 
 
 class ClaimEventReceiver(AbstractEventReceiver):
@@ -34,6 +47,62 @@ class BankDepositEventReceiver(AbstractEventReceiver):
         bank_deposit_events.append(decoded_event)
 
 
+class LifecycleBankDepositEventReceiver(AbstractEventReceiver):
+    instances = []
+
+    def __init__(self):
+        self.calls = []
+        self.instances.append(self)
+
+    def setup(self):
+        self.calls.append('setup')
+
+    def save(self, decoded_event):
+        self.calls.append('save')
+
+    def teardown(self):
+        self.calls.append('teardown')
+
+
+class BatchBankDepositEventReceiver(AbstractEventReceiver):
+    batches = []
+
+    def save(self, decoded_event):
+        if decoded_event.args.amount == to_wei(2, 'ether'):
+            raise ValueError
+        bank_deposit_events.append(decoded_event)
+
+    def save_batch(self, decoded_events):
+        self.batches.append(decoded_events)
+        if any(decoded_event.args.amount == to_wei(2, 'ether') for decoded_event in decoded_events):
+            raise ValueError
+        bank_deposit_events.extend(decoded_events)
+
+
+class RevertibleBankDepositEventReceiver(AbstractEventReceiver):
+    reverts = []
+
+    def save(self, decoded_event):
+        bank_deposit_events.append(decoded_event)
+
+    def revert(self, block_number):
+        self.reverts.append(block_number)
+        bank_deposit_events[:] = [event for event in bank_deposit_events if event.blockNumber < block_number]
+
+
+class OrderedEventReceiver(AbstractEventReceiver):
+    def save(self, decoded_event):
+        dispatched_events.append(decoded_event)
+
+
+class OrderedBatchEventReceiver(AbstractEventReceiver):
+    def save(self, decoded_event):
+        dispatched_events.append(decoded_event)
+
+    def save_batch(self, decoded_events):
+        dispatched_events.extend(decoded_events)
+
+
 class ErroneousBankDepositEventReceiver(AbstractEventReceiver):
     def save(self, decoded_event):
         raise ValueError
@@ -51,10 +120,14 @@ class EventListenerTestCase(TestCase):
     def tearDown(self):
         super(EventListenerTestCase, self).tearDown()
 
+        # Clear the cached listener state (e.g. the adaptive block span)
+        cache.clear()
+
         # Clear event receivers state
         claim_events.clear()
         bank_deposit_events.clear()
         bank_withdraw_events.clear()
+        dispatched_events.clear()
 
         # Reset to snapshot
         self.eth_tester.revert_to_snapshot(self.clean_state_snapshot)
@@ -162,6 +235,24 @@ class EventListenerTestCase(TestCase):
         self.assertEqual(len(bank_deposit_events), 1, "Deposit event listener fired")
         self.assertEqual(bank_deposit_events[0].args.amount, deposit_value, "Argument fetched correctly")
 
+    def test_metrics_recorded(self):
+        """Test that the pipeline stages, the processed blocks and the head lag are recorded
+        """
+        self._create_deposit_event()
+        listener = EventListener(rpc_provider=self.provider)
+        self.bank_contract.functions.deposit(). \
+            transact({'from': self.web3.eth.accounts[0], 'value': to_wei(1, 'ether')})
+        REGISTRY.reset()
+
+        listener.execute()
+
+        for stage in ('fetch', 'decode', 'dispatch', 'checkpoint'):
+            self.assertIsNotNone(STAGE_SECONDS.get(stage=stage, shard=0), '{0} stage timed'.format(stage))
+        self.assertEqual(BLOCKS_PROCESSED.get(shard=0), self.web3.eth.blockNumber)
+        self.assertEqual(HEAD_LAG.get(shard=0), 0, 'Lag updated after processing')
+        self.assertEqual(EVENTS_DISPATCHED.get(
+            receiver='django_ethereum_events.tests.test_event_listener.BankDepositEventReceiver', outcome='saved'), 1)
+
     def test_monitor_contract_single_event_twice_same_interval(self):
         """Test the monitoring of a single event fired twice before the execute method was called
         """
@@ -299,6 +390,332 @@ class EventListenerTestCase(TestCase):
         self.assertEqual(len(bank_deposit_events), 1, "Deposit event listener fired")
         self.assertEqual(event.monitored_from, current + 1)
 
+    @override_settings(ETHEREUM_LOGS_FILTER_AVAILABLE=True)
+    def test_monitor_multiple_contracts_using_get_logs(self):
+        """Test that a single eth_getLogs query covers all the monitored events
+        """
+        deposit_value = to_wei(1, 'ether')
+        self._create_deposit_event()
+        self._create_withdraw_event()
+        self._create_claim_event()
+        listener = EventListener(rpc_provider=self.provider)
+
+        self.bank_contract.functions.deposit(). \
+            transact({'from': self.web3.eth.accounts[0], 'value': deposit_value})
+        self.bank_contract.functions.withdraw(deposit_value). \
+            transact({'from': self.web3.eth.accounts[0]})
+        self.claim_contract.functions.setClaim(to_bytes(text='hello'), to_bytes(text='world')). \
+            transact({'from': self.web3.eth.accounts[0]})
+
+        with patch.object(listener.web3.eth, 'getLogs', wraps=listener.web3.eth.getLogs) as get_logs:
+            listener.execute()
+
+        self.assertEqual(get_logs.call_count, 1, 'Single eth_getLogs call')
+        self.assertEqual(len(bank_deposit_events), 1, "Deposit event fired")
+        self.assertEqual(len(bank_withdraw_events), 1, "Withdraw event fired")
+        self.assertEqual(len(claim_events), 1, "Claim event fired")
+        self.assertEqual(listener.daemon.block_number, self.web3.eth.blockNumber, 'Blocks processed')
+
+    def test_parallel_fetching_keeps_chain_order(self):
+        """Test that events fetched concurrently are received in chain order, in both execution modes
+        """
+        deposit_value = to_wei(1, 'ether')
+        self._create_deposit_event()
+
+        for i in range(1, 6):
+            self.bank_contract.functions.deposit(). \
+                transact({'from': self.web3.eth.accounts[0], 'value': i * deposit_value})
+            self.eth_tester.mine_blocks(num_blocks=2)
+
+        for filter_available in (False, True):
+            bank_deposit_events.clear()
+            Daemon.objects.update(block_number=0)
+            with self.settings(ETHEREUM_FETCH_WORKERS=4, ETHEREUM_LOGS_BATCH_SIZE=2,
+                               ETHEREUM_LOGS_ADAPTIVE_BATCH_SIZE=False,
+                               ETHEREUM_LOGS_FILTER_AVAILABLE=filter_available):
+                listener = EventListener(rpc_provider=self.provider)
+                while listener.get_pending_blocks():
+                    listener.execute()
+
+            amounts = [event.args.amount for event in bank_deposit_events]
+            self.assertEqual(amounts, [i * deposit_value for i in range(1, 6)], 'Events received in chain order')
+
+    @override_settings(ETHEREUM_LOGS_FILTER_AVAILABLE=True)
+    def test_get_logs_range_split_on_too_many_results(self):
+        """Test that a log query rejected by the node is retried in smaller ranges
+        """
+        deposit_value = to_wei(1, 'ether')
+        self._create_deposit_event()
+        listener = EventListener(rpc_provider=self.provider)
+        query_logs = listener._query_logs
+
+        self.bank_contract.functions.deposit(). \
+            transact({'from': self.web3.eth.accounts[0], 'value': deposit_value})
+        self.eth_tester.mine_blocks(num_blocks=5)
+
+        def limited_query_logs(from_block, to_block, filter_params=None):
+            if to_block - from_block > 1:
+                raise ValueError({'code': -32005, 'message': 'query returned more than 10000 results'})
+            return query_logs(from_block, to_block, filter_params)
+
+        with patch.object(listener, '_query_logs', limited_query_logs):
+            listener.execute()
+
+        self.assertEqual(len(bank_deposit_events), 1, 'Deposit event listener fired')
+        self.assertEqual(listener.daemon.block_number, self.web3.eth.blockNumber, 'Blocks processed')
+
+    @override_settings(ETHEREUM_LOGS_FILTER_AVAILABLE=True, ETHEREUM_LOG_ARCHIVE_CONFIRMATIONS=0)
+    def test_archived_logs_served_from_disk(self):
+        """Test that reprocessing archived blocks does not query the node
+        """
+        self._create_deposit_event()
+        self.bank_contract.functions.deposit(). \
+            transact({'from': self.web3.eth.accounts[0], 'value': to_wei(1, 'ether')})
+
+        with tempfile.TemporaryDirectory() as directory, self.settings(ETHEREUM_LOG_ARCHIVE_DIR=directory):
+            EventListener(rpc_provider=self.provider).execute()
+            Daemon.objects.update(block_number=0)
+
+            listener = EventListener(rpc_provider=self.provider)
+            with patch.object(listener.web3.eth, 'getLogs', side_effect=ValueError) as get_logs:
+                listener.execute()
+
+        self.assertEqual(get_logs.call_count, 0, 'Logs read from the archive')
+        self.assertEqual(len(bank_deposit_events), 2, 'Deposit event received again')
+        self.assertEqual(bank_deposit_events[0], bank_deposit_events[1], 'Archived log decoded identically')
+
+    @override_settings(ETHEREUM_RPC_CACHE_SIZE=1000, ETHEREUM_RPC_CACHE_FINALITY_DEPTH=0)
+    def test_final_blocks_fetched_once(self):
+        """Test that reprocessing final blocks is served by the response cache
+        """
+        self._create_deposit_event()
+        self.bank_contract.functions.deposit(). \
+            transact({'from': self.web3.eth.accounts[0], 'value': to_wei(1, 'ether')})
+
+        # Web3Service is a singleton, use a new instance with the cache enabled
+        Singleton._instances.pop(Web3Service, None)
+        try:
+            EventListener(rpc_provider=self.provider).execute()
+            Daemon.objects.update(block_number=0)
+
+            listener = EventListener(rpc_provider=self.provider)
+            with patch.object(self.provider, 'make_request', wraps=self.provider.make_request) as make_request:
+                listener.execute()
+        finally:
+            Singleton._instances.pop(Web3Service, None)
+
+        requested = [call[0][0] for call in make_request.call_args_list]
+        self.assertNotIn('eth_getBlockByNumber', requested, 'Blocks served from the cache')
+        self.assertNotIn('eth_getTransactionReceipt', requested, 'Receipts served from the cache')
+        self.assertEqual(len(bank_deposit_events), 2, 'Deposit event received again')
+
+    def test_bloom_prescreening_skips_irrelevant_blocks(self):
+        """Test that the receipts of blocks whose bloom cannot match a monitored event are never requested
+        """
+        deposit_value = to_wei(1, 'ether')
+        self._create_deposit_event()
+        listener = EventListener(rpc_provider=self.provider)
+
+        self.bank_contract.functions.deposit(). \
+            transact({'from': self.web3.eth.accounts[0], 'value': deposit_value})
+
+        get_blocks = listener.fetcher.get_blocks
+
+        def get_blocks_with_empty_bloom(block_numbers):
+            return [AttributeDict(block, logsBloom=HexBytes(bytes(256))) for block in get_blocks(block_numbers)]
+
+        with patch.object(listener.fetcher, 'get_blocks', get_blocks_with_empty_bloom), \
+                patch.object(listener.fetcher, 'get_block_receipts') as fetch:
+            listener.execute()
+
+        self.assertEqual(fetch.call_count, 0, 'No receipts fetched')
+        self.assertEqual(listener.daemon.block_number, self.web3.eth.blockNumber, 'Blocks processed')
+
+    def test_event_receiver_reused(self):
+        """Test that a single receiver instance handles every event and its lifecycle hooks are called
+        """
+        LifecycleBankDepositEventReceiver.instances.clear()
+        self._create_deposit_event(
+            event_receiver='django_ethereum_events.tests.test_event_listener.LifecycleBankDepositEventReceiver')
+        deposit_value = to_wei(1, 'ether')
+        listener = EventListener(rpc_provider=self.provider)
+
+        for _ in range(3):
+            self.bank_contract.functions.deposit(). \
+                transact({'from': self.web3.eth.accounts[0], 'value': deposit_value})
+            listener.execute()
+        listener.close()
+
+        self.assertEqual(len(LifecycleBankDepositEventReceiver.instances), 1, 'Receiver instantiated once')
+        self.assertEqual(LifecycleBankDepositEventReceiver.instances[0].calls,
+                         ['setup', 'save', 'save', 'save', 'teardown'])
+
+    @override_settings(ETHEREUM_LOGS_FILTER_AVAILABLE=True)
+    def test_event_receiver_save_batch(self):
+        """Test that batch receivers receive all the events of a range and failing batches are retried per event
+        """
+        BatchBankDepositEventReceiver.batches.clear()
+        self._create_deposit_event(
+            event_receiver='django_ethereum_events.tests.test_event_listener.BatchBankDepositEventReceiver')
+        listener = EventListener(rpc_provider=self.provider)
+
+        for amount in (1, 3):
+            self.bank_contract.functions.deposit(). \
+                transact({'from': self.web3.eth.accounts[0], 'value': to_wei(amount, 'ether')})
+        listener.execute()
+
+        self.assertEqual(len(BatchBankDepositEventReceiver.batches), 1, 'Events saved in a single batch')
+        self.assertEqual([e.args.amount for e in BatchBankDepositEventReceiver.batches[0]],
+                         [to_wei(1, 'ether'), to_wei(3, 'ether')], 'Batch in chain order')
+        self.assertEqual(FailedEventLog.objects.count(), 0)
+
+        bank_deposit_events.clear()
+        for amount in (1, 2, 3):
+            self.bank_contract.functions.deposit(). \
+                transact({'from': self.web3.eth.accounts[0], 'value': to_wei(amount, 'ether')})
+        listener.execute()
+
+        self.assertEqual([e.args.amount for e in bank_deposit_events], [to_wei(1, 'ether'), to_wei(3, 'ether')],
+                         'Events retried separately after the batch failed')
+        self.assertEqual(FailedEventLog.objects.count(), 1, 'Only the failing event stored')
+
+    def test_event_receiver_save_batch_across_blocks(self):
+        """Test that batch receivers receive the events of every block fetched at once in a single batch
+        """
+        BatchBankDepositEventReceiver.batches.clear()
+        self._create_deposit_event(
+            event_receiver='django_ethereum_events.tests.test_event_listener.BatchBankDepositEventReceiver')
+        listener = EventListener(rpc_provider=self.provider)
+
+        for amount in (1, 3, 4):
+            self.bank_contract.functions.deposit(). \
+                transact({'from': self.web3.eth.accounts[0], 'value': to_wei(amount, 'ether')})
+        listener.execute()
+
+        self.assertEqual(len(BatchBankDepositEventReceiver.batches), 1, 'Events of several blocks in a single batch')
+        self.assertEqual([e.args.amount for e in BatchBankDepositEventReceiver.batches[0]],
+                         [to_wei(1, 'ether'), to_wei(3, 'ether'), to_wei(4, 'ether')], 'Batch in chain order')
+        self.assertEqual(Daemon.get_solo().block_number, self.web3.eth.blockNumber)
+
+    @override_settings(ETHEREUM_LOGS_FILTER_AVAILABLE=True)
+    def test_receivers_called_in_chain_order(self):
+        """Test that events of different receivers fetched in a single range are dispatched in chain order
+        """
+        self._create_withdraw_event(
+            event_receiver='django_ethereum_events.tests.test_event_listener.OrderedBatchEventReceiver')
+        self._create_deposit_event(
+            event_receiver='django_ethereum_events.tests.test_event_listener.OrderedEventReceiver')
+        listener = EventListener(rpc_provider=self.provider)
+
+        self.bank_contract.functions.deposit(). \
+            transact({'from': self.web3.eth.accounts[0], 'value': to_wei(2, 'ether')})
+        self.bank_contract.functions.withdraw(to_wei(1, 'ether')).transact({'from': self.web3.eth.accounts[0]})
+        self.bank_contract.functions.deposit(). \
+            transact({'from': self.web3.eth.accounts[0], 'value': to_wei(1, 'ether')})
+        self.bank_contract.functions.withdraw(to_wei(1, 'ether')).transact({'from': self.web3.eth.accounts[0]})
+        listener.execute()
+
+        self.assertEqual([e.event for e in dispatched_events], ['LogDeposit', 'LogWithdraw'] * 2,
+                         'Events dispatched in chain order')
+        block_numbers = [e.blockNumber for e in dispatched_events]
+        self.assertEqual(block_numbers, sorted(block_numbers))
+
+    @override_settings(ETHEREUM_CHECKPOINT_BLOCKS=3)
+    def test_checkpoint_every_n_blocks(self):
+        """Test that the block cursor is committed once per group of blocks
+        """
+        self._create_deposit_event()
+        listener = EventListener(rpc_provider=self.provider)
+        self.eth_tester.mine_blocks(num_blocks=5)
+        pending_blocks = listener.get_pending_blocks()
+
+        with patch.object(listener, 'update_block_number', wraps=listener.update_block_number) as update:
+            listener.execute()
+
+        checkpoints = [c[0][0] for c in update.call_args_list]
+        self.assertEqual(checkpoints, pending_blocks[2::3] + ([pending_blocks[-1]] if len(pending_blocks) % 3 else []))
+        self.assertEqual(Daemon.get_solo().block_number, self.web3.eth.blockNumber, 'Blocks processed')
+
+    @override_settings(ETHEREUM_CHECKPOINT_BLOCKS=3)
+    def test_checkpoint_rolled_back_on_error(self):
+        """Test that receiver side effects and the cursor of an interrupted group are rolled back together
+        """
+        self._create_deposit_event(
+            event_receiver='django_ethereum_events.tests.test_event_listener.ErroneousBankDepositEventReceiver')
+        listener = EventListener(rpc_provider=self.provider)
+        start = listener.daemon.block_number
+
+        # The deposit is mined in the second group of blocks, right before the failing block
+        self.eth_tester.mine_blocks(num_blocks=3)
+        self.bank_contract.functions.deposit(). \
+            transact({'from': self.web3.eth.accounts[0], 'value': to_wei(1, 'ether')})
+        self.eth_tester.mine_blocks(num_blocks=3)
+        failing_block = start + 5
+
+        get_block_logs = listener.get_block_logs
+
+        def failing_get_block_logs(block_number, block=None):
+            if block_number == failing_block:
+                raise ValueError
+            return get_block_logs(block_number, block=block)
+
+        with patch.object(listener, 'get_block_logs', failing_get_block_logs):
+            with self.assertRaises(ValueError):
+                listener.execute()
+
+        self.assertEqual(Daemon.get_solo().block_number, start + 3, 'Only the first group committed')
+        self.assertEqual(listener.daemon.block_number, start + 3, 'In memory cursor rolled back')
+        self.assertEqual(FailedEventLog.objects.count(), 0, 'Side effects of the interrupted group rolled back')
+
+    def test_chain_reorganization_reverted(self):
+        """Test that events of orphaned blocks are reverted and the new canonical blocks processed, in both modes
+        """
+        self._create_deposit_event(
+            event_receiver='django_ethereum_events.tests.test_event_listener.RevertibleBankDepositEventReceiver')
+        fork_snapshot = self.eth_tester.take_snapshot()
+        fork_block_number = self.web3.eth.blockNumber
+
+        for filter_available in (False, True):
+            with self.settings(ETHEREUM_REORG_DEPTH=5, ETHEREUM_LOGS_FILTER_AVAILABLE=filter_available):
+                self.eth_tester.revert_to_snapshot(fork_snapshot)
+                self.bank_contract.functions.deposit(). \
+                    transact({'from': self.web3.eth.accounts[0], 'value': to_wei(1, 'ether')})
+                self.eth_tester.mine_blocks(num_blocks=2)
+                EventListener(rpc_provider=self.provider).execute()
+
+                # Replace the blocks after the fork with a longer chain
+                self.eth_tester.revert_to_snapshot(fork_snapshot)
+                self.bank_contract.functions.deposit(). \
+                    transact({'from': self.web3.eth.accounts[0], 'value': to_wei(2, 'ether')})
+                self.eth_tester.mine_blocks(num_blocks=3)
+                RevertibleBankDepositEventReceiver.reverts.clear()
+                listener = EventListener(rpc_provider=self.provider)
+                listener.execute()
+
+            self.assertEqual(RevertibleBankDepositEventReceiver.reverts, [fork_block_number + 1],
+                             'Orphaned blocks reverted')
+            amounts = [event.args.amount for event in bank_deposit_events]
+            self.assertEqual(amounts, [to_wei(2, 'ether')], 'Canonical chain events received')
+            self.assertEqual(listener.daemon.block_number, self.web3.eth.blockNumber, 'Blocks processed')
+
+            bank_deposit_events.clear()
+            Daemon.objects.update(block_number=fork_block_number)
+
+    @override_settings(ETHEREUM_CONFIRMATIONS=2)
+    def test_confirmation_depth(self):
+        self._create_deposit_event()
+        self.bank_contract.functions.deposit(). \
+            transact({'from': self.web3.eth.accounts[0], 'value': to_wei(1, 'ether')})
+
+        listener = EventListener(rpc_provider=self.provider)
+        listener.execute()
+        self.assertEqual(len(bank_deposit_events), 0, 'Unconfirmed block not processed')
+        self.assertEqual(listener.daemon.block_number, self.web3.eth.blockNumber - 2)
+
+        self.eth_tester.mine_blocks(num_blocks=2)
+        listener.execute()
+        self.assertEqual(len(bank_deposit_events), 1, 'Confirmed block processed')
+
     def test_erroneous_event_receiver_impl(self):
         self._create_deposit_event(
             event_receiver='django_ethereum_events.tests.test_event_listener.ErroneousBankDepositEventReceiver')
@@ -317,6 +734,26 @@ class EventListenerTestCase(TestCase):
         self.assertEqual(failed_events.count(), 1, "Failed event log created")
         stored_args = json.loads(failed_events.first().args)
         self.assertEqual(stored_args['amount'], deposit_value, "Failed event log saved correct arguments")
+        self.assertEqual(failed_events.first().error_class, 'builtins.ValueError', "Exception class stored")
+        self.assertEqual(len(failed_events.first().error_fingerprint), 40, "Traceback fingerprint stored")
+
+    @override_settings(ETHEREUM_LOGS_FILTER_AVAILABLE=True)
+    def test_failed_events_bulk_created(self):
+        self._create_deposit_event(
+            event_receiver='django_ethereum_events.tests.test_event_listener.ErroneousBankDepositEventReceiver')
+
+        for _ in range(3):
+            self.bank_contract.functions.deposit(). \
+                transact({'from': self.web3.eth.accounts[0], 'value': to_wei(1, 'ether')})
+
+        listener = EventListener(rpc_provider=self.provider)
+        with patch.object(FailedEventLog.objects, 'bulk_create', wraps=FailedEventLog.objects.bulk_create) as bulk:
+            listener.execute()
+
+        self.assertEqual(bulk.call_count, 1, 'Failed events written at once')
+        self.assertEqual(FailedEventLog.objects.count(), 3)
+        self.assertEqual(FailedEventLog.objects.values('error_fingerprint').distinct().count(), 1,
+                         'Failures of the same bug share a fingerprint')
 
     def test_event_listener_task(self):
         """Test that the event listener task is working as intended"""
@@ -359,3 +796,96 @@ class EventListenerTestCase(TestCase):
         daemon.refresh_from_db()
         self.assertEqual(daemon.block_number, current, 'Erroneous block was not processed')
         self.assertEqual(daemon.last_error_block_number, current + 1, 'Error block was updated')
+
+    def test_stale_fencing_token_rejected(self):
+        """Test that a listener whose lease was taken over cannot move the block cursor"""
+        self._create_deposit_event()
+        self.bank_contract.functions.deposit(). \
+            transact({'from': self.web3.eth.accounts[0], 'value': to_wei(1, 'ether')})
+        Daemon.get_solo()
+        Daemon.objects.update(fencing_token=5)
+
+        listener = EventListener(rpc_provider=self.provider)
+        listener.fencing_token = 4
+        with self.assertRaises(LeaseLost):
+            listener.execute()
+        self.assertEqual(Daemon.get_solo().block_number, 0, 'Cursor not moved')
+        self.assertEqual(listener.daemon.block_number, 0, 'Cursor in memory not moved')
+
+        listener.fencing_token = 6
+        listener.execute()
+        daemon = Daemon.get_solo()
+        self.assertEqual(daemon.block_number, self.web3.eth.blockNumber, 'Blocks processed')
+        self.assertEqual(daemon.fencing_token, 6)
+
+    def test_fencing_token_issued_from_database(self):
+        """Test that the fencing tokens keep increasing when the cache is cleared"""
+        self._create_deposit_event()
+        Daemon.get_solo()
+        Daemon.objects.update(fencing_token=3)
+        cache.clear()
+
+        listener = EventListener(rpc_provider=self.provider)
+        self.assertEqual(listener.acquire_fencing_token(), 4, 'Token greater than the stored one')
+        successor = EventListener(rpc_provider=self.provider)
+        self.assertEqual(successor.acquire_fencing_token(), 5)
+
+        self.bank_contract.functions.deposit(). \
+            transact({'from': self.web3.eth.accounts[0], 'value': to_wei(1, 'ether')})
+        with self.assertRaises(LeaseLost):
+            listener.execute()
+        successor.execute()
+        self.assertEqual(Daemon.get_solo().block_number, self.web3.eth.blockNumber, 'Successor moved the cursor')
+
+    def test_sharded_listeners(self):
+        """Test that every shard processes only its events, with its own cursor"""
+        self._create_deposit_event()
+        self._create_claim_event()
+        shards = next(n for n in range(2, 10) if get_shard(self.bank_address, n) != get_shard(self.claim_address, n))
+
+        self.bank_contract.functions.deposit(). \
+            transact({'from': self.web3.eth.accounts[0], 'value': to_wei(1, 'ether')})
+        self.claim_contract.functions.setClaim(to_bytes(text='hello'), to_bytes(text='world')). \
+            transact({'from': self.web3.eth.accounts[0]})
+        current = self.web3.eth.blockNumber
+
+        with self.settings(ETHEREUM_SHARDS=shards):
+            EventListener(rpc_provider=self.provider, shard=get_shard(self.bank_address)).execute()
+            self.assertEqual(len(bank_deposit_events), 1, 'Deposit event received by its shard')
+            self.assertEqual(len(claim_events), 0, 'Claim event left to its shard')
+
+            with patch.object(event_listener, 'delay', side_effect=lambda shard: event_listener(shard=shard)):
+                event_listener()
+
+        self.assertEqual(len(bank_deposit_events), 1, 'Deposit event received once')
+        self.assertEqual(len(claim_events), 1, 'Claim event received by its shard')
+        self.assertEqual(
+            list(DaemonShard.objects.order_by('shard').values_list('block_number', flat=True)), [current] * shards,
+            'Every shard cursor advanced')
+        self.assertEqual(Daemon.get_solo().block_number, 0, 'Global cursor unused')
+
+    def test_run_event_listener_command(self):
+        """Test that the long running listener processes new blocks and stops gracefully on SIGTERM"""
+        deposit_value = to_wei(1, 'ether')
+        self._create_deposit_event()
+        EventListener(rpc_provider=self.provider)
+
+        self.bank_contract.functions.deposit(). \
+            transact({'from': self.web3.eth.accounts[0], 'value': deposit_value})
+
+        execute = EventListener.execute
+        executions = []
+
+        def execute_and_terminate(listener):
+            executions.append(listener)
+            execute(listener)
+            os.kill(os.getpid(), signal.SIGTERM)
+
+        with patch.object(EventListener, 'execute', execute_and_terminate):
+            call_command('run_event_listener', interval=0.01, stdout=StringIO())
+
+        daemon = Daemon.get_solo()
+        self.assertEqual(len(executions), 1, 'Stopped after the current iteration')
+        self.assertEqual(len(bank_deposit_events), 1, 'Deposit event listener fired')
+        self.assertEqual(daemon.block_number, self.web3.eth.blockNumber, 'Blocks processed')
+        self.assertIsNone(cache.get(LOCK_KEY), 'Lock released')
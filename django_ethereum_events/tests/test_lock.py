@@ -0,0 +1,64 @@
+import time
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from ..lock import LeaseLock, LeaseLost, lease_lock
+
+LOCK_ID = '_django_ethereum_events_test_lock'
+
+
+class LeaseLockTestCase(SimpleTestCase):
+    def tearDown(self):
+        super(LeaseLockTestCase, self).tearDown()
+        cache.clear()
+
+    def test_contention(self):
+        with lease_lock(LOCK_ID) as lock:
+            self.assertIsNotNone(lock)
+            with lease_lock(LOCK_ID) as contender:
+                self.assertIsNone(contender, 'Lock held')
+            self.assertEqual(lock.get_contention(), 1, 'Contention recorded')
+
+        with lease_lock(LOCK_ID) as lock:
+            self.assertIsNotNone(lock, 'Lock released')
+
+    def test_lease_renewed_while_held(self):
+        with lease_lock(LOCK_ID, ttl=0.3) as lock:
+            time.sleep(0.6)
+            self.assertFalse(LeaseLock(LOCK_ID).acquire(), 'Lease renewed by the heartbeat')
+            self.assertFalse(lock.lost)
+
+    def test_expired_lease_taken_over(self):
+        lock = LeaseLock(LOCK_ID, ttl=0.2)
+        self.assertTrue(lock.acquire())
+
+        # Simulate a worker killed while holding the lock
+        lock._stopped.set()
+        lock._heartbeat.join()
+        time.sleep(0.3)
+
+        successor = LeaseLock(LOCK_ID)
+        self.assertTrue(successor.acquire(), 'Expired lease acquired')
+        self.assertGreater(successor.token, lock.token, 'Greater fencing token')
+        with self.assertRaises(LeaseLost):
+            lock.renew()
+
+        lock.release()
+        self.assertFalse(LeaseLock(LOCK_ID).acquire(), 'Successor lock not released by the previous holder')
+        successor.release()
+
+    def test_lease_not_renewed_after_cache_cleared(self):
+        lock = LeaseLock(LOCK_ID)
+        self.assertTrue(lock.acquire())
+        cache.clear()
+
+        successor = LeaseLock(LOCK_ID)
+        self.assertTrue(successor.acquire())
+        self.assertEqual(successor.token, lock.token, 'Token counter restarted')
+        with self.assertRaises(LeaseLost):
+            lock.renew()
+
+        lock.release()
+        self.assertFalse(LeaseLock(LOCK_ID).acquire(), 'Successor lock not released by the previous holder')
+        successor.release()
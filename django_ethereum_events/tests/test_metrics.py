@@ -0,0 +1,50 @@
+from django.test import RequestFactory, TestCase
+
+from ..metrics import Registry
+from ..views import metrics
+
+
+class RegistryTestCase(TestCase):
+    def setUp(self):
+        super(RegistryTestCase, self).setUp()
+        self.registry = Registry()
+
+    def test_render(self):
+        requests = self.registry.counter('requests_total', 'Requests.', ('method',))
+        lag = self.registry.gauge('lag_blocks', 'Lag.')
+        latency = self.registry.histogram('latency_seconds', 'Latency.', buckets=(0.1, 1))
+
+        requests.inc(method='eth_getLogs')
+        requests.inc(2, method='eth_getLogs')
+        lag.set(5)
+        latency.observe(0.5)
+        latency.observe(2)
+
+        lines = self.registry.render().splitlines()
+        self.assertIn('# TYPE requests_total counter', lines)
+        self.assertIn('requests_total{method="eth_getLogs"} 3.0', lines)
+        self.assertIn('lag_blocks 5.0', lines)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 0.0', lines)
+        self.assertIn('latency_seconds_bucket{le="1.0"} 1.0', lines, 'Buckets are cumulative')
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 2.0', lines)
+        self.assertIn('latency_seconds_count 2.0', lines)
+        self.assertIn('latency_seconds_sum 2.5', lines)
+
+    def test_labels_checked(self):
+        requests = self.registry.counter('requests_total', 'Requests.', ('method',))
+
+        with self.assertRaises(ValueError):
+            requests.inc(endpoint='node1')
+
+    def test_names_unique(self):
+        self.registry.counter('requests_total', 'Requests.')
+
+        with self.assertRaises(ValueError):
+            self.registry.gauge('requests_total', 'Requests.')
+
+    def test_view(self):
+        response = metrics(RequestFactory().get('/metrics'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn(b'# TYPE ethereum_events_stage_seconds histogram', response.content)
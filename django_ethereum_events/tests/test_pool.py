@@ -0,0 +1,101 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from django.test import TestCase
+from requests.exceptions import ConnectionError
+
+from ..pool import MIN_HEDGE_SAMPLES, PooledHTTPProvider
+
+
+class PooledHTTPProviderTestCase(TestCase):
+    def setUp(self):
+        super(PooledHTTPProviderTestCase, self).setUp()
+        self.pool = PooledHTTPProvider(
+            ['http://node0:8545', 'http://node1:8545'], hedge_percentile=95, eject_failures=2, eject_seconds=60)
+        self.node0, self.node1 = [endpoint.provider for endpoint in self.pool.endpoints]
+
+    def respond(self, provider, result):
+        return patch.object(provider, 'make_request', return_value={'jsonrpc': '2.0', 'id': 1, 'result': result})
+
+    def test_least_loaded_endpoint_used(self):
+        self.pool.endpoints[0].in_flight = 1
+
+        with self.respond(self.node0, '0x0'), self.respond(self.node1, '0x1'):
+            response = self.pool.make_request('eth_blockNumber', [])
+
+        self.assertEqual(response['result'], '0x1', 'Request sent to the idle endpoint')
+
+    def test_failing_endpoint_ejected(self):
+        with patch.object(self.node0, 'make_request', side_effect=ConnectionError('down')) as node0, \
+                self.respond(self.node1, '0x1') as node1:
+            results = [self.pool.make_request('eth_blockNumber', [])['result'] for _ in range(3)]
+
+        self.assertEqual(results, ['0x1'] * 3, 'Failed requests sent to the next endpoint')
+        self.assertFalse(self.pool.endpoints[0].healthy, 'Endpoint ejected')
+        self.assertEqual(node0.call_count, 2, 'Ejected endpoint not used')
+        self.assertEqual(node1.call_count, 3)
+
+    def test_every_endpoint_failing(self):
+        with patch.object(self.node0, 'make_request', side_effect=ConnectionError('down')), \
+                patch.object(self.node1, 'make_request', side_effect=ConnectionError('down')):
+            with self.assertRaises(ConnectionError):
+                self.pool.make_request('eth_blockNumber', [])
+
+    def test_rpc_error_not_a_failure(self):
+        error = {'jsonrpc': '2.0', 'id': 1, 'error': {'code': -32000, 'message': 'boom'}}
+        with patch.object(self.node0, 'make_request', return_value=error), self.respond(self.node1, '0x1') as node1:
+            response = self.pool.make_request('eth_blockNumber', [])
+
+        self.assertEqual(response, error, 'JSON-RPC errors returned')
+        self.assertEqual(self.pool.endpoints[0].failures, 0)
+        node1.assert_not_called()
+
+    def test_slow_read_hedged(self):
+        self.pool.endpoints[0].latencies.extend([0.01] * MIN_HEDGE_SAMPLES)
+        released = threading.Event()
+
+        def slow_request(method, params):
+            released.wait(5)
+            return {'jsonrpc': '2.0', 'id': 1, 'result': '0x0'}
+
+        try:
+            with patch.object(self.node0, 'make_request', side_effect=slow_request), \
+                    self.respond(self.node1, '0x1'):
+                response = self.pool.make_request('eth_blockNumber', [])
+        finally:
+            released.set()
+
+        self.assertEqual(response['result'], '0x1', 'Response of the hedged request used')
+
+    def test_writes_not_hedged(self):
+        for endpoint in self.pool.endpoints:
+            endpoint.latencies.extend([0.01] * MIN_HEDGE_SAMPLES)
+
+        def slow_request(method, params):
+            time.sleep(0.1)
+            return {'jsonrpc': '2.0', 'id': 1, 'result': '0x0'}
+
+        with patch.object(self.node0, 'make_request', side_effect=slow_request) as node0, \
+                patch.object(self.node1, 'make_request', side_effect=slow_request) as node1:
+            self.pool.make_request('eth_sendRawTransaction', ['0x00'])
+
+        self.assertEqual(node0.call_count + node1.call_count, 1, 'Request sent once')
+
+    def test_hedged_reads_not_capped(self):
+        for endpoint in self.pool.endpoints:
+            endpoint.latencies.extend([1] * MIN_HEDGE_SAMPLES)
+
+        def slow_request(method, params):
+            time.sleep(0.3)
+            return {'jsonrpc': '2.0', 'id': 1, 'result': '0x0'}
+
+        with patch.object(self.node0, 'make_request', side_effect=slow_request), \
+                patch.object(self.node1, 'make_request', side_effect=slow_request), \
+                ThreadPoolExecutor(max_workers=16) as executor:
+            started = time.monotonic()
+            list(executor.map(lambda _: self.pool.make_request('eth_getLogs', [{}]), range(16)))
+            elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 0.6, 'Concurrent requests not queued behind each other')
@@ -0,0 +1,154 @@
+import json
+from unittest.mock import Mock, patch
+
+from django.test import TestCase
+from requests import Response
+from requests.exceptions import ConnectionError, HTTPError, ReadTimeout
+from web3 import Web3
+
+from ..ratelimit import CircuitOpen, RequestScheduler, TokenBucket
+from ..rpc import BatchHTTPProvider, BlockFetcher
+
+
+def http_error(status, retry_after=None):
+    response = Response()
+    response.status_code = status
+    if retry_after is not None:
+        response.headers['Retry-After'] = retry_after
+    return HTTPError(response=response)
+
+
+@patch('django_ethereum_events.ratelimit.time.sleep')
+class TokenBucketTestCase(TestCase):
+    def test_requests_paced(self, sleep):
+        bucket = TokenBucket(rate=10, capacity=2)
+
+        waits = [bucket.acquire(1) for _ in range(4)]
+
+        self.assertEqual(waits[:2], [0, 0], 'Burst served right away')
+        self.assertAlmostEqual(waits[2], 0.1, places=2, msg='Requests spread at the bucket rate')
+        self.assertAlmostEqual(waits[3], 0.2, places=2)
+
+    def test_rate_adapts(self, sleep):
+        bucket = TokenBucket(rate=100)
+
+        for _ in range(20):
+            bucket.throttle()
+        self.assertEqual(bucket.rate, 10, 'Rate lowered down to a tenth')
+
+        for _ in range(200):
+            bucket.recover()
+        self.assertEqual(bucket.rate, 100, 'Rate raised back up to the configured rate')
+
+
+@patch('django_ethereum_events.ratelimit.time.sleep')
+class RequestSchedulerTestCase(TestCase):
+    def setUp(self):
+        super(RequestSchedulerTestCase, self).setUp()
+        self.scheduler = RequestScheduler(
+            rate=100, method_costs={'eth_getLogs': 75}, retries=3, backoff=1, backoff_max=4,
+            breaker_failures=2, breaker_seconds=30)
+
+    def test_method_costs(self, sleep):
+        self.assertEqual(self.scheduler.get_cost(['eth_getLogs', 'eth_blockNumber']), 76)
+
+    def test_throttled_request_retried(self, sleep):
+        send = Mock(side_effect=[http_error(429, retry_after='2'), {'result': '0x1'}])
+
+        response = self.scheduler.call(['eth_blockNumber'], send)
+
+        self.assertEqual(response, {'result': '0x1'})
+        self.assertEqual(send.call_count, 2)
+        sleep.assert_called_with(2.0)
+        self.assertLess(self.scheduler.bucket.rate, 100, 'Rate lowered after throttling')
+        self.assertFalse(self.scheduler.breaker.failures, 'Throttling is not a node failure')
+
+    def test_rate_limit_response_retried(self, sleep):
+        throttled = {'error': {'code': -32005, 'message': 'daily request count exceeded, request rate limited'}}
+        send = Mock(side_effect=[throttled, throttled, {'result': '0x1'}])
+
+        response = self.scheduler.call(['eth_blockNumber'], send)
+
+        self.assertEqual(response, {'result': '0x1'})
+        backoffs = [call[0][0] for call in sleep.call_args_list]
+        self.assertEqual(len(backoffs), 2, 'Backoff before every retry')
+        self.assertTrue(0 <= backoffs[0] <= 1 and 0 <= backoffs[1] <= 2, 'Exponential backoff with jitter')
+
+    def test_retries_exhausted(self, sleep):
+        send = Mock(side_effect=http_error(429))
+
+        with self.assertRaises(HTTPError):
+            self.scheduler.call(['eth_blockNumber'], send)
+        self.assertEqual(send.call_count, 4, 'First attempt and 3 retries')
+
+    def test_client_error_not_retried(self, sleep):
+        send = Mock(side_effect=http_error(400))
+
+        with self.assertRaises(HTTPError):
+            self.scheduler.call(['eth_blockNumber'], send)
+        self.assertEqual(send.call_count, 1)
+
+    def test_circuit_breaker(self, sleep):
+        send = Mock(side_effect=ConnectionError('down'))
+
+        with self.assertRaises(CircuitOpen):
+            self.scheduler.call(['eth_blockNumber'], send)
+        self.assertEqual(send.call_count, 2, 'Calls stopped once the circuit is open')
+
+        with self.assertRaises(CircuitOpen):
+            self.scheduler.call(['eth_blockNumber'], send)
+        self.assertEqual(send.call_count, 2, 'No call while the circuit is open')
+
+        # The trial call after the reset period closes the circuit
+        self.scheduler.breaker.opened_at -= 30
+        send = Mock(return_value={'result': '0x1'})
+        self.assertEqual(self.scheduler.call(['eth_blockNumber'], send), {'result': '0x1'})
+        self.assertFalse(self.scheduler.breaker.is_open)
+
+    def test_circuit_breaker_trial_timed_out(self, sleep):
+        with self.assertRaises(CircuitOpen):
+            self.scheduler.call(['eth_blockNumber'], Mock(side_effect=ConnectionError('down')))
+
+        # The trial call times out, the circuit opens again
+        self.scheduler.breaker.opened_at -= 30
+        send = Mock(side_effect=ReadTimeout('slow'))
+        with self.assertRaises(CircuitOpen):
+            self.scheduler.call(['eth_blockNumber'], send)
+        self.assertEqual(send.call_count, 1, 'Single trial call')
+        self.assertTrue(self.scheduler.breaker.is_open)
+
+        # The next trial call closes it
+        self.scheduler.breaker.opened_at -= 30
+        send = Mock(return_value={'result': '0x1'})
+        for _ in range(3):
+            self.assertEqual(self.scheduler.call(['eth_blockNumber'], send), {'result': '0x1'})
+        self.assertFalse(self.scheduler.breaker.is_open)
+
+    def test_circuit_breaker_trial_client_error(self, sleep):
+        with self.assertRaises(CircuitOpen):
+            self.scheduler.call(['eth_blockNumber'], Mock(side_effect=ConnectionError('down')))
+
+        self.scheduler.breaker.opened_at -= 30
+        with self.assertRaises(HTTPError):
+            self.scheduler.call(['eth_blockNumber'], Mock(side_effect=http_error(400)))
+        self.assertFalse(self.scheduler.breaker.is_open, 'Node answering, circuit closed')
+        self.assertEqual(self.scheduler.call(['eth_blockNumber'], Mock(return_value={'result': '0x1'})),
+                         {'result': '0x1'})
+
+    def test_throttled_batch_retried(self, sleep):
+        requests = []
+
+        def fake_post(endpoint_uri, data, **kwargs):
+            calls = json.loads(data)
+            requests.append(calls)
+            if len(requests) == 1:
+                return json.dumps({'jsonrpc': '2.0', 'id': None, 'error': {
+                    'code': 429, 'message': 'Your app has exceeded its compute units per second capacity'}})
+            return json.dumps([{'jsonrpc': '2.0', 'id': call['id'], 'result': None} for call in calls])
+
+        fetcher = BlockFetcher(Web3(BatchHTTPProvider('http://localhost:8545')), scheduler=self.scheduler)
+        with patch('django_ethereum_events.rpc.make_post_request', fake_post):
+            blocks = fetcher.get_blocks([1, 2])
+
+        self.assertEqual(blocks, [None, None])
+        self.assertEqual(len(requests), 2, 'Rejected batch sent again')
@@ -0,0 +1,214 @@
+import json
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from eth_tester import EthereumTester, PyEVMBackend
+from eth_utils import event_abi_to_log_topic, keccak, to_bytes, to_wei
+from hexbytes import HexBytes
+from web3 import EthereumTesterProvider, Web3
+from web3._utils.events import get_event_data
+from web3.datastructures import AttributeDict
+
+from ..chainevents import AbstractEventReceiver
+from ..event_listener import EventListener
+from ..models import FailedEventLog, MonitoredEvent
+from ..replay import FailedEventReplayer
+from ..utils import Singleton
+from ..web3_service import Web3Service
+from .contracts.bank import BANK_ABI_RAW, BANK_BYTECODE
+from .contracts.claim import CLAIM_ABI_RAW, CLAIM_BYTECODE
+from .test_event_listener import bank_deposit_events
+
+from ..utils import HexJsonEncoder
+
+TAGGED_EVENT_ABI = {
+    'anonymous': False,
+    'name': 'Tagged',
+    'type': 'event',
+    'inputs': [
+        {'indexed': True, 'name': 'tag', 'type': 'string'},
+        {'indexed': False, 'name': 'pair', 'type': 'bytes32[2]'},
+        {'indexed': False, 'name': 'values', 'type': 'uint256[]'},
+    ],
+}
+
+# Keeps track of the events passed to the receivers
+received_events = []
+saved_batches = []
+
+
+class FailingEventReceiver(AbstractEventReceiver):
+    def save(self, decoded_event):
+        received_events.append(decoded_event)
+        raise ValueError
+
+
+class RecordingEventReceiver(AbstractEventReceiver):
+    def save(self, decoded_event):
+        received_events.append(decoded_event)
+
+
+class ReplayEventReceiver(AbstractEventReceiver):
+    def save(self, decoded_event):
+        if decoded_event.args.amount == to_wei(2, 'ether'):
+            raise ValueError
+        received_events.append(decoded_event)
+
+
+class BatchReplayEventReceiver(AbstractEventReceiver):
+    def save(self, decoded_event):
+        received_events.append(decoded_event)
+
+    def save_batch(self, decoded_events):
+        saved_batches.append(decoded_events)
+        received_events.extend(decoded_events)
+
+
+class FailedEventReplayerTestCase(TestCase):
+    def setUp(self):
+        super(FailedEventReplayerTestCase, self).setUp()
+        Singleton._instances.pop(Web3Service, None)
+
+    def tearDown(self):
+        super(FailedEventReplayerTestCase, self).tearDown()
+        # Web3Service is a singleton, do not leak this test case provider into other test cases
+        Singleton._instances.pop(Web3Service, None)
+        cache.clear()
+        received_events.clear()
+        saved_batches.clear()
+        bank_deposit_events.clear()
+        self.eth_tester.revert_to_snapshot(self.clean_state_snapshot)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.eth_tester = EthereumTester(backend=PyEVMBackend())
+        cls.provider = EthereumTesterProvider(cls.eth_tester)
+        cls.web3 = Web3(cls.provider)
+
+        cls.bank_abi = json.loads(BANK_ABI_RAW)
+        Bank = cls.web3.eth.contract(abi=cls.bank_abi, bytecode=BANK_BYTECODE)
+        tx_receipt = cls.web3.eth.waitForTransactionReceipt(Bank.constructor().transact())
+        cls.bank_address = tx_receipt.contractAddress
+        cls.bank_contract = cls.web3.eth.contract(address=cls.bank_address, abi=cls.bank_abi)
+
+        cls.claim_abi = json.loads(CLAIM_ABI_RAW)
+        Claim = cls.web3.eth.contract(abi=cls.claim_abi, bytecode=CLAIM_BYTECODE)
+        tx_receipt = cls.web3.eth.waitForTransactionReceipt(Claim.constructor().transact())
+        cls.claim_address = tx_receipt.contractAddress
+        cls.claim_contract = cls.web3.eth.contract(address=cls.claim_address, abi=cls.claim_abi)
+
+        cls.clean_state_snapshot = cls.eth_tester.take_snapshot()
+
+    def _fail_deposits(self, amounts):
+        """Stores a failed event for every deposit of the given amounts (in ether)."""
+        event = MonitoredEvent.objects.register_event(
+            event_name='LogDeposit',
+            contract_address=self.bank_address,
+            contract_abi=self.bank_abi,
+            event_receiver='django_ethereum_events.tests.test_replay.FailingEventReceiver'
+        )
+        for amount in amounts:
+            self.bank_contract.functions.deposit(). \
+                transact({'from': self.web3.eth.accounts[0], 'value': to_wei(amount, 'ether')})
+
+        EventListener(rpc_provider=self.provider).execute()
+        received_events.clear()
+        return event
+
+    def test_decoded_event_rebuilt(self):
+        MonitoredEvent.objects.register_event(
+            event_name='ClaimSet',
+            contract_address=self.claim_address,
+            contract_abi=self.claim_abi,
+            event_receiver='django_ethereum_events.tests.test_replay.FailingEventReceiver'
+        )
+        self.claim_contract.functions.setClaim(to_bytes(text='hello'), to_bytes(text='world')). \
+            transact({'from': self.web3.eth.accounts[0]})
+        EventListener(rpc_provider=self.provider).execute()
+
+        self.assertEqual(FailedEventLog.objects.get().get_decoded_event(), received_events[0],
+                         'Decoded event rebuilt from the stored fields')
+
+    def _fail_tagged_event(self, monitored_event, log_index, args=None):
+        """Stores a failed `Tagged` event, returns the event as decoded by `get_event_data`."""
+        log = AttributeDict({
+            'address': self.bank_address,
+            'topics': [HexBytes(event_abi_to_log_topic(TAGGED_EVENT_ABI)), HexBytes(keccak(text='tag'))],
+            'data': HexBytes(self.web3.codec.encode_abi(
+                ['bytes32[2]', 'uint256[]'], [[b'\x01' * 32, b'\x02' * 32], [1, 2, 3]])),
+            'logIndex': log_index,
+            'transactionIndex': 0,
+            'transactionHash': HexBytes('0x' + '11' * 32),
+            'blockHash': HexBytes('0x' + '22' * 32),
+            'blockNumber': 1,
+        })
+        decoded_event = get_event_data(self.web3.codec, TAGGED_EVENT_ABI, log)
+        FailedEventLog.objects.create(
+            event='Tagged',
+            transaction_hash=log.transactionHash.hex(),
+            transaction_index=0,
+            block_hash=log.blockHash.hex(),
+            block_number=1,
+            log_index=log_index,
+            address=self.bank_address,
+            args=args or json.dumps(decoded_event.args, cls=HexJsonEncoder),
+            monitored_event=monitored_event,
+        )
+        return decoded_event
+
+    def test_array_and_indexed_arguments_rebuilt(self):
+        monitored_event = MonitoredEvent.objects.register_event(
+            event_name='Tagged',
+            contract_address=self.bank_address,
+            contract_abi=[TAGGED_EVENT_ABI],
+            event_receiver='django_ethereum_events.tests.test_replay.RecordingEventReceiver'
+        )
+        decoded_event = self._fail_tagged_event(monitored_event, 0)
+
+        self.assertEqual(FailedEventLog.objects.get().get_decoded_event().args, decoded_event.args,
+                         'Fixed-size bytes array and indexed string hash rebuilt')
+
+    def test_replay_skips_events_that_cannot_be_rebuilt(self):
+        monitored_event = MonitoredEvent.objects.register_event(
+            event_name='Tagged',
+            contract_address=self.bank_address,
+            contract_abi=[TAGGED_EVENT_ABI],
+            event_receiver='django_ethereum_events.tests.test_replay.RecordingEventReceiver'
+        )
+        self._fail_tagged_event(monitored_event, 0)
+        self._fail_tagged_event(monitored_event, 1, args=json.dumps({'tag': '0x00', 'pair': 5, 'values': []}))
+        self._fail_tagged_event(monitored_event, 2)
+
+        replayed, failed = FailedEventReplayer(workers=2, batch_size=10).replay()
+
+        self.assertEqual((replayed, failed), (2, 1))
+        self.assertEqual([e.logIndex for e in received_events], [0, 2], 'Other events of the batch replayed')
+        self.assertEqual(FailedEventLog.objects.get().log_index, 1, 'Only the broken entry kept')
+
+    def test_replay_keeps_failing_events(self):
+        event = self._fail_deposits([1, 2, 3])
+        MonitoredEvent.objects.filter(pk=event.pk).update(
+            event_receiver='django_ethereum_events.tests.test_replay.ReplayEventReceiver')
+
+        replayed, failed = FailedEventReplayer(workers=2, batch_size=2).replay()
+
+        self.assertEqual((replayed, failed), (2, 1))
+        self.assertEqual(sorted(e.args.amount for e in received_events), [to_wei(1, 'ether'), to_wei(3, 'ether')])
+        self.assertEqual(FailedEventLog.objects.get().block_number, min(e.blockNumber for e in received_events) + 1,
+                         'Still failing event kept')
+
+    def test_replay_command_uses_save_batch(self):
+        event = self._fail_deposits([1, 2, 3])
+        MonitoredEvent.objects.filter(pk=event.pk).update(
+            event_receiver='django_ethereum_events.tests.test_replay.BatchReplayEventReceiver')
+
+        out = StringIO()
+        call_command('replay_failed_events', batch_size=10, stdout=out)
+
+        self.assertIn('3 failed events replayed, 0 still failing', out.getvalue())
+        self.assertEqual(len(saved_batches), 1, 'Events replayed in a single batch')
+        self.assertEqual([e.args.amount for e in saved_batches[0]], [to_wei(i, 'ether') for i in (1, 2, 3)],
+                         'Batch in chain order')
+        self.assertEqual(FailedEventLog.objects.count(), 0, 'Replayed events deleted')
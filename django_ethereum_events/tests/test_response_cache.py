@@ -0,0 +1,58 @@
+import tempfile
+from unittest.mock import patch
+
+from django.test import TestCase
+from hexbytes import HexBytes
+from web3 import Web3
+
+from ..response_cache import ResponseCache
+from ..rpc import BatchHTTPProvider, BlockFetcher
+from .test_rpc import BLOCK_HASH, TX_HASH, batch_responder
+
+RECEIPT = {'transactionHash': TX_HASH, 'blockHash': BLOCK_HASH, 'blockNumber': '0x1', 'logs': []}
+
+
+class ResponseCacheTestCase(TestCase):
+    def test_only_final_results_cached(self):
+        cache = ResponseCache(lambda: 10, size=10, finality_depth=5)
+
+        cache.put('eth_getTransactionReceipt', [TX_HASH], RECEIPT)
+        cache.put('eth_getBlockByNumber', ['0x6', False], {'number': '0x6'})
+        cache.put('eth_getBlockByNumber', ['latest', False], {'number': '0xa'})
+        cache.put('eth_getBalance', ['0x00', 'latest'], '0x1')
+
+        self.assertEqual(cache.get('eth_getTransactionReceipt', [TX_HASH]), RECEIPT, 'Final receipt cached')
+        self.assertIsNone(cache.get('eth_getBlockByNumber', ['0x6', False]), 'Recent block not cached')
+        self.assertIsNone(cache.get('eth_getBlockByNumber', ['latest', False]), 'Block tag not cached')
+        self.assertIsNone(cache.get('eth_getBalance', ['0x00', 'latest']), 'Mutable state not cached')
+
+    def test_memory_tier_bounded(self):
+        cache = ResponseCache(lambda: 100, size=2, finality_depth=0)
+        for n in range(3):
+            cache.put('eth_getBlockByNumber', [hex(n), False], {'number': hex(n)})
+
+        self.assertIsNone(cache.get('eth_getBlockByNumber', ['0x0', False]), 'Least recently used entry evicted')
+        self.assertIsNotNone(cache.get('eth_getBlockByNumber', ['0x2', False]))
+
+    def test_disk_tier_shared(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResponseCache(lambda: 100, size=0, directory=directory, finality_depth=0)
+            cache.put('eth_getBlockByNumber', ['0x1', False], {'number': '0x1'})
+            cache.close()
+
+            cache = ResponseCache(lambda: 100, size=10, directory=directory, finality_depth=0)
+            self.assertEqual(cache.get('eth_getBlockByNumber', ['0x1', False]), {'number': '0x1'},
+                             'Result read from disk')
+            cache.close()
+
+    def test_batch_calls_served_from_cache(self):
+        web3 = Web3(BatchHTTPProvider('http://localhost:8545'))
+        fetcher = BlockFetcher(web3, response_cache=ResponseCache(lambda: 100, size=10, finality_depth=0))
+        fake_post, requests = batch_responder({'eth_getTransactionReceipt': RECEIPT})
+
+        with patch('django_ethereum_events.rpc.make_post_request', fake_post):
+            fetcher.get_transaction_receipts([HexBytes(TX_HASH)])
+            receipts = fetcher.get_transaction_receipts([HexBytes(TX_HASH)])
+
+        self.assertEqual(len(requests), 1, 'Final receipt requested once')
+        self.assertEqual(receipts[0].blockNumber, 1, 'Cached receipt formatted')
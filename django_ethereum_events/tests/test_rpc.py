@@ -0,0 +1,115 @@
+import json
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from hexbytes import HexBytes
+from web3 import Web3
+
+from ..rpc import BatchHTTPProvider, BlockFetcher
+
+TX_HASH = '0x' + '11' * 32
+BLOCK_HASH = '0x' + '22' * 32
+
+
+def batch_responder(results_by_method):
+    """Returns a fake `make_post_request` that answers every batch call in reverse order."""
+    requests = []
+
+    def make_post_request(endpoint_uri, data, **kwargs):
+        calls = json.loads(data)
+        requests.append(calls)
+        responses = [
+            {'jsonrpc': '2.0', 'id': call['id'], 'result': results_by_method[call['method']]}
+            for call in calls
+        ]
+        return json.dumps(list(reversed(responses))).encode('utf-8')
+
+    return make_post_request, requests
+
+
+class BlockFetcherTestCase(TestCase):
+    def setUp(self):
+        super(BlockFetcherTestCase, self).setUp()
+        self.provider = BatchHTTPProvider('http://localhost:8545')
+        self.web3 = Web3(self.provider)
+
+    def test_receipts_fetched_in_batches(self):
+        receipt = {
+            'transactionHash': TX_HASH,
+            'blockHash': BLOCK_HASH,
+            'blockNumber': '0x1',
+            'transactionIndex': '0x0',
+            'cumulativeGasUsed': '0x5208',
+            'gasUsed': '0x5208',
+            'status': '0x1',
+            'logs': [],
+        }
+        fake_post, requests = batch_responder({'eth_getTransactionReceipt': receipt})
+        fetcher = BlockFetcher(self.web3, batch_size=2)
+
+        with patch('django_ethereum_events.rpc.make_post_request', fake_post):
+            receipts = fetcher.get_transaction_receipts([HexBytes(TX_HASH)] * 5)
+
+        self.assertEqual([len(calls) for calls in requests], [2, 2, 1], 'Calls split by batch size')
+        self.assertEqual(len(receipts), 5)
+        self.assertEqual(receipts[0].transactionHash, HexBytes(TX_HASH), 'Receipt formatted')
+        self.assertEqual(receipts[0].blockNumber, 1, 'Receipt formatted')
+
+    def test_batch_error_raised(self):
+        def fake_post(endpoint_uri, data, **kwargs):
+            calls = json.loads(data)
+            return json.dumps([
+                {'jsonrpc': '2.0', 'id': call['id'], 'error': {'code': -32000, 'message': 'boom'}}
+                for call in calls
+            ]).encode('utf-8')
+
+        fetcher = BlockFetcher(self.web3)
+        with patch('django_ethereum_events.rpc.make_post_request', fake_post):
+            with self.assertRaises(ValueError):
+                fetcher.get_blocks([1, 2])
+
+    @override_settings(ETHEREUM_GETH_POA=True)
+    def test_poa_blocks_formatted(self):
+        block = {
+            'number': '0x1',
+            'hash': BLOCK_HASH,
+            'parentHash': BLOCK_HASH,
+            'extraData': '0x' + 'ab' * 97,
+            'logsBloom': '0x' + '00' * 256,
+            'transactions': [],
+        }
+        fake_post, _ = batch_responder({'eth_getBlockByNumber': block})
+        fetcher = BlockFetcher(self.web3)
+
+        with patch('django_ethereum_events.rpc.make_post_request', fake_post):
+            blocks = fetcher.get_blocks([1])
+
+        self.assertEqual(blocks[0].number, 1)
+        self.assertEqual(blocks[0].proofOfAuthorityData, HexBytes('0x' + 'ab' * 97), 'PoA extraData moved')
+
+    def test_block_receipts_used_when_supported(self):
+        receipt = {'transactionHash': TX_HASH, 'blockHash': BLOCK_HASH, 'blockNumber': '0x1', 'logs': []}
+        block = {'number': 1, 'hash': HexBytes(BLOCK_HASH), 'transactions': [HexBytes(TX_HASH)] * 3}
+        fetcher = BlockFetcher(self.web3)
+
+        with patch.object(self.web3.manager, 'request_blocking', return_value=[receipt] * 3) as request:
+            receipts = fetcher.get_block_receipts(block)
+            fetcher.get_block_receipts(block)
+
+        self.assertTrue(fetcher.supports_block_receipts)
+        self.assertEqual(request.call_count, 3, 'Capability detected once, one call per block')
+        self.assertEqual(len(receipts), 3)
+        self.assertEqual(receipts[0].blockNumber, 1, 'Receipt formatted')
+
+    def test_block_receipts_fallback(self):
+        fake_post, requests = batch_responder({'eth_getTransactionReceipt': None})
+        block = {'number': 1, 'hash': HexBytes(BLOCK_HASH), 'transactions': [HexBytes(TX_HASH)] * 3}
+        fetcher = BlockFetcher(self.web3)
+
+        with patch.object(self.web3.manager, 'request_blocking', side_effect=ValueError('Method not found')), \
+                patch('django_ethereum_events.rpc.make_post_request', fake_post):
+            receipts = fetcher.get_block_receipts(block)
+
+        self.assertFalse(fetcher.supports_block_receipts)
+        self.assertEqual(receipts, [None] * 3)
+        self.assertEqual(len(requests), 1, 'Receipts fetched with a single batch')
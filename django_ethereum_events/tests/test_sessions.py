@@ -0,0 +1,50 @@
+import socket
+import threading
+from unittest.mock import Mock, patch
+
+from django.test import TestCase
+
+from ..rpc import BatchHTTPProvider
+from ..sessions import HTTPSessions
+
+
+class HTTPSessionsTestCase(TestCase):
+    def get_thread_session(self, sessions):
+        thread_sessions = []
+        thread = threading.Thread(target=lambda: thread_sessions.append(sessions.get()))
+        thread.start()
+        thread.join()
+        return thread_sessions[0]
+
+    def test_session_shared_by_threads(self):
+        sessions = HTTPSessions(per_thread=False)
+
+        self.assertIs(sessions.get(), self.get_thread_session(sessions), 'Connections reused by every thread')
+
+    def test_session_per_thread(self):
+        sessions = HTTPSessions(per_thread=True)
+
+        self.assertIs(sessions.get(), sessions.get())
+        self.assertIsNot(sessions.get(), self.get_thread_session(sessions), 'Thread has its own session')
+
+    def test_connection_pool_settings(self):
+        sessions = HTTPSessions(pool_size=32, pool_block=True, connect_retries=2, tcp_keepalive=30)
+
+        adapter = sessions.get().get_adapter('https://node:8545')
+        pool_kwargs = adapter.poolmanager.connection_pool_kw
+        self.assertEqual(pool_kwargs['maxsize'], 32)
+        self.assertTrue(pool_kwargs['block'])
+        self.assertIn((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1), pool_kwargs['socket_options'])
+        self.assertEqual(adapter.max_retries.connect, 2)
+        self.assertEqual(adapter.max_retries.read, 0, 'Sent requests never resent')
+
+    def test_provider_uses_sessions(self):
+        sessions = HTTPSessions()
+        provider = BatchHTTPProvider('http://node:8545', sessions=sessions)
+        response = Mock(content=b'{"jsonrpc": "2.0", "id": 0, "result": "0x1"}')
+
+        with patch.object(sessions.get(), 'post', return_value=response) as post:
+            result = provider.make_request('eth_blockNumber', [])
+
+        self.assertEqual(result['result'], '0x1')
+        self.assertEqual(post.call_args[0][0], 'http://node:8545')
@@ -0,0 +1,97 @@
+import asyncio
+import json
+import threading
+
+import websockets
+from django.test import SimpleTestCase
+
+from ..subscription import NodeSubscription
+
+
+class FakeNode(threading.Thread):
+    """Local WebSocket stand-in for a node that supports `eth_subscribe`."""
+
+    def __init__(self):
+        super(FakeNode, self).__init__(daemon=True)
+        self.requests = []
+        self.connections = []
+        self.ready = threading.Event()
+        self.loop = asyncio.new_event_loop()
+
+    async def handler(self, websocket, path=None):
+        self.connections.append(websocket)
+        request = json.loads(await websocket.recv())
+        self.requests.append(request)
+        await websocket.send(json.dumps({'jsonrpc': '2.0', 'id': request['id'], 'result': '0xcd0c3e8af590364c'}))
+        await websocket.wait_closed()
+
+    async def _serve(self):
+        self.server = await websockets.serve(self.handler, 'localhost', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.ready.set()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._serve())
+        self.loop.run_forever()
+
+    def call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout=5)
+
+    def notify(self):
+        message = json.dumps({
+            'jsonrpc': '2.0',
+            'method': 'eth_subscription',
+            'params': {'subscription': '0xcd0c3e8af590364c', 'result': {'number': '0x1b4'}}
+        })
+        self.call(self.connections[-1].send(message))
+
+    def disconnect(self):
+        self.call(self.connections[-1].close())
+
+    def shutdown(self):
+        self.server.close()
+        self.call(self.server.wait_closed())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+class NodeSubscriptionTestCase(SimpleTestCase):
+    def setUp(self):
+        super(NodeSubscriptionTestCase, self).setUp()
+        self.node = FakeNode()
+        self.node.start()
+        self.node.ready.wait(5)
+        self.uri = 'ws://localhost:{0}'.format(self.node.port)
+
+    def tearDown(self):
+        super(NodeSubscriptionTestCase, self).tearDown()
+        self.node.shutdown()
+
+    def test_new_heads_trigger_processing(self):
+        subscription = NodeSubscription(self.uri, 'newHeads', reconnect_delay=0.01)
+        subscription.start()
+        try:
+            self.assertTrue(subscription.wait(5), 'Catch up triggered after connecting')
+            self.assertEqual(self.node.requests[0]['params'], ['newHeads'])
+
+            self.assertFalse(subscription.wait(0.05), 'No notification')
+            self.node.notify()
+            self.assertTrue(subscription.wait(5), 'New head triggers processing')
+        finally:
+            subscription.stop()
+            subscription.join(5)
+
+    def test_catch_up_triggered_after_reconnect(self):
+        filter_params = {'address': ['0x' + '11' * 20], 'topics': [['0x' + '22' * 32]]}
+        subscription = NodeSubscription(self.uri, 'logs', filter_params=lambda: filter_params, reconnect_delay=0.01)
+        subscription.start()
+        try:
+            self.assertTrue(subscription.wait(5))
+            self.node.disconnect()
+
+            self.assertTrue(subscription.wait(5), 'Catch up triggered after reconnecting')
+            self.assertEqual(len(self.node.requests), 2, 'Subscribed again')
+            self.assertEqual(self.node.requests[1]['params'], ['logs', filter_params])
+        finally:
+            subscription.stop()
+            subscription.join(5)
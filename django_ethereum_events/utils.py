@@ -1,5 +1,8 @@
+import hashlib
 import json
+import traceback
 
+from django.conf import settings
 from django.core.cache import cache
 
 from eth_utils import encode_hex, event_abi_to_log_topic
@@ -45,9 +48,57 @@ def event_topic_from_contract_abi(abi, event_name):
     return event_topic.hex()
 
 
-def refresh_cache_update_value(update_required=False):
+def exception_fingerprint(exc):
+    """Returns a hash identifying the origin of the given exception.
+
+    The hash covers the exception class and the file, function and line of every
+    traceback frame, but not the exception message, so that the same bug raised
+    by different events shares the same fingerprint.
+
+    Args:
+        exc (Exception): the raised exception
+
+    Returns:
+        str: the fingerprint in hexstring form (40 characters)
+    """
+    frames = traceback.extract_tb(exc.__traceback__)
+    origin = [type(exc).__module__, type(exc).__qualname__]
+    origin.extend('{0}:{1}:{2}'.format(frame.filename, frame.name, frame.lineno) for frame in frames)
+    return hashlib.sha1('\n'.join(origin).encode('utf-8')).hexdigest()
+
+
+def get_shard(contract_address, shards=None):
+    """Returns the shard of the events emitted by the given contract.
+
+    Args:
+        contract_address (str): the contract address (hexstring)
+        shards (int): the number of shards, defaults to the `ETHEREUM_SHARDS` setting
+
+    Returns:
+        int: the shard number, from 0 to `shards - 1`
+    """
+    if shards is None:
+        shards = getattr(settings, "ETHEREUM_SHARDS", 1)
+
+    digest = hashlib.sha1(contract_address.lower().encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % shards
+
+
+def get_cache_update_key(shard=0):
+    """Returns the cache key flagging that the decoder state of the given shard must be refreshed."""
     from .models import CACHE_UPDATE_KEY
-    cache.set(CACHE_UPDATE_KEY, update_required)
+    if shard == 0:
+        return CACHE_UPDATE_KEY
+    return '{0}_{1}'.format(CACHE_UPDATE_KEY, shard)
+
+
+def refresh_cache_update_value(update_required=False, shard=None):
+    """Sets the decoder state refresh flag of the given shard, or of every shard if `shard` is None."""
+    if shard is None:
+        shards = range(getattr(settings, "ETHEREUM_SHARDS", 1))
+    else:
+        shards = [shard]
+    cache.set_many({get_cache_update_key(n): update_required for n in shards})
 
 
 class Singleton(type):
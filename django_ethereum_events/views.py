@@ -0,0 +1,8 @@
+from django.http import HttpResponse
+
+from .metrics import REGISTRY
+
+
+def metrics(request):
+    """Exposes the metrics of the current process in the Prometheus text format."""
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,8 +1,13 @@
 from django.conf import settings
 
-from web3 import HTTPProvider, Web3
+from web3 import Web3
 from web3.middleware import geth_poa_middleware
 
+from .pool import PooledHTTPProvider
+from .ratelimit import RequestScheduler, construct_scheduler_middleware
+from .response_cache import ResponseCache, construct_response_cache_middleware
+from .rpc import BatchHTTPProvider, BlockFetcher
+from .sessions import HTTPSessions
 from .utils import Singleton
 
 
@@ -18,14 +23,28 @@ class Web3Service(metaclass=Singleton):
         rpc_provider = kwargs.pop('rpc_provider', None)
         if not rpc_provider:
             timeout = getattr(settings, "ETHEREUM_NODE_TIMEOUT", 10)
+            # Connections are pooled and reused across requests and threads, see `HTTPSessions`
+            sessions = HTTPSessions()
 
-            uri = settings.ETHEREUM_NODE_URI
-            rpc_provider = HTTPProvider(
-                endpoint_uri=uri,
-                request_kwargs={
-                    "timeout": timeout
-                }
-            )
+            # Several nodes are load balanced, see `PooledHTTPProvider`
+            uris = getattr(settings, "ETHEREUM_NODE_URIS", None)
+            if uris:
+                rpc_provider = PooledHTTPProvider(
+                    uris,
+                    request_kwargs={
+                        "timeout": timeout
+                    },
+                    sessions=sessions
+                )
+            else:
+                uri = settings.ETHEREUM_NODE_URI
+                rpc_provider = BatchHTTPProvider(
+                    endpoint_uri=uri,
+                    request_kwargs={
+                        "timeout": timeout
+                    },
+                    sessions=sessions
+                )
 
         self.web3 = Web3(rpc_provider)
 
@@ -33,4 +52,17 @@ class Web3Service(metaclass=Singleton):
         if getattr(settings, "ETHEREUM_GETH_POA", False):
             self.web3.middleware_onion.inject(geth_poa_middleware, layer=0)
 
+        # Final blocks and receipts are served from a cache, see `ResponseCache`
+        self.response_cache = None
+        if getattr(settings, "ETHEREUM_RPC_CACHE_SIZE", 0) or getattr(settings, "ETHEREUM_RPC_CACHE_DIR", None):
+            self.response_cache = ResponseCache(lambda: self.web3.eth.blockNumber)
+            self.web3.middleware_onion.inject(
+                construct_response_cache_middleware(self.response_cache), name='response_cache', layer=0)
+
+        # Innermost middleware, requests answered by the response cache are not paced, see `RequestScheduler`
+        self.scheduler = RequestScheduler()
+        self.web3.middleware_onion.inject(construct_scheduler_middleware(self.scheduler), name='scheduler', layer=0)
+
+        self.fetcher = BlockFetcher(self.web3, response_cache=self.response_cache, scheduler=self.scheduler)
+
         super(Web3Service, self).__init__()